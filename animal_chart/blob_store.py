@@ -0,0 +1,169 @@
+import hashlib
+import io
+import os
+import base64
+import time
+import datetime
+import gridfs
+from PIL import Image
+from image_derivatives import generate_derivatives
+
+# Record fields holding blob keys; a blob may only be deleted when none of them points at it
+BLOB_KEY_FIELDS = ("image_ref.key", "image_derivatives.preview.key")
+# Blobs stored more recently than this are never released: an upload of the same
+# image may have reused the blob without having saved its record yet
+RELEASE_GRACE_SECONDS = 10 * 60
+
+
+def content_hash(data):
+    """SHA-256 hex digest used as the blob key"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class LocalBlobStore:
+    """Content-addressed blob store on the local filesystem"""
+    name = "local"
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, data, filename="", content_type="application/octet-stream"):
+        """Store bytes (deduplicated by content) and return a reference for the record"""
+        key = content_hash(data)
+        path = self._path(key)
+        try:
+            os.utime(path)  # Already stored: mark it as recently stored so release_blobs leaves it alone
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return {"store": self.name, "key": key, "size": len(data),
+                "content_type": content_type, "filename": filename}
+
+    def get(self, ref):
+        with open(self._path(ref["key"]), "rb") as f:
+            return f.read()
+
+    def exists(self, ref):
+        return os.path.exists(self._path(ref["key"]))
+
+    def last_stored(self, ref):
+        """Epoch seconds of the blob's latest put, or None if it does not exist"""
+        try:
+            return os.path.getmtime(self._path(ref["key"]))
+        except FileNotFoundError:
+            return None
+
+    def delete(self, ref):
+        """Remove a blob unconditionally; blobs are shared by identical uploads, so use release_blobs"""
+        try:
+            os.remove(self._path(ref["key"]))
+        except FileNotFoundError:
+            pass
+
+
+class GridFSBlobStore:
+    """Content-addressed blob store in MongoDB GridFS; the file _id is the content hash"""
+    name = "gridfs"
+
+    def __init__(self, db, bucket="images"):
+        self.fs = gridfs.GridFS(db, collection=bucket)
+        self.files = db[f"{bucket}.files"]
+
+    def put(self, data, filename="", content_type="application/octet-stream"):
+        """Store bytes (deduplicated by content) and return a reference for the record"""
+        key = content_hash(data)
+        # Mark an existing blob as recently stored so release_blobs leaves it alone
+        touched = self.files.update_one({"_id": key}, {"$set": {"uploadDate": datetime.datetime.utcnow()}})
+        if not touched.matched_count:
+            try:
+                self.fs.put(data, _id=key, filename=filename, contentType=content_type)
+            except gridfs.errors.FileExists:
+                pass  # Stored concurrently by another upload of the same image
+        return {"store": self.name, "key": key, "size": len(data),
+                "content_type": content_type, "filename": filename}
+
+    def get(self, ref):
+        return self.fs.get(ref["key"]).read()
+
+    def exists(self, ref):
+        return self.fs.exists(ref["key"])
+
+    def last_stored(self, ref):
+        """Epoch seconds of the blob's latest put, or None if it does not exist"""
+        document = self.files.find_one({"_id": ref["key"]}, {"uploadDate": 1})
+        if document is None:
+            return None
+        return document["uploadDate"].replace(tzinfo=datetime.timezone.utc).timestamp()
+
+    def delete(self, ref):
+        """Remove a blob unconditionally; blobs are shared by identical uploads, so use release_blobs"""
+        self.fs.delete(ref["key"])
+
+
+def store_image(store, image, filename):
+    """Store a PIL image as PNG and return the image fields for an animal record"""
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return {
+        "image_ref": store.put(buffer.getvalue(), filename=filename, content_type="image/png"),
+        "image_filename": filename,
+    }
+
+
+def load_image(store, record):
+    """Fetch the full-resolution image of a record (blob reference or legacy inline base64)"""
+    if record.get("image_ref"):
+        return Image.open(io.BytesIO(store.get(record["image_ref"])))
+    if record.get("image_data"):
+        return Image.open(io.BytesIO(base64.b64decode(record["image_data"])))
+    return None
+
+
+def record_blob_refs(record):
+    """Blob references held by an animal record: the full image and its derivatives"""
+    refs = [record.get("image_ref")] + list((record.get("image_derivatives") or {}).values())
+    return [ref for ref in refs if ref]
+
+
+def release_blobs(store, collection, refs, grace_seconds=RELEASE_GRACE_SECONDS):
+    """
+    Delete the blobs that no animal record references any more; returns how many were deleted
+
+    Call after removing or replacing a record. Blobs are content-addressed, so
+    another record with the same image keeps using them. Blobs stored within
+    the last grace_seconds are kept even if unreferenced, since a concurrent
+    upload of the same image may be about to save the record pointing at them.
+    """
+    deleted = 0
+    for ref in refs:
+        in_use = collection.find_one({"$or": [{field: ref["key"]} for field in BLOB_KEY_FIELDS]}, {"_id": 1})
+        if in_use is not None:
+            continue
+        stored_at = store.last_stored(ref)
+        if stored_at is None or time.time() - stored_at < grace_seconds:
+            continue
+        store.delete(ref)
+        deleted += 1
+    return deleted
+
+
+def migrate_inline_images(collection, store, batch_size=50):
+    """Move legacy base64 image_data out of animal records into the blob store, with derivatives"""
+    migrated = 0
+    cursor = collection.find({"image_data": {"$exists": True}}, {"image_data": 1, "image_filename": 1},
+                             batch_size=batch_size)
+    for record in cursor:
+        data = base64.b64decode(record["image_data"])
+        filename = record.get("image_filename", "")
+        fields = generate_derivatives(store, Image.open(io.BytesIO(data)), filename)
+        fields["image_ref"] = store.put(data, filename=filename, content_type="image/png")
+        collection.update_one({"_id": record["_id"]}, {"$set": fields, "$unset": {"image_data": ""}})
+        migrated += 1
+    return migrated
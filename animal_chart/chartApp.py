@@ -10,34 +10,17 @@ from bson import ObjectId
 import json
 import re
 import random
-from database_manager import init_mongodb, convert_objectid_to_string, save_to_mongodb, search_records
+from database_manager import init_mongodb, convert_objectid_to_string, save_to_mongodb, search_records, next_serial_number
+from database_manager import init_blob_store, fetch_records_page, count_records, get_record
+from database_manager import build_search_query, search_keys
+from blob_store import store_image, load_image, record_blob_refs, release_blobs
+from image_derivatives import submit_derivatives, load_preview
+from pdf_renderer import PDF_PROJECTION, render_records_pdf, render_records_zip
 # MongoDB Configuration
 
 def generate_serial_number(collection):
     """Generate sequential document serial number in format yyyymmdd-xxx"""
-    today = datetime.now().strftime("%Y%m%d")
-    
-    # Find the highest serial number for today
-    pattern = f"^{today}-"
-    query = {"serial_number": {"$regex": pattern}}
-    
-    existing_serials = collection.find(query).sort("serial_number", -1).limit(1)
-    existing_serials = list(existing_serials)
-    
-    if existing_serials:
-        last_serial = existing_serials[0]["serial_number"]
-        # Extract the sequence number (xxx part)
-        match = re.search(r'-(\d{3})$', last_serial)
-        if match:
-            next_seq = int(match.group(1)) + 1
-        else:
-            next_seq = 1
-    else:
-        next_seq = 1
-    
-    # Format as 3-digit number with leading zeros
-    serial_number = f"{today}-{next_seq:03d}"
-    return serial_number
+    return next_serial_number(collection)
 
 def convert_objectid_to_string(obj):
     """Convert ObjectId to string for JSON serialization"""
@@ -219,11 +202,6 @@ def image_upload_form(collection):
         image = image.rotate(-90, expand=True )
         st.image(image, caption="Portrait Mode", use_container_width=True)
         
-        # Convert image to base64 for storage
-        img_buffer = io.BytesIO()
-        image.save(img_buffer, format='PNG')
-        img_str = base64.b64encode(img_buffer.getvalue()).decode()
-        
         # Form for additional metadata
         with st.form("image_record_form"):
             st.subheader("Additional Information")
@@ -244,6 +222,9 @@ def image_upload_form(collection):
                 # Generate serial number
                 serial_number = generate_serial_number(collection)
                 
+                # Store the image in the blob store; the record keeps a reference and a thumbnail
+                image_fields = store_image(init_blob_store(), image, uploaded_file.name)
+                
                 # Prepare data for MongoDB
                 record_data = {
                     "serial_number": serial_number,
@@ -252,8 +233,7 @@ def image_upload_form(collection):
                     "species": species,
                     "description": description,
                     "date_uploaded": date_uploaded.isoformat(),
-                    "image_data": img_str,
-                    "image_filename": uploaded_file.name,
+                    **image_fields,
                     "created_at": datetime.now().isoformat(),
                     "input_method": "image_upload"
                 }
@@ -262,11 +242,35 @@ def image_upload_form(collection):
                 record_id = save_to_mongodb(record_data, collection)
                 
                 if record_id:
+                    # Thumbnail and preview are generated in the background and attached to the record
+                    submit_derivatives(init_blob_store(), collection, record_id, image, uploaded_file.name)
                     st.success(f"Image record saved successfully! Serial Number: {serial_number}")
                     st.balloons()
                 else:
                     st.error("Failed to save image record!")
 
+def records_pager(collection, state_key, search_term=None, records_per_page=10):
+    """Fetch the current page of records, keeping keyset cursors for each visited page in session state"""
+    if st.session_state.get(f"{state_key}_term") != search_term:
+        st.session_state[f"{state_key}_term"] = search_term
+        st.session_state[f"{state_key}_cursors"] = [None]
+    cursors = st.session_state[f"{state_key}_cursors"]
+    
+    records, next_cursor = fetch_records_page(collection, search_term, after=cursors[-1], page_size=records_per_page)
+    
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if len(cursors) > 1 and st.button("⬅️ Previous", key=f"{state_key}_prev"):
+            cursors.pop()
+            st.rerun()
+    with col_page:
+        st.write(f"Page {len(cursors)}")
+    with col_next:
+        if next_cursor and st.button("Next ➡️", key=f"{state_key}_next"):
+            cursors.append(next_cursor)
+            st.rerun()
+    return records
+
 def search_records_page(collection):
     """Search records page"""
     st.header("Search Animal Records")
@@ -274,10 +278,11 @@ def search_records_page(collection):
     search_term = st.text_input("Search by owner name, animal name, species, or breed:")
     
     if st.button("Search") or search_term:
-        records = search_records(collection, search_term)
+        total = count_records(collection, search_term)
         
-        if records:
-            st.success(f"Found {len(records)} record(s)")
+        if total:
+            st.success(f"Found {total} record(s)")
+            records = records_pager(collection, "search_records", search_term)
             
             for record in records:
                 with st.expander(f"🐾 {record.get('animal_name', 'Unknown')} - {record.get('owner_name', 'Unknown')}"):
@@ -289,22 +294,15 @@ def view_all_records_page(collection):
     """View all records page"""
     st.header("All Animal Records")
     
-    records = search_records(collection)
+    total = count_records(collection)
     
-    if records:
-        st.info(f"Total records: {len(records)}")
+    if total:
+        st.info(f"Total records: {total}")
         
-        # Pagination
-        records_per_page = 10
-        total_pages = (len(records) + records_per_page - 1) // records_per_page
+        export_records_section(collection)
         
-        if total_pages > 1:
-            page_num = st.number_input("Page", min_value=1, max_value=total_pages, value=1)
-            start_idx = (page_num - 1) * records_per_page
-            end_idx = start_idx + records_per_page
-            page_records = records[start_idx:end_idx]
-        else:
-            page_records = records
+        # Pagination
+        page_records = records_pager(collection, "all_records")
         
         for record in page_records:
             record_title = f"🐾 {record.get('animal_name', 'Unknown')} - {record.get('owner_name', 'Unknown')}"
@@ -314,6 +312,21 @@ def view_all_records_page(collection):
     else:
         st.info("No records found.")
 
+def export_records_section(collection, search_term=None):
+    """Export every matching record as one combined PDF or a zip of per-record PDFs"""
+    with st.expander("📄 Export records as PDF"):
+        export_format = st.radio("Format", ["Single PDF", "Zip of PDFs"], horizontal=True, key="export_format")
+        if st.button("Build export", key="build_export"):
+            # A cursor with only the printed fields; both renderers consume it as they go
+            records = collection.find(build_search_query(search_term), PDF_PROJECTION,
+                                      batch_size=100).sort("created_at", 1)
+            with st.spinner("Rendering PDFs..."):
+                if export_format == "Single PDF":
+                    data, file_name, mime = render_records_pdf(records), "animal-records.pdf", "application/pdf"
+                else:
+                    data, file_name, mime = render_records_zip(records), "animal-records.zip", "application/zip"
+            st.download_button("⬇️ Download export", data=data, file_name=file_name, mime=mime)
+
 def display_record(record):
     """Display a single record"""
     
@@ -324,10 +337,8 @@ def display_record(record):
     
     if record.get('input_method') == 'image_upload':
         # Display image record in A3 landscape format
-        if record.get('image_data'):
+        if record.get('image_ref') or record.get('image_filename'):
             try:
-                img_data = base64.b64decode(record['image_data'])
-                img = Image.open(io.BytesIO(img_data))
                 #rotated_image =img.rotate(-90, expand=True)
                 
                 # Custom CSS for A3 landscape display
@@ -365,7 +376,21 @@ def display_record(record):
                 # Display image in A3 format
                 # st.image(img, caption=f"Animal Record - {record.get('image_filename', 'Unknown')}", 
                 #       caption="Portrait Mode", use_container_width=True, output_format='PNG')
-                st.image(img, caption="Portrait Mode", use_container_width=True, output_format='PNG')
+                # Show the stored thumbnail; fetch the preview or full image only when asked for
+                record_key = record.get('_id') or record.get('serial_number', '')
+                store = init_blob_store()
+                # List views leave out legacy inline image_data, so fall back to the full record
+                load_full_image = lambda: load_image(store, record) or load_image(store, get_record(init_mongodb(), record['_id']))
+                if record.get('thumbnail_data'):
+                    st.image(base64.b64decode(record['thumbnail_data']), caption="Thumbnail")
+                else:
+                    st.caption("Thumbnail is being generated.")
+                if st.checkbox("Show preview", key=f"preview_image_{record_key}"):
+                    preview = load_preview(store, init_mongodb(), record, load_full_image)
+                    st.image(preview, caption="Preview", use_container_width=True)
+                if st.checkbox("Load full resolution", key=f"full_image_{record_key}"):
+                    img = load_full_image()
+                    st.image(img, caption="Portrait Mode", use_container_width=True, output_format='PNG')
                 
                 # Display record information below image
                 st.markdown('<div class="record-info">', unsafe_allow_html=True)
@@ -443,8 +468,9 @@ def display_record(record):
         # if st.button("🗑️ Delete", key=f"delete_{record.get('serial_number', '')}"):
         if st.button("🗑️ Delete", key=key_num):
             collection = init_mongodb()
-            result = collection.delete_one({"serial_name": record.get("serial_name")})
-            if result.deleted_count:
+            deleted = collection.find_one_and_delete({"_id": ObjectId(record["_id"])})
+            if deleted is not None:
+                release_blobs(init_blob_store(), collection, record_blob_refs(deleted))
                 st.success("Record deleted successfully. Please refresh to update the list.")
             else:
                 st.error("Failed to delete record.")
@@ -475,6 +501,7 @@ def display_record(record):
                     "age": age,
                     "reminders": reminders
                 }
+                update_fields["search_keys"] = search_keys(update_fields)
                 result = collection.update_one(
                     {"serial_number": record.get("serial_number")},
                     {"$set": update_fields}
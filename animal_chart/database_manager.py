@@ -1,3 +1,17 @@
+"""
+MongoDB access for the animal chart apps
+
+Uses the shared client registry and ID allocator from the project root, so run
+the apps with the root on the import path, e.g.
+
+    PYTHONPATH=. streamlit run animal_chart/chartApp.py
+
+From the root this module can also be imported as animal_chart.database_manager
+(next to the SOAP notes database_manager) as long as animal_chart is on the path
+for its sibling modules.
+"""
+import os
+import re
 import pymongo
 from pymongo import MongoClient
 from datetime import datetime, date
@@ -7,19 +21,77 @@ from bson import ObjectId
 import json
 import streamlit as st
 
+from mongo_client_registry import get_client, ensure_indexes
+from id_allocator import CounterAllocator
+from blob_store import GridFSBlobStore, LocalBlobStore
+
+# Fields searched by build_search_query (through the search_keys array, see search_keys)
+SEARCH_FIELDS = ("owner_name", "animal_name", "species", "breed")
+
+# Bump when _create_indexes changes so every deployment rebuilds indexes once
+SCHEMA_VERSION = 4
+
+# Names of the indexes _create_indexes builds; a missing one triggers a rebuild
+EXPECTED_INDEXES = {"animal_records": ["serial_number_1", "created_at_-1__id_-1",
+                                       "image_ref.key_1", "image_derivatives.preview.key_1", "search_keys_1"]}
+
+def _create_indexes(collection):
+    """Create indexes for the animal records collection"""
+    collection.create_index("serial_number")
+    collection.create_index([("created_at", -1), ("_id", -1)])
+    # Blob reference lookups before deleting a shared (deduplicated) blob
+    collection.create_index("image_ref.key", sparse=True)
+    collection.create_index("image_derivatives.preview.key", sparse=True)
+    # Anchored, case-sensitive prefix regexes on the lowercased keys use index bounds
+    collection.create_index("search_keys")
+    if "record_search" in collection.index_information():
+        collection.drop_index("record_search")  # Text index of schema 3
+    _backfill_search_keys(collection)
+
+def search_keys(record):
+    """
+    Search keys of a record: every word-boundary suffix of each SEARCH_FIELDS value, lowercased
+
+    "Golden Retriever" gives "golden retriever" and "retriever", so a prefix
+    match on the keys finds any part of a field that starts at a word.
+    """
+    keys = set()
+    for field in SEARCH_FIELDS:
+        words = str(record.get(field) or "").lower().split()
+        keys.update(" ".join(words[i:]) for i in range(len(words)))
+    return sorted(keys)
+
+def _backfill_search_keys(collection, batch_size=500):
+    """Add search_keys to records saved before they existed"""
+    cursor = collection.find({"search_keys": {"$exists": False}}, {field: 1 for field in SEARCH_FIELDS},
+                             batch_size=batch_size)
+    for record in cursor:
+        collection.update_one({"_id": record["_id"]}, {"$set": {"search_keys": search_keys(record)}})
+
 @st.cache_resource
 def init_mongodb():
     """Initialize MongoDB connection"""
     try:
         # Replace with your MongoDB connection string
-        client = MongoClient("mongodb://localhost:27017/")
+        client = get_client("mongodb://localhost:27017/")
         db = client["veterinary_records"]
         collection = db["animal_records"]
+        ensure_indexes(client, db.name, "animal_records", SCHEMA_VERSION, lambda: _create_indexes(collection),
+                       EXPECTED_INDEXES)
         return collection
     except Exception as e:
         st.error(f"MongoDB connection failed: {e}")
         return None
     
+@st.cache_resource
+def init_blob_store():
+    """Initialize image storage: GridFS by default, or a local directory if IMAGE_STORE_DIR is set"""
+    local_dir = os.environ.get("IMAGE_STORE_DIR")
+    if local_dir:
+        return LocalBlobStore(local_dir)
+    client = get_client("mongodb://localhost:27017/")
+    return GridFSBlobStore(client["veterinary_records"])
+    
 def convert_objectid_to_string(obj):
     """Convert ObjectId to string for JSON serialization"""
     if isinstance(obj, ObjectId):
@@ -34,30 +106,120 @@ def convert_objectid_to_string(obj):
 def save_to_mongodb(data, collection):
     """Save data to MongoDB"""
     try:
+        data["search_keys"] = search_keys(data)
         result = collection.insert_one(data)
         return result.inserted_id
     except Exception as e:
         st.error(f"Error saving to MongoDB: {e}")
         return None
     
-def search_records(collection, search_term=None):
+# Heavy fields left out of list views; fetch them with get_record (or attach_thumbnails) when needed
+LIST_PROJECTION = {"image_data": 0, "thumbnail_data": 0}
+
+def build_search_query(search_term=None):
+    """
+    MongoDB filter matching owner name, animal name, species or breed
+
+    Case-insensitive, like the original substring regex, but the term must
+    start at a word of the field ("Bisc" and "retriever" match, "cuit" does
+    not), so the match is an anchored regex on the indexed search_keys instead
+    of a scan of every record for both the page and the count.
+    """
+    term = " ".join((search_term or "").lower().split())
+    if not term:
+        return {}
+    return {"search_keys": {"$regex": "^" + re.escape(term)}}
+
+def attach_thumbnails(collection, records):
+    """Load the inline thumbnails of a page of list-view records in one query"""
+    ids = [ObjectId(record["_id"]) for record in records if record.get("_id")]
+    if not ids:
+        return records
+    thumbnails = {str(doc["_id"]): doc.get("thumbnail_data")
+                  for doc in collection.find({"_id": {"$in": ids}}, {"thumbnail_data": 1})}
+    for record in records:
+        if thumbnails.get(str(record.get("_id"))):
+            record["thumbnail_data"] = thumbnails[str(record["_id"])]
+    return records
+
+def _stringify_id(record):
+    """Convert the top-level ObjectId of a record to a string"""
+    if isinstance(record.get("_id"), ObjectId):
+        record["_id"] = str(record["_id"])
+    return record
+
+def search_records(collection, search_term=None, projection=LIST_PROJECTION):
     """Search records in MongoDB"""
     try:
-        if search_term:
-            query = {
+        query = build_search_query(search_term)
+        records = collection.find(query, projection).sort("created_at", -1)
+        return [_stringify_id(record) for record in records]
+    except Exception as e:
+        st.error(f"Error searching records: {e}")
+        return []
+
+def fetch_records_page(collection, search_term=None, after=None, page_size=10, projection=LIST_PROJECTION,
+                       with_thumbnails=True):
+    """
+    Fetch one page of records, newest first, using keyset pagination on (created_at, _id)
+
+    Args:
+        after: Cursor returned for the previous page, or None for the first page
+        with_thumbnails: Add the thumbnails LIST_PROJECTION leaves out, for this page only
+
+    Returns:
+        (records, cursor for the next page or None if this is the last page)
+    """
+    try:
+        query = build_search_query(search_term)
+        if after:
+            created_at, record_id = after
+            keyset = {
                 "$or": [
-                    {"owner_name": {"$regex": search_term, "$options": "i"}},
-                    {"animal_name": {"$regex": search_term, "$options": "i"}},
-                    {"species": {"$regex": search_term, "$options": "i"}},
-                    {"breed": {"$regex": search_term, "$options": "i"}}
+                    {"created_at": {"$lt": created_at}},
+                    {"created_at": created_at, "_id": {"$lt": ObjectId(record_id)}}
                 ]
             }
-        else:
-            query = {}
-        
-        records = list(collection.find(query).sort("created_at", -1))
-        return [convert_objectid_to_string(record) for record in records]
+            query = {"$and": [query, keyset]} if query else keyset
+
+        cursor = collection.find(query, projection).sort([("created_at", -1), ("_id", -1)]).limit(page_size + 1)
+        records = list(cursor)
+        next_cursor = None
+        if len(records) > page_size:
+            records = records[:page_size]
+            next_cursor = (records[-1].get("created_at"), str(records[-1]["_id"]))
+        records = [_stringify_id(record) for record in records]
+        if with_thumbnails:
+            attach_thumbnails(collection, records)
+        return records, next_cursor
     except Exception as e:
-        st.error(f"Error searching records: {e}")
-        return []
-    
+        st.error(f"Error fetching records: {e}")
+        return [], None
+
+def count_records(collection, search_term=None):
+    """Count records matching a search term (estimated when unfiltered)"""
+    query = build_search_query(search_term)
+    if not query:
+        return collection.estimated_document_count()
+    return collection.count_documents(query)
+
+def get_record(collection, record_id):
+    """Fetch one complete record, including heavy fields"""
+    record = collection.find_one({"_id": ObjectId(record_id)})
+    return _stringify_id(record) if record else None
+
+def next_serial_number(collection):
+    """Allocate the next document serial number (yyyymmdd-xxx) from the counters collection"""
+    today = datetime.now().strftime("%Y%m%d")
+
+    def highest_existing():
+        # Consulted once per day, when today's counter is created
+        last = collection.find_one(
+            {"serial_number": {"$regex": f"^{today}-\\d{{3}}$"}},
+            {"serial_number": 1},
+            sort=[("serial_number", -1)]
+        )
+        return int(last["serial_number"].rsplit("-", 1)[1]) if last else 0
+
+    allocator = CounterAllocator(collection.database["counters"], f"serial_number:{today}", seed=highest_existing)
+    return f"{today}-{allocator.next_value():03d}"
@@ -0,0 +1,103 @@
+import base64
+import io
+import json
+import urllib.request
+
+# Bump whenever EXTRACTION_PROMPT or TABLE_AND_PHONE_PROMPT changes so cached results are not reused
+PROMPT_VERSION = 2
+
+EXTRACTION_PROMPT = """
+    Extract the information from the provided animal record image.
+    Return the data as a single JSON object.
+    The JSON object should have two main keys: "owner_info" and "animal_info".
+    The "treatment_data" should be a single string, with each entry on a new line.
+    Use the format 'Date|Weight|Treatment and Progress|Charge' for each line.
+    Even though a value is not present, use an empty string with same format.
+
+    Example format:
+    {
+      "owner_info": {
+        "Owner's Name": "value",
+        "Home Phone #": "value",
+        "Other Phone #": "value",
+        "Address": "value",
+        "Data Entry By": "value"
+      },
+      "animal_info": {
+        "Animal's Name": "value",
+        "Species": "value",
+        "Breed": "value",
+        "Colors and Markings": "value",
+        "Sex": "value",
+        "Age": "value",
+        "Date of Birth": "value"
+      },
+      "treatment_data": "6-9-25|19 lbs|yup rash on stomach / neck area...\\n||P fell while jumping on couch.\\n..."
+    }
+    """
+
+
+def parse_extraction_response(text):
+    """Strip markdown fences from a model response and parse the JSON object"""
+    json_str = text.strip().replace('```json', '').replace('```', '')
+    return json.loads(json_str)
+
+
+def encode_image(image, image_format="PNG"):
+    """Encode a PIL image as base64 for a model request"""
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class LlamaBackend:
+    """Calls a generate_content(prompt, image) function one image at a time"""
+
+    def __init__(self, generate_content):
+        self.generate_content = generate_content
+
+    def generate_batch(self, prompt, images):
+        """Return the raw response text for each image"""
+        return [self.generate_content(prompt, image).text for image in images]
+
+
+class HTTPModelBackend:
+    """
+    Sends batches of images to a model server
+
+    The server accepts POST {url}/generate_batch with
+    {"prompt": str, "images": [base64 PNG, ...]} and answers
+    {"responses": [text, ...]} in the same order.
+    """
+
+    def __init__(self, url, timeout=300):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def generate_batch(self, prompt, images):
+        payload = json.dumps({"prompt": prompt, "images": [encode_image(image) for image in images]}).encode()
+        request = urllib.request.Request(
+            f"{self.url}/generate_batch",
+            data=payload,
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())["responses"]
+
+
+TABLE_AND_PHONE_PROMPT = """
+    The image shows two parts of an animal record: the owner information rows at
+    the top and the treatment and progress table below them.
+    Return a single JSON object with two keys:
+    "Other Phone #": the owner's other (not home) phone number, or an empty string;
+    "treatment_data": the table rows as a single string, one row per line, in the
+    format 'Date|Weight|Treatment and Progress|Charge'. Use an empty string for a
+    missing value but keep the separators. Do not include the header row.
+    """
+
+
+def parse_treatment_response(text):
+    """Strip markdown fences and blank lines from a treatment-table response"""
+    lines = text.strip().replace('```text', '').replace('```', '').split('\n')
+    return '\n'.join(line.strip() for line in lines if line.strip())
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from PIL import ImageOps
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".soapnote", "extraction_cache.sqlite3")
+
+
+def image_cache_key(image, prompt_version, size=(1024, 1024)):
+    """
+    Cache key for an extraction: hash of the normalized image pixels plus the prompt version
+
+    Normalizing (EXIF orientation, grayscale, fixed size) makes re-uploads of the
+    same photo hit the cache regardless of file format or metadata. An exact pixel
+    hash is used instead of a perceptual hash because charts share one printed
+    template and a near match could return another patient's data.
+    """
+    normalized = ImageOps.exif_transpose(image).convert("L").resize(size)
+    digest = hashlib.sha256(normalized.tobytes()).hexdigest()
+    return f"v{prompt_version}:{digest}"
+
+
+class ExtractionCache:
+    """Persistent SQLite cache of parsed extraction results with LRU and TTL eviction"""
+
+    def __init__(self, path=None, max_entries=5000, ttl_seconds=30 * 24 * 3600):
+        self.path = path or os.environ.get("EXTRACTION_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extraction_cache ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON extraction_cache(last_access)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached result for a key, or None on a miss or expired entry"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created_at FROM extraction_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM extraction_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE extraction_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key, result):
+        """Store a parsed result, evicting the least recently used entries beyond max_entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache (key, result, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result), now, now)
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+            if count > self.max_entries:
+                cursor = self._conn.execute(
+                    "DELETE FROM extraction_cache WHERE key IN ("
+                    "SELECT key FROM extraction_cache ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+                self.evictions += cursor.rowcount
+            self._conn.commit()
+
+    def purge_expired(self):
+        """Delete every entry older than the TTL"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM extraction_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._conn.commit()
+            self.evictions += cursor.rowcount
+            return cursor.rowcount
+
+    def stats(self):
+        """Hit-rate metrics for this process"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+            }
@@ -0,0 +1,191 @@
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional
+
+from extraction import EXTRACTION_PROMPT, PROMPT_VERSION, parse_extraction_response
+from extraction_cache import image_cache_key
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class ExtractionJob:
+    job_id: str
+    filename: str
+    image: Any = field(default=None, repr=False)
+    status: str = QUEUED
+    result: Optional[Dict] = None
+    error: str = ""
+    cache_key: str = ""
+    cached: bool = False
+    submitted_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+
+class ExtractionQueue:
+    """Runs chart image extraction on a bounded pool of workers, batching requests to the model"""
+
+    def __init__(self, backend, workers=2, batch_size=4, max_pending=64, batch_wait=0.05,
+                 prompt=EXTRACTION_PROMPT, cache=None, preprocess=None, cache_version=PROMPT_VERSION,
+                 finished_ttl=3600):
+        """
+        Args:
+            backend: Object with generate_batch(prompt, images) -> list of response texts
+            workers: Maximum number of concurrent model requests
+            batch_size: Maximum images per model request
+            max_pending: Queued jobs accepted before submit() blocks
+            batch_wait: Seconds a worker waits for more jobs to fill a batch
+            cache: Optional ExtractionCache; cached images complete without a model request
+            preprocess: Optional function applied to each image on the worker before the model call
+            cache_version: Prompt (and preprocessing) version that cache keys are tied to
+            finished_ttl: Seconds a done or failed job is kept for status() before it is purged
+        """
+        self.cache = cache
+        self.preprocess = preprocess
+        self.cache_version = cache_version
+        self.backend = backend
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.prompt = prompt
+        self.finished_ttl = finished_ttl
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._jobs: Dict[str, ExtractionJob] = {}
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._work, daemon=True, name=f"extraction-{i}") for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, image, filename="", timeout=None):
+        """Queue an image for extraction and return its job id"""
+        self.purge_finished()
+        job = ExtractionJob(job_id=uuid.uuid4().hex, filename=filename, image=image)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        if self.cache is not None:
+            job.cache_key = image_cache_key(image, self.cache_version)
+            cached_result = self.cache.get(job.cache_key)
+            if cached_result is not None:
+                job.cached = True
+                self._finish(job, result=cached_result)
+                return job.job_id
+        try:
+            self._pending.put(job, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.job_id]
+            raise
+        return job.job_id
+
+    def submit_many(self, images_with_names):
+        """Queue several (image, filename) pairs and return their job ids in order"""
+        return [self.submit(image, filename) for image, filename in images_with_names]
+
+    def status(self, job_id):
+        """Return a snapshot of a job (without the image), or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return replace(job, image=None) if job else None
+
+    def jobs(self):
+        """Snapshots of every known job, oldest first"""
+        with self._lock:
+            return [replace(job, image=None) for job in self._jobs.values()]
+
+    def wait(self, job_ids, timeout=None):
+        """Block until the given jobs are finished (or timeout) and return their snapshots"""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            snapshots = [self.status(job_id) for job_id in job_ids]
+            if all(job is None or job.status in (DONE, FAILED) for job in snapshots):
+                return snapshots
+            if deadline is not None and time.time() >= deadline:
+                return snapshots
+            time.sleep(0.02)
+
+    def forget(self, job_id):
+        """Drop a finished job from the registry"""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def purge_finished(self, max_age=None):
+        """Drop done and failed jobs that finished more than max_age seconds ago; returns how many"""
+        cutoff = time.time() - (self.finished_ttl if max_age is None else max_age)
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.status in (DONE, FAILED) and job.finished_at is not None and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+    def _next_batch(self) -> List[ExtractionJob]:
+        batch = [self._pending.get()]
+        deadline = time.time() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _finish(self, job, result=None, error=""):
+        with self._lock:
+            job.status = FAILED if error else DONE
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+            job.image = None  # release the image as soon as it is processed
+
+    def _work(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                # Never let one bad batch stop the worker; fail whatever it left unfinished
+                for job in batch:
+                    if job.status not in (DONE, FAILED):
+                        self._finish(job, error=f"Extraction failed: {e}")
+
+    def _run_batch(self, batch):
+        with self._lock:
+            for job in batch:
+                job.status = RUNNING
+        # Preprocess per job so one unreadable image neither fails the batch nor looks like a model error
+        ready, images = [], []
+        for job in batch:
+            try:
+                images.append(job.image if self.preprocess is None else self.preprocess(job.image))
+                ready.append(job)
+            except Exception as e:
+                self._finish(job, error=f"Image preprocessing failed: {e}")
+        if not ready:
+            return
+        try:
+            responses = self.backend.generate_batch(self.prompt, images)
+        except Exception as e:
+            for job in ready:
+                self._finish(job, error=f"Model request failed: {e}")
+            return
+        for job, response in zip(ready, responses):
+            try:
+                result = parse_extraction_response(response)
+                if self.cache is not None and job.cache_key:
+                    self.cache.put(job.cache_key, result)
+                self._finish(job, result=result)
+            except ValueError as e:
+                self._finish(job, error=f"Could not parse model response: {e}")
+            except Exception as e:
+                self._finish(job, error=f"Extraction failed: {e}")
+        for job in ready[len(responses):]:
+            self._finish(job, error="Model returned no response for this image")
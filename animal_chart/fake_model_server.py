@@ -0,0 +1,108 @@
+"""
+Local stand-in for the vision model server
+
+Implements the HTTPModelBackend protocol and answers every image with a fixed
+extraction result (or whatever a responder function returns for it) after an
+optional delay, so the extraction queue can be exercised and benchmarked
+without a GPU or network access.
+
+    python fake_model_server.py --port 8765 --delay 0.5
+"""
+import argparse
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSE = {
+    "owner_info": {
+        "Owner's Name": "Jane Sample",
+        "Home Phone #": "(909) 555-0100",
+        "Other Phone #": "",
+        "Address": "1 Example Street, San Bernardino, CA",
+        "Data Entry By": "fake-model"
+    },
+    "animal_info": {
+        "Animal's Name": "Biscuit",
+        "Species": "Dog",
+        "Breed": "Beagle",
+        "Colors and Markings": "Tricolor",
+        "Sex": "M",
+        "Age": "4",
+        "Date of Birth": ""
+    },
+    "treatment_data": "6-9-25|19 lbs|Rash on stomach|45.00"
+}
+
+
+def make_handler(response, delay, per_image_delay, responder=None):
+    class FakeModelHandler(BaseHTTPRequestHandler):
+        # Shared by the server's request threads; read it with server_stats()
+        stats = {"requests": 0, "images": 0, "batch_sizes": []}
+        stats_lock = threading.Lock()
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            images = body.get("images", [])
+            with FakeModelHandler.stats_lock:
+                FakeModelHandler.stats["requests"] += 1
+                FakeModelHandler.stats["images"] += len(images)
+                FakeModelHandler.stats["batch_sizes"].append(len(images))
+            time.sleep(delay + per_image_delay * len(images))
+            try:
+                if responder is not None:
+                    answers = [responder(base64.b64decode(image)) for image in images]
+                else:
+                    answers = [response] * len(images)
+            except Exception as e:
+                self.send_error(500, str(e))
+                return
+            # A responder may return raw text (e.g. to simulate an unparsable answer)
+            payload = json.dumps({"responses": [answer if isinstance(answer, str) else json.dumps(answer)
+                                                for answer in answers]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeModelHandler
+
+
+def start_fake_model_server(port=0, response=None, delay=0.0, per_image_delay=0.0, responder=None):
+    """
+    Start the server on a background thread and return (server, base_url)
+
+    Args:
+        responder: Optional function taking an image's PNG bytes and returning its extraction result
+            (a dict, or response text as is); if it raises, the whole request fails with HTTP 500
+    """
+    handler = make_handler(response or DEFAULT_RESPONSE, delay, per_image_delay, responder)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def server_stats(server):
+    """Snapshot of a fake server's request counters: requests, images and the size of each batch"""
+    handler = server.RequestHandlerClass
+    with handler.stats_lock:
+        return dict(handler.stats, batch_sizes=list(handler.stats["batch_sizes"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake vision model server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds per request")
+    parser.add_argument("--per-image-delay", type=float, default=0.0, help="Extra seconds per image")
+    args = parser.parse_args()
+    server, url = start_fake_model_server(args.port, delay=args.delay, per_image_delay=args.per_image_delay)
+    print(f"Fake model server listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,55 @@
+"""
+Layout of the West Highland animal record form
+
+Positions mirror create_animal_record_pdf and are measured in inches from the
+top-left corner of a US Letter page, so they can be used both to draw the form
+and to locate fields on a scanned chart.
+
+They have not been calibrated against scans of the printed paper form, whose
+margins and line spacing may differ from the generated PDF. field_value_box
+leaves some slack above and below each line, and TemplateExtractor hands
+low-confidence fields (or the whole page, when most fields are) to the vision
+model; measure real scans before relying on OCR alone (no model backend).
+"""
+from collections import namedtuple
+
+PAGE_WIDTH_IN = 8.5
+PAGE_HEIGHT_IN = 11.0
+
+# line_y is the baseline the value is written on; the value sits just above it
+FormField = namedtuple("FormField", "group name x line_y label_width field_width")
+
+FORM_FIELDS = (
+    FormField("owner_info", "Owner's Name", 0.5, 1.5, 1.2, 2.5),
+    FormField("owner_info", "Home Phone #", 4.5, 1.5, 1.0, 2.5),
+    FormField("owner_info", "Address", 0.5, 2.0, 0.6, 6.9),
+    FormField("owner_info", "Data Entry By", 4.5, 2.5, 1.0, 2.5),
+    FormField("animal_info", "Animal's Name", 0.5, 2.75, 1.2, 2.5),
+    FormField("animal_info", "Species", 4.5, 2.75, 1.0, 2.5),
+    FormField("animal_info", "Breed", 0.5, 3.25, 1.2, 2.5),
+    FormField("animal_info", "Colors and Markings", 4.5, 3.25, 1.3, 2.5),
+    FormField("animal_info", "Sex", 0.5, 3.75, 1.2, 2.5),
+    FormField("animal_info", "Age", 4.5, 3.75, 1.0, 2.5),
+    FormField("animal_info", "Date of Birth", 0.5, 4.25, 1.2, 2.5),
+)
+
+# Treatment and progress table: below the reminders line to the bottom margin
+TREATMENT_TABLE_BOX = (0.5, 4.6, 8.0, 10.75)
+
+# Owner rows of the header. "Other Phone #" has no printed line on the form and
+# is written wherever there is room in this band, so it is read by the model
+OWNER_INFO_BOX = (0.5, 1.1, 8.0, 2.6)
+
+
+def field_value_box(form_field, above=0.3, below=0.08):
+    """(left, top, right, bottom) in inches of the area a field's value is written in"""
+    left = form_field.x + form_field.label_width
+    return (left, form_field.line_y - above, left + form_field.field_width, form_field.line_y + below)
+
+
+def to_pixels(box, image_size):
+    """Scale an inch box to pixel coordinates on a page image of the given size"""
+    scale_x = image_size[0] / PAGE_WIDTH_IN
+    scale_y = image_size[1] / PAGE_HEIGHT_IN
+    left, top, right, bottom = box
+    return (int(left * scale_x), int(top * scale_y), int(right * scale_x), int(bottom * scale_y))
@@ -0,0 +1,102 @@
+import base64
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
+from PIL import Image, features
+
+THUMBNAIL_SIZE = (256, 256)
+PREVIEW_SIZE = (1024, 1024)
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Shared worker pool for derivative generation (PIL releases the GIL while resizing and encoding)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.environ.get("IMAGE_DERIVATIVE_WORKERS", "2"))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-derivatives")
+        return _executor
+
+
+def encode_derivative(image, max_size, quality=75):
+    """Downscale a PIL image and encode it as WebP (JPEG if WebP is unavailable)"""
+    derivative = image.copy()
+    derivative.thumbnail(max_size)
+    if derivative.mode not in ("RGB", "L"):
+        derivative = derivative.convert("RGB")
+    image_format, content_type = ("WEBP", "image/webp") if features.check("webp") else ("JPEG", "image/jpeg")
+    buffer = io.BytesIO()
+    derivative.save(buffer, format=image_format, quality=quality)
+    return buffer.getvalue(), content_type
+
+
+def make_thumbnail(image):
+    """Return a small thumbnail as base64, small enough to keep inline in the record"""
+    data, _content_type = encode_derivative(image, THUMBNAIL_SIZE, quality=70)
+    return base64.b64encode(data).decode()
+
+
+def generate_derivatives(store, image, filename=""):
+    """Build the thumbnail and medium preview of an image and return the record fields to set"""
+    preview_data, content_type = encode_derivative(image, PREVIEW_SIZE)
+    return {
+        "thumbnail_data": make_thumbnail(image),
+        "image_derivatives": {
+            "preview": store.put(preview_data, filename=f"preview-{filename}", content_type=content_type)
+        },
+    }
+
+
+def submit_derivatives(store, collection, record_id, image, filename=""):
+    """
+    Generate derivatives in the background and attach them to the record when done
+
+    A failure is logged and recorded as derivatives_error on the record;
+    load_preview still builds the preview on demand for such records.
+    """
+    def build_and_attach():
+        fields = generate_derivatives(store, image, filename)
+        collection.update_one({"_id": record_id}, {"$set": fields, "$unset": {"derivatives_error": ""}})
+        return fields
+
+    def check_result(future):
+        error = future.exception()
+        if error is None:
+            return
+        logger.error("Could not build image derivatives for record %s", record_id, exc_info=error)
+        try:
+            collection.update_one({"_id": record_id}, {"$set": {"derivatives_error": str(error) or type(error).__name__}})
+        except Exception:
+            logger.exception("Could not mark image derivatives of record %s as failed", record_id)
+
+    future = _get_executor().submit(build_and_attach)
+    future.add_done_callback(check_result)
+    return future
+
+
+def load_preview(store, collection, record, load_full_image):
+    """
+    Return the medium preview of a record as a PIL image, generating and caching it if missing
+
+    Args:
+        load_full_image: Called to fetch the full-resolution image when no preview exists yet
+    """
+    preview_ref = (record.get("image_derivatives") or {}).get("preview")
+    if preview_ref and store.exists(preview_ref):
+        return Image.open(io.BytesIO(store.get(preview_ref)))
+
+    image = load_full_image()
+    if image is None:
+        return None
+    fields = generate_derivatives(store, image, record.get("image_filename", ""))
+    collection.update_one({"_id": ObjectId(record["_id"])}, {"$set": fields, "$unset": {"derivatives_error": ""}})
+    record.update(fields)
+    return Image.open(io.BytesIO(store.get(fields["image_derivatives"]["preview"])))
@@ -0,0 +1,146 @@
+import hashlib
+import math
+from dataclasses import dataclass, asdict
+
+from PIL import Image, ImageOps, ImageStat
+
+
+class PreprocessingError(Exception):
+    """A chart image could not be prepared for extraction (corrupt, truncated, unsupported mode...)"""
+
+
+@dataclass(frozen=True)
+class PreprocessConfig:
+    """Settings for normalizing chart photos before they are sent to the vision model"""
+    grayscale: bool = True
+    crop: bool = True
+    deskew: bool = True
+    binarize: bool = False  # off by default: thresholding can erase faint handwriting
+    max_tokens: int = 1600  # model image-token budget
+    patch_size: int = 28  # pixels per image token side
+    max_skew_degrees: float = 5.0
+    skew_step_degrees: float = 0.5
+
+    def signature(self):
+        """Short string identifying these settings, for cache keys"""
+        settings = ",".join(f"{key}={value}" for key, value in asdict(self).items())
+        return hashlib.sha1(settings.encode()).hexdigest()[:12]
+
+
+def _working_copy(image, max_side=800):
+    """Small copy used for analysis (crop box, skew angle)"""
+    scale = min(1.0, max_side / max(image.size))
+    small = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.BILINEAR)
+    return small, scale
+
+
+def otsu_threshold(gray):
+    """Global threshold maximizing between-class variance of the histogram"""
+    histogram = gray.histogram()[:256]
+    total = sum(histogram)
+    sum_all = sum(i * count for i, count in enumerate(histogram))
+    sum_background = weight_background = 0
+    best_threshold, best_variance = 127, -1.0
+    for threshold, count in enumerate(histogram):
+        weight_background += count
+        if weight_background == 0:
+            continue
+        weight_foreground = total - weight_background
+        if weight_foreground == 0:
+            break
+        sum_background += threshold * count
+        mean_background = sum_background / weight_background
+        mean_foreground = (sum_all - sum_background) / weight_foreground
+        variance = weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = threshold, variance
+    return best_threshold
+
+
+def find_document_box(gray, padding=0.01):
+    """Bounding box of the bright paper area, or None if cropping would not help"""
+    small, scale = _working_copy(gray, 400)
+    paper = small.point(lambda p, t=otsu_threshold(small): 255 if p > t else 0)
+    box = paper.getbbox()
+    if not box:
+        return None
+    pad_x, pad_y = int(small.width * padding), int(small.height * padding)
+    left, top = max(0, box[0] - pad_x), max(0, box[1] - pad_y)
+    right, bottom = min(small.width, box[2] + pad_x), min(small.height, box[3] + pad_y)
+    # Ignore crops that would keep almost everything or implausibly little
+    kept = (right - left) * (bottom - top) / float(small.width * small.height)
+    if kept > 0.97 or kept < 0.2:
+        return None
+    return (int(left / scale), int(top / scale), int(right / scale), int(bottom / scale))
+
+
+def _row_profile_variance(ink):
+    """Variance of the per-row ink density; peaks when text lines are horizontal"""
+    rows = list(ink.resize((1, ink.height), Image.BOX).getdata())
+    mean = sum(rows) / len(rows)
+    return sum((value - mean) ** 2 for value in rows) / len(rows)
+
+
+def estimate_skew(gray, max_degrees=5.0, step=0.5):
+    """Estimate the rotation (degrees, counter-clockwise) that makes text lines horizontal"""
+    small, _scale = _working_copy(gray)
+    ink = ImageOps.invert(small.point(lambda p, t=otsu_threshold(small): 255 if p > t else 0))
+    best_angle, best_score = 0.0, -1.0
+    steps = int(max_degrees / step)
+    for i in range(-steps, steps + 1):
+        angle = i * step
+        score = _row_profile_variance(ink.rotate(angle, resample=Image.NEAREST, fillcolor=0))
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def downscale_to_budget(image, max_tokens, patch_size):
+    """Shrink an image so it costs at most max_tokens patch_size x patch_size image tokens"""
+    tokens = math.ceil(image.width / patch_size) * math.ceil(image.height / patch_size)
+    if tokens <= max_tokens:
+        return image
+    scale = math.sqrt(max_tokens * patch_size * patch_size / float(image.width * image.height))
+    while True:
+        size = (max(patch_size, int(image.width * scale)), max(patch_size, int(image.height * scale)))
+        if math.ceil(size[0] / patch_size) * math.ceil(size[1] / patch_size) <= max_tokens:
+            return image.resize(size, Image.LANCZOS)
+        scale *= 0.98
+
+
+def preprocess_for_model(image, config=PreprocessConfig()):
+    """
+    Deskew, crop, grayscale/binarize and downscale a chart photo before extraction
+
+    Raises:
+        PreprocessingError: The image could not be processed, so no model call should be made
+    """
+    try:
+        return _preprocess(image, config)
+    except Exception as e:
+        raise PreprocessingError(str(e) or type(e).__name__) from e
+
+
+def _preprocess(image, config):
+    image = ImageOps.exif_transpose(image)
+    # Downscale early (to four times the budget) so the remaining steps touch fewer pixels
+    image = downscale_to_budget(image, config.max_tokens * 4, config.patch_size)
+    gray = ImageOps.autocontrast(image.convert("L"))
+    keep_color = not (config.grayscale or config.binarize)
+    if not keep_color:
+        image = gray
+
+    if config.crop:
+        box = find_document_box(gray)
+        if box:
+            image, gray = image.crop(box), gray.crop(box)
+    if config.deskew:
+        angle = estimate_skew(gray, config.max_skew_degrees, config.skew_step_degrees)
+        if angle:
+            background = int(ImageStat.Stat(gray).median[0])
+            fill = (background,) * 3 if keep_color and image.mode == "RGB" else background
+            image = image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=fill)
+    if config.binarize:
+        image = image.point(lambda p, t=otsu_threshold(image): 255 if p > t else 0)
+
+    return downscale_to_budget(image, config.max_tokens, config.patch_size)
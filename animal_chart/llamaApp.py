@@ -1,17 +1,32 @@
 import streamlit as st
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-from reportlab.platypus import Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
 import io
 import json
 import re
 import datetime
+import tempfile
 from PIL import Image, ImageOps
 from mongodb_manager import init_mongodb, convert_objectid_to_string, save_to_mongodb, search_records, generate_serial_number
 from mongodb_manager import add_new_record_page, search_records, search_records_page, view_all_records_page, display_record
+import os
+from extraction import EXTRACTION_PROMPT, parse_extraction_response, LlamaBackend, HTTPModelBackend
+from extraction_queue import ExtractionQueue, DONE, FAILED
+from extraction import PROMPT_VERSION
+from extraction_cache import ExtractionCache, image_cache_key
+from image_preprocess import PreprocessConfig, PreprocessingError, preprocess_for_model
+from ocr_extraction import TemplateExtractor, ocr_available
+from pdf_ingest import ingest_pdf
+from pdf_renderer import create_animal_record_pdf
+from database_manager import init_blob_store
+
+# Image normalization applied before every model call; part of the extraction cache key
+PREPROCESS_CONFIG = PreprocessConfig(max_tokens=int(os.environ.get("EXTRACTION_MAX_IMAGE_TOKENS", "1600")))
+CACHE_VERSION = f"{PROMPT_VERSION}-{PREPROCESS_CONFIG.signature()}"
+# "ocr" reads the form fields with Tesseract and uses the model only as a fallback; "llm" always uses the model
+EXTRACTION_ENGINE = os.environ.get("EXTRACTION_ENGINE", "ocr")
+
+def engine_cache_version(engine):
+    """Extraction cache version for results produced by engine ("ocr" or "llm")"""
+    return f"{CACHE_VERSION}-{engine}"
 
 # --- Llama 3.2 API Configuration ---
 def llama32_generate_content(prompt, image):
@@ -25,136 +40,71 @@ def llama32_generate_content(prompt, image):
     return response
     raise NotImplementedError("You must implement llama32_generate_content() to call your Llama 3.2 model.")
 
-# --- PDF Generation Function ---
-def create_animal_record_pdf(owner_info, animal_info, treatment_data_str):
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    def draw_field(x, y, label, value, label_width=1.2*inch, field_width=2.5*inch):
-        p.drawString(x, y + 5, f"{label}:")
-        p.drawString(x + label_width, y + 5, value)
-        p.line(x + label_width, y, x + label_width + field_width, y)
-
-    p.setFont("Helvetica-Bold", 18)
-    p.drawString(0.5*inch, height - 0.7*inch, "Animal Record")
-    # Owner's name in bold, just below the title
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(0.5*inch, height - 0.95*inch, owner_info.get("Owner's Name", ""))
-    # Hospital info
-    p.setFont("Helvetica-Bold", 10)
-    p.drawString(width - 3.5*inch, height - 0.6*inch, "WEST HIGHLAND DOG & CAT HOSPITAL")
-    p.setFont("Helvetica", 9)
-    p.drawString(width - 3.5*inch, height - 0.75*inch, "1795 West Highland")
-    p.drawString(width - 3.5*inch, height - 0.9*inch, "San Bernardino, CA 92407")
-    p.drawString(width - 3.5*inch, height - 1.05*inch, "(909) 887-5021")
-
-    p.setFont("Helvetica-Bold", 12)
-    y_pos = height - 1.5*inch
-    draw_field(0.5*inch, y_pos, "Owner's Name", owner_info.get("Owner's Name", ""))
-    p.setFont("Helvetica", 10)
-    draw_field(4.5*inch, y_pos, "Home Phone #", owner_info.get("Home Phone #", ""), label_width=1*inch)
-    y_pos -= 0.5*inch
-    p.drawString(0.5*inch, y_pos + 5, "Address:")
-    p.drawString(0.5*inch + 0.6*inch, y_pos + 5, owner_info.get("Address", ""))
-    p.line(0.5*inch + 0.6*inch, y_pos, width - 0.5*inch, y_pos)
-    y_pos -= 0.5*inch
-    draw_field(4.5*inch, y_pos, "Data Entry By", owner_info.get("Data Entry By", ""), label_width=1*inch)
-
-    y_pos -= 0.25*inch
-    draw_field(0.5*inch, y_pos, "Animal's Name", animal_info.get("Animal's Name", ""))
-    draw_field(4.5*inch, y_pos, "Species", animal_info.get("Species", ""), label_width=1*inch)
-    y_pos -= 0.5*inch
-    draw_field(0.5*inch, y_pos, "Breed", animal_info.get("Breed", ""))
-    draw_field(4.5*inch, y_pos, "Colors and Markings", animal_info.get("Colors and Markings", ""), label_width=1.3*inch)
-    y_pos -= 0.5*inch
-    draw_field(0.5*inch, y_pos, "Sex", animal_info.get("Sex", ""))
-    draw_field(4.5*inch, y_pos, "Age", animal_info.get("Age", ""), label_width=1*inch)
-    y_pos -= 0.5*inch
-    draw_field(0.5*inch, y_pos, "Date of Birth", animal_info.get("Date of Birth", ""))
-
-    y_pos -= 0.5*inch
-    p.drawString(0.5*inch, y_pos + 5, "Reminders:")
-    p.line(0.5*inch + 0.8*inch, y_pos, width - 0.5*inch, y_pos)
-
-    styles = getSampleStyleSheet()
-    styleN = styles['Normal']
-    styleN.wordWrap = 'CJK'
-    
-    # Process treatment data from the text area
-    treatment_lines = treatment_data_str.strip().split('\n')
-    treatment_data = []
-    for line in treatment_lines:
-        parts = line.split('|')
-        row = [parts[0] if len(parts) > 0 else '',
-               parts[1] if len(parts) > 1 else '',
-               parts[2] if len(parts) > 2 else '',
-               parts[3] if len(parts) > 3 else '']
-        treatment_data.append([Paragraph(cell, styleN) for cell in row])
-
-    headers = ["Date", "Weight", "Treatment and Progress", "Charge"]
-    header_row = [Paragraph(f"<b>{h}</b>", styleN) for h in headers]
-    table_data = [header_row] + treatment_data
-    table = Table(table_data, colWidths=[0.8*inch, 0.8*inch, 4.6*inch, 0.8*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-    ]))
-    table.wrapOn(p, width, height)
-    table.drawOn(p, 0.5*inch, y_pos - 6.5*inch)
-
-    p.showPage()
-    p.save()
-    buffer.seek(0)
-    return buffer
-
 def extract_data_from_image(image_file):
     """
     Uses Llama 3.2 API to extract structured data from the uploaded image.
     """
     # img = Image.open(image_file)
     img = image_file  # Use the already opened PIL.Image object
-    prompt = """
-    Extract the information from the provided animal record image.
-    Return the data as a single JSON object.
-    The JSON object should have two main keys: "owner_info" and "animal_info".
-    The "treatment_data" should be a single string, with each entry on a new line.
-    Use the format 'Date|Weight|Treatment and Progress|Charge' for each line.
-    Even though a value is not present, use an empty string with same format.
-
-    Example format:
-    {
-      "owner_info": {
-        "Owner's Name": "value",
-        "Home Phone #": "value",
-        "Other Phone #": "value",
-        "Address": "value",
-        "Data Entry By": "value"
-      },
-      "animal_info": {
-        "Animal's Name": "value",
-        "Species": "value",
-        "Breed": "value",
-        "Colors and Markings": "value",
-        "Sex": "value",
-        "Age": "value",
-        "Date of Birth": "value"
-      },
-      "treatment_data": "6-9-25|19 lbs|yup rash on stomach / neck area...\\n||P fell while jumping on couch.\\n..."
-    }
-    """
+    # Key on the engine that will actually run: without Tesseract the "ocr" engine falls back to the model
+    engine = "ocr" if EXTRACTION_ENGINE == "ocr" and ocr_available() else "llm"
+    cache = get_extraction_cache()
+    cache_key = image_cache_key(img, engine_cache_version(engine))
+    cached_result = cache.get(cache_key)
+    if cached_result is not None:
+        return cached_result
     try:
-        with st.spinner('Analyzing document with Llama 3.2...'):
-            response = llama32_generate_content(prompt, img)
-            # Clean up the response to extract only the JSON part
-            json_str = response.text.strip().replace('```json', '').replace('```', '')
-            return json.loads(json_str)
+        if engine == "ocr":
+            with st.spinner('Reading form fields...'):
+                extraction = get_template_extractor().extract(img)
+            if extraction.escalated_fields:
+                st.info(f"Low OCR confidence, used Llama 3.2 for: {', '.join(extraction.escalated_fields)}")
+            result = extraction.result
+        else:
+            with st.spinner('Analyzing document with Llama 3.2...'):
+                response = llama32_generate_content(EXTRACTION_PROMPT, preprocess_for_model(img, PREPROCESS_CONFIG))
+                # Clean up the response to extract only the JSON part
+                result = parse_extraction_response(response.text)
+        cache.put(cache_key, result)
+        return result
+    except PreprocessingError as e:
+        st.error(f"The image could not be prepared for extraction: {e}")
+        return None
     except Exception as e:
         st.error(f"An error occurred while calling the Llama 3.2 API: {e}")
         return None
 
+@st.cache_resource
+def get_extraction_cache():
+    """Persistent cache of extraction results, keyed by image content and prompt version"""
+    return ExtractionCache()
+
+def get_model_backend():
+    """Vision model backend; uses the model server at MODEL_SERVER_URL if set"""
+    server_url = os.environ.get("MODEL_SERVER_URL")
+    return HTTPModelBackend(server_url) if server_url else LlamaBackend(llama32_generate_content)
+
+@st.cache_resource
+def get_template_extractor():
+    """OCR extractor for the West Highland form, falling back to the vision model"""
+    return TemplateExtractor(
+        get_model_backend(),
+        min_confidence=float(os.environ.get("OCR_MIN_CONFIDENCE", "70")),
+        preprocess=lambda image: preprocess_for_model(image, PREPROCESS_CONFIG)
+    )
+
+@st.cache_resource
+def get_extraction_queue():
+    """Shared extraction queue for batch uploads"""
+    return ExtractionQueue(
+        get_model_backend(),
+        workers=int(os.environ.get("EXTRACTION_WORKERS", "2")),
+        batch_size=int(os.environ.get("EXTRACTION_BATCH_SIZE", "4")),
+        cache=get_extraction_cache(),
+        preprocess=lambda image: preprocess_for_model(image, PREPROCESS_CONFIG),
+        cache_version=engine_cache_version("llm")  # The queue always runs the model
+    )
+
 # --- Streamlit App UI ---
 st.set_page_config(page_title="Llama 3.2 Animal Record Extractor", layout="wide")
 st.title("📄 Animal Record Extractor & Record Generator")
@@ -201,6 +151,66 @@ with col1:
                     st.session_state.form_data = extracted_data
                     st.success("Data extracted successfully!")
 
+    st.subheader("Batch extraction")
+    batch_files = st.file_uploader("Queue several chart images", type=["jpg", "jpeg", "png"],
+                                   accept_multiple_files=True, key="batch_files")
+    if batch_files and st.button("📥 Queue for extraction"):
+        extraction_queue = get_extraction_queue()
+        job_ids = st.session_state.setdefault("extraction_jobs", [])
+        for batch_file in batch_files:
+            batch_image = ImageOps.exif_transpose(Image.open(io.BytesIO(batch_file.getvalue())))
+            job_ids.append(extraction_queue.submit(batch_image, batch_file.name))
+        st.success(f"Queued {len(batch_files)} image(s).")
+
+    st.subheader("Import scanned PDF")
+    scanned_pdf = st.file_uploader("Multi-page PDF of chart scans", type=["pdf"], key="pdf_file")
+    if scanned_pdf is not None:
+        split_mode = st.radio("Split into records", ["One record per page", "Pages per record", "Page ranges"],
+                              horizontal=True)
+        pages_per_record, page_ranges = 1, None
+        if split_mode == "Pages per record":
+            pages_per_record = st.number_input("Pages per record", min_value=1, value=2)
+        elif split_mode == "Page ranges":
+            page_ranges = st.text_input("Page ranges, one record each", placeholder="1-2, 3, 4-6")
+        if st.button("📑 Import PDF") and collection is not None:
+            with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_temp:
+                pdf_temp.write(scanned_pdf.getvalue())
+                pdf_temp.flush()
+                try:
+                    for pages, record_id, record in ingest_pdf(
+                            pdf_temp.name, collection, extract_data_from_image, init_blob_store(),
+                            int(pages_per_record), page_ranges, source_filename=scanned_pdf.name):
+                        if record is None:
+                            st.error(f"Pages {pages[0]}-{pages[-1]}: extraction failed, no record saved")
+                            continue
+                        st.write(f"Pages {pages[0]}-{pages[-1]}: {record['owner_name'] or '?'} / "
+                                 f"{record['animal_name'] or '?'} (serial {record['serial_number']})")
+                except ValueError as e:
+                    st.error(str(e))
+
+    if st.session_state.get("extraction_jobs"):
+        extraction_queue = get_extraction_queue()
+        cache_stats = get_extraction_cache().stats()
+        st.caption(f"Extraction cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                   f"({cache_stats['hit_rate']:.0%} hit rate), {cache_stats['entries']} entries")
+        if st.button("🔄 Refresh status"):
+            st.rerun()
+        for job_id in list(st.session_state.extraction_jobs):
+            job = extraction_queue.status(job_id)
+            if job is None:
+                st.session_state.extraction_jobs.remove(job_id)
+                continue
+            job_col, action_col = st.columns([3, 1])
+            with job_col:
+                status = "cached" if job.cached else job.status
+                st.write(f"{job.filename}: {status}" + (f" ({job.error})" if job.status == FAILED else ""))
+            with action_col:
+                if job.status == DONE and st.button("Use", key=f"use_{job_id}"):
+                    st.session_state.form_data = job.result
+                    st.session_state.extraction_jobs.remove(job_id)
+                    extraction_queue.forget(job_id)
+                    st.rerun()
+
 with col2:
     st.header("2. Edit and Verify Data")
     form_data = st.session_state.form_data
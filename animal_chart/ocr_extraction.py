@@ -0,0 +1,211 @@
+import functools
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from PIL import Image, ImageOps
+
+from extraction import (EXTRACTION_PROMPT, TABLE_AND_PHONE_PROMPT, parse_extraction_response,
+                        parse_treatment_response)
+from form_layout import FORM_FIELDS, OWNER_INFO_BOX, TREATMENT_TABLE_BOX, field_value_box, to_pixels
+from image_preprocess import PreprocessingError, estimate_skew, find_document_box
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+# Aligned page size (US Letter at 300 dpi)
+PAGE_SIZE = (2550, 3300)
+# Fields with less dark-pixel coverage than this are treated as blank without running OCR
+BLANK_INK_RATIO = 0.004
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Shared process pool for OCR (Tesseract work is CPU bound)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.environ.get("OCR_WORKERS", str(os.cpu_count() or 2)))
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        return _executor
+
+
+@functools.lru_cache(maxsize=1)
+def ocr_available():
+    """True if pytesseract is installed and the tesseract binary can be run"""
+    if pytesseract is None:
+        return False
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def align_to_form(image):
+    """Deskew and crop a chart photo to the page and scale it to PAGE_SIZE in grayscale"""
+    gray = ImageOps.autocontrast(ImageOps.exif_transpose(image).convert("L"))
+    box = find_document_box(gray)
+    if box:
+        gray = gray.crop(box)
+    # Estimate on the inner page only; the desk showing in the corners would dominate the profile
+    inset_x, inset_y = gray.width // 10, gray.height // 10
+    angle = estimate_skew(gray.crop((inset_x, inset_y, gray.width - inset_x, gray.height - inset_y)))
+    if angle:
+        # Fill with the desk color so the second crop can find the straightened page edges
+        gray = gray.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=0)
+        box = find_document_box(gray)
+        if box:
+            gray = gray.crop(box)
+    return gray.resize(PAGE_SIZE, Image.LANCZOS)
+
+
+def ink_ratio(region, threshold=128, line_fill=0.6):
+    """Fraction of dark pixels in a grayscale region, ignoring printed rule lines"""
+    dark = region.point(lambda p: 255 if p < threshold else 0)
+    # Rows that are mostly dark belong to a printed line, not handwriting
+    rows = [value / 255.0 for value in dark.resize((1, dark.height), Image.BOX).getdata()]
+    return sum(value for value in rows if value < line_fill) / float(max(1, len(rows)))
+
+
+def stack_regions(page, boxes):
+    """Crop inch boxes from an aligned page and stack them vertically into one image"""
+    crops = [page.crop(to_pixels(box, page.size)) for box in boxes]
+    stacked = Image.new(page.mode, (max(crop.width for crop in crops), sum(crop.height for crop in crops)), 255)
+    top = 0
+    for crop in crops:
+        stacked.paste(crop, (0, top))
+        top += crop.height
+    return stacked
+
+
+def ocr_field(region):
+    """
+    OCR a single-line field region and return (text, confidence 0-100)
+
+    Runs in a worker process. Confidence is the lowest word confidence so a
+    single misread word sends the field to the fallback.
+    """
+    data = pytesseract.image_to_data(region, config="--psm 7", output_type=pytesseract.Output.DICT)
+    words, confidences = [], []
+    for text, confidence in zip(data["text"], data["conf"]):
+        text = text.strip().strip("_")
+        if text and float(confidence) >= 0:
+            words.append(text)
+            confidences.append(float(confidence))
+    if not words:
+        return "", 0.0
+    return " ".join(words), min(confidences)
+
+
+@dataclass
+class TemplateExtraction:
+    result: Dict
+    confidence: Dict[str, float] = field(default_factory=dict)
+    escalated_fields: List[str] = field(default_factory=list)
+    model_calls: int = 0
+
+
+class TemplateExtractor:
+    """
+    Extracts the West Highland form with OCR of its known field regions
+
+    Header fields are cropped from the aligned page and OCR'd in parallel in a
+    process pool. Fields below min_confidence, and the free-text treatment
+    table, are sent to the vision model backend. When every header field is
+    confident only the owner rows and the table go to the model, with a smaller
+    prompt; "Other Phone #" has no fixed region and is always read from there.
+    When most fields are below min_confidence the scan probably does not line
+    up with the form layout, so the model's reading is used for every field.
+    """
+
+    def __init__(self, backend=None, min_confidence=70.0, preprocess=None, executor=None,
+                 max_low_confidence_share=0.5):
+        """
+        Args:
+            backend: Object with generate_batch(prompt, images) -> list of response texts, or None for OCR only
+            min_confidence: Tesseract confidence below which a field is escalated to the model
+            preprocess: Optional function applied to images before they are sent to the model
+            executor: Executor for OCR work (default: shared process pool)
+            max_low_confidence_share: Share of low-confidence fields above which no OCR value is kept
+        """
+        self.backend = backend
+        self.min_confidence = min_confidence
+        self.preprocess = preprocess or (lambda image: image)
+        self.executor = executor
+        self.max_low_confidence_share = max_low_confidence_share
+
+    def ocr_fields(self, page):
+        """OCR every header field of an aligned page; returns {(group, name): (text, confidence)}"""
+        values, futures = {}, {}
+        executor = self.executor or _get_executor()
+        for form_field in FORM_FIELDS:
+            key = (form_field.group, form_field.name)
+            region = page.crop(to_pixels(field_value_box(form_field), page.size))
+            if ink_ratio(region) < BLANK_INK_RATIO:
+                values[key] = ("", 100.0)
+                continue
+            futures[key] = executor.submit(ocr_field, region)
+        for key, future in futures.items():
+            values[key] = future.result()
+        return values
+
+    def extract(self, image):
+        """
+        Return a TemplateExtraction whose result has the same shape as EXTRACTION_PROMPT's
+
+        Raises:
+            RuntimeError: Neither Tesseract nor a model backend is available, so nothing could be read
+        """
+        if self.backend is None and not ocr_available():
+            raise RuntimeError("No extractor available: Tesseract OCR is not installed and no model backend is set")
+        result = {
+            "owner_info": {"Owner's Name": "", "Home Phone #": "", "Other Phone #": "",
+                           "Address": "", "Data Entry By": ""},
+            "animal_info": {name: "" for group, name, *_ in FORM_FIELDS if group == "animal_info"},
+            "treatment_data": "",
+        }
+        extraction = TemplateExtraction(result=result)
+
+        if ocr_available():
+            try:
+                page = align_to_form(image)
+            except Exception as e:
+                raise PreprocessingError(f"page alignment failed: {e}") from e
+            for (group, name), (text, confidence) in self.ocr_fields(page).items():
+                result[group][name] = text
+                extraction.confidence[name] = confidence
+                if confidence < self.min_confidence:
+                    extraction.escalated_fields.append(name)
+            if len(extraction.escalated_fields) > self.max_low_confidence_share * len(FORM_FIELDS):
+                # Even confident fields are suspect when the regions missed the handwriting
+                extraction.escalated_fields = [form_field.name for form_field in FORM_FIELDS]
+        else:
+            page = None
+            extraction.escalated_fields = [form_field.name for form_field in FORM_FIELDS]
+
+        if self.backend is None:
+            return extraction
+
+        if extraction.escalated_fields or page is None:
+            response = self.backend.generate_batch(EXTRACTION_PROMPT, [self.preprocess(image)])[0]
+            model_result = parse_extraction_response(response)
+            for group, name, *_ in FORM_FIELDS:
+                if name in extraction.escalated_fields:
+                    result[group][name] = model_result.get(group, {}).get(name, "")
+            result["owner_info"]["Other Phone #"] = model_result.get("owner_info", {}).get("Other Phone #", "")
+            result["treatment_data"] = model_result.get("treatment_data", "")
+        else:
+            regions = stack_regions(page, (OWNER_INFO_BOX, TREATMENT_TABLE_BOX))
+            response = self.backend.generate_batch(TABLE_AND_PHONE_PROMPT, [self.preprocess(regions)])[0]
+            model_result = parse_extraction_response(response)
+            result["owner_info"]["Other Phone #"] = model_result.get("Other Phone #", "")
+            result["treatment_data"] = parse_treatment_response(model_result.get("treatment_data", ""))
+        extraction.model_calls = 1
+        return extraction
@@ -0,0 +1,207 @@
+"""
+Multi-page PDF ingestion for scanned animal records
+
+Pages are rasterized one at a time in a process pool with a bounded number of
+pages in flight, so memory stays flat regardless of the PDF's length. Pages
+are grouped into records (one per page, a fixed number per record or explicit
+page ranges) and each record goes through extraction and save_to_mongodb.
+
+    PYTHONPATH=. python animal_chart/pdf_ingest.py scans.pdf --pages-per-record 2 --dry-run
+"""
+import argparse
+import datetime
+import math
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from PyPDF2 import PdfReader
+from pdf2image import convert_from_path
+
+from blob_store import store_image
+from database_manager import init_blob_store, init_mongodb, next_serial_number, save_to_mongodb
+from extraction import HTTPModelBackend
+from ocr_extraction import TemplateExtractor, ocr_available
+
+DEFAULT_DPI = 200
+# Upper bound on rasterized page size (about US Letter at 300 dpi)
+DEFAULT_MAX_PIXELS = 2550 * 3300
+
+
+def page_count(pdf_path):
+    return len(PdfReader(pdf_path).pages)
+
+
+def page_dpi(pdf_path, page_number, dpi=DEFAULT_DPI, max_pixels=DEFAULT_MAX_PIXELS):
+    """Requested DPI, lowered if needed so the page stays under max_pixels"""
+    box = PdfReader(pdf_path).pages[page_number - 1].mediabox
+    width_in, height_in = float(box.width) / 72, float(box.height) / 72
+    return min(dpi, int(math.sqrt(max_pixels / (width_in * height_in))))
+
+
+def rasterize_page(pdf_path, page_number, dpi=DEFAULT_DPI, max_pixels=DEFAULT_MAX_PIXELS):
+    """Render a single page (1-based) to a PIL image; runs in a worker process"""
+    images = convert_from_path(
+        pdf_path, dpi=page_dpi(pdf_path, page_number, dpi, max_pixels),
+        first_page=page_number, last_page=page_number, thread_count=1
+    )
+    return images[0]
+
+
+def iter_pages(pdf_path, pages=None, dpi=DEFAULT_DPI, max_pixels=DEFAULT_MAX_PIXELS, workers=None,
+               max_in_flight=None):
+    """
+    Yield (page_number, image) for the given pages (default: all) in order
+
+    At most max_in_flight pages (default: twice the worker count) are rendered
+    or waiting to be consumed at any time.
+    """
+    workers = workers or int(os.environ.get("PDF_RASTER_WORKERS", str(min(4, os.cpu_count() or 1))))
+    max_in_flight = max_in_flight or workers * 2
+    remaining = deque(pages or range(1, page_count(pdf_path) + 1))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        while pending or remaining:
+            while remaining and len(pending) < max_in_flight:
+                page_number = remaining.popleft()
+                pending.append((page_number, executor.submit(rasterize_page, pdf_path, page_number, dpi, max_pixels)))
+            page_number, future = pending.popleft()
+            yield page_number, future.result()
+
+
+def parse_page_ranges(spec, total):
+    """Parse '1-2, 3, 4-6' into [[1, 2], [3], [4, 5, 6]]"""
+    groups = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        start, end = int(start), int(end or start)
+        if start < 1 or end > total or start > end:
+            raise ValueError(f"Invalid page range '{part}' for a {total}-page PDF")
+        groups.append(list(range(start, end + 1)))
+    return groups
+
+
+def plan_records(total, pages_per_record=1, page_ranges=None):
+    """Group page numbers into records"""
+    if page_ranges:
+        return parse_page_ranges(page_ranges, total)
+    return [list(range(start, min(start + pages_per_record, total + 1)))
+            for start in range(1, total + 1, pages_per_record)]
+
+
+def iter_page_groups(pdf_path, groups, **raster_options):
+    """Yield (page_numbers, images) per record, holding only the current record's pages"""
+    collected = {}
+    next_group = 0
+    pages = [page for group in groups for page in group]
+    for page_number, image in iter_pages(pdf_path, pages, **raster_options):
+        collected[page_number] = image
+        while next_group < len(groups) and all(page in collected for page in groups[next_group]):
+            group = groups[next_group]
+            yield group, [collected.pop(page) for page in group]
+            next_group += 1
+
+
+def record_from_extraction(result, source_filename, pages):
+    """Animal record fields (as saved by llamaApp) from an extraction result"""
+    owner_info = result.get("owner_info", {})
+    animal_info = result.get("animal_info", {})
+    return {
+        "owner_name": owner_info.get("Owner's Name", ""),
+        "address": owner_info.get("Address", ""),
+        "home_phone": owner_info.get("Home Phone #", ""),
+        "other_phone": owner_info.get("Other Phone #", ""),
+        "data_entry_by": owner_info.get("Data Entry By", ""),
+        "animal_name": animal_info.get("Animal's Name", ""),
+        "animal_species": animal_info.get("Species", ""),
+        "animal_sex": animal_info.get("Sex", ""),
+        "animal_age": animal_info.get("Age", ""),
+        "animal_breed": animal_info.get("Breed", ""),
+        "animal_color": animal_info.get("Colors and Markings", ""),
+        "treatment_entries": result.get("treatment_data", ""),
+        "source_pdf": source_filename,
+        "source_pages": pages,
+        "input_method": "pdf_import",
+        "created_at": datetime.datetime.now().isoformat(),
+    }
+
+
+def merge_extractions(results):
+    """Combine the extractions of a record's pages: header from the first page, treatment rows from all"""
+    results = [result or {} for result in results]  # a failed extraction leaves its page blank
+    merged = dict(results[0])
+    merged["treatment_data"] = "\n".join(r.get("treatment_data", "") for r in results if r.get("treatment_data"))
+    return merged
+
+
+def ingest_pdf(pdf_path, collection, extract, store=None, pages_per_record=1, page_ranges=None,
+               source_filename=None, dry_run=False, **raster_options):
+    """
+    Extract and save one animal record per page group; yields (pages, record_id, record)
+
+    A group whose pages all failed extraction is not saved and takes no serial
+    number; it is yielded as (pages, None, None) so the caller can report it.
+
+    Args:
+        extract: Function taking a page image and returning an extraction result dict, or None on failure
+        store: Optional blob store; the record's first page image is kept with it
+    """
+    source_filename = source_filename or os.path.basename(pdf_path)
+    groups = plan_records(page_count(pdf_path), pages_per_record, page_ranges)
+    for pages, images in iter_page_groups(pdf_path, groups, **raster_options):
+        results = [extract(image) for image in images]
+        if all(result is None for result in results):
+            yield pages, None, None
+            continue
+        record = record_from_extraction(merge_extractions(results), source_filename, pages)
+        if dry_run:
+            yield pages, None, record
+            continue
+        record["serial_number"] = next_serial_number(collection)
+        if store is not None:
+            record.update(store_image(store, images[0], f"{source_filename}-p{pages[0]}.png"))
+        yield pages, save_to_mongodb(record, collection), record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import scanned animal records from a PDF")
+    parser.add_argument("pdf")
+    parser.add_argument("--pages-per-record", type=int, default=1)
+    parser.add_argument("--page-ranges", help="Explicit records, e.g. '1-2,3,4-6'")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_DPI)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--model-url", default=os.environ.get("MODEL_SERVER_URL"),
+                        help="Vision model server used when OCR is not confident")
+    parser.add_argument("--dry-run", action="store_true", help="Extract and print records without saving")
+    args = parser.parse_args()
+
+    if not args.model_url and not ocr_available():
+        # Without either every record would be saved blank
+        sys.exit("No extractor available: install Tesseract OCR or pass --model-url (or set MODEL_SERVER_URL)")
+    extractor = TemplateExtractor(HTTPModelBackend(args.model_url) if args.model_url else None)
+    collection = store = None
+    if not args.dry_run:
+        collection, store = init_mongodb(), init_blob_store()
+        if collection is None:
+            sys.exit("Unable to connect to MongoDB")
+
+    failed = False
+    for pages, record_id, record in ingest_pdf(
+            args.pdf, collection, lambda image: extractor.extract(image).result, store,
+            args.pages_per_record, args.page_ranges, dry_run=args.dry_run, dpi=args.dpi, workers=args.workers):
+        if record is None:
+            print(f"pages {pages}: extraction failed, not saved", file=sys.stderr)
+            failed = True
+            continue
+        print(f"pages {pages}: {record['owner_name'] or '?'} / {record['animal_name'] or '?'}"
+              + (f" -> {record_id}" if record_id else ""))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
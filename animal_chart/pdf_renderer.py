@@ -0,0 +1,230 @@
+"""
+Animal record PDF rendering
+
+The static parts of the West Highland form (title, hospital block, field
+labels and rules) are drawn once per document as a form XObject and stamped
+on each record page, so a batch of records shares one copy of the template.
+Long treatment tables continue on extra pages with the header row repeated.
+"""
+import io
+import itertools
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Paragraph, Table, TableStyle
+
+from form_layout import FORM_FIELDS
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+MARGIN = 0.5 * inch
+TEMPLATE_NAME = "animal_record_template"
+# Reminders line, just above the treatment table on the first page; table top on continuation pages
+TABLE_TOP = PAGE_HEIGHT - 4.75 * inch
+CONTINUATION_TABLE_TOP = PAGE_HEIGHT - 1.2 * inch
+TABLE_COLUMN_WIDTHS = [0.8 * inch, 0.8 * inch, 4.6 * inch, 0.8 * inch]
+TABLE_HEADERS = ["Date", "Weight", "Treatment and Progress", "Charge"]
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+])
+
+_cell_style = getSampleStyleSheet()['Normal']
+_cell_style.wordWrap = 'CJK'
+
+
+def _field_font(form_field):
+    # The owner's name is emphasized on the paper form
+    return ("Helvetica-Bold", 12) if form_field.name == "Owner's Name" else ("Helvetica", 10)
+
+
+def _draw_template(p):
+    """Draw the parts of the form that are the same for every record"""
+    p.setFont("Helvetica-Bold", 18)
+    p.drawString(MARGIN, PAGE_HEIGHT - 0.7 * inch, "Animal Record")
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(PAGE_WIDTH - 3.5 * inch, PAGE_HEIGHT - 0.6 * inch, "WEST HIGHLAND DOG & CAT HOSPITAL")
+    p.setFont("Helvetica", 9)
+    p.drawString(PAGE_WIDTH - 3.5 * inch, PAGE_HEIGHT - 0.75 * inch, "1795 West Highland")
+    p.drawString(PAGE_WIDTH - 3.5 * inch, PAGE_HEIGHT - 0.9 * inch, "San Bernardino, CA 92407")
+    p.drawString(PAGE_WIDTH - 3.5 * inch, PAGE_HEIGHT - 1.05 * inch, "(909) 887-5021")
+
+    for form_field in FORM_FIELDS:
+        x, y = form_field.x * inch, PAGE_HEIGHT - form_field.line_y * inch
+        p.setFont(*_field_font(form_field))
+        p.drawString(x, y + 5, f"{form_field.name}:")
+        value_x = x + form_field.label_width * inch
+        p.line(value_x, y, value_x + form_field.field_width * inch, y)
+
+    p.setFont("Helvetica", 10)
+    p.drawString(MARGIN, TABLE_TOP + 5, "Reminders:")
+    p.line(MARGIN + 0.8 * inch, TABLE_TOP, PAGE_WIDTH - MARGIN, TABLE_TOP)
+
+
+def _ensure_template(p):
+    """Define the template XObject once per canvas"""
+    if not getattr(p, "_animal_record_template", False):
+        p.beginForm(TEMPLATE_NAME)
+        _draw_template(p)
+        p.endForm()
+        p._animal_record_template = True
+
+
+def treatment_table(treatment_data):
+    """Build the treatment table from 'Date|Weight|Treatment and Progress|Charge' lines or entry dicts"""
+    rows = [[Paragraph(f"<b>{h}</b>", _cell_style) for h in TABLE_HEADERS]]
+    if isinstance(treatment_data, str):
+        entries = [line.split('|') for line in treatment_data.strip().split('\n')]
+    else:
+        entries = [[str(entry.get("date") or ""), str(entry.get("weight") or ""),
+                    str(entry.get("treatment_progress") or ""), str(entry.get("charge") or "")]
+                   for entry in treatment_data or []]
+    for parts in entries:
+        rows.append([Paragraph(escape(parts[i]) if len(parts) > i else '', _cell_style) for i in range(4)])
+    table = Table(rows, colWidths=TABLE_COLUMN_WIDTHS, repeatRows=1)
+    table.setStyle(TABLE_STYLE)
+    return table
+
+
+def render_record(p, owner_info, animal_info, treatment_data):
+    """Draw one record on a canvas, adding continuation pages for long treatment tables"""
+    _ensure_template(p)
+    p.doForm(TEMPLATE_NAME)
+
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(MARGIN, PAGE_HEIGHT - 0.95 * inch, str(owner_info.get("Owner's Name") or ""))
+    values = dict(owner_info, **animal_info)
+    for form_field in FORM_FIELDS:
+        p.setFont(*_field_font(form_field))
+        p.drawString((form_field.x + form_field.label_width) * inch,
+                     PAGE_HEIGHT - form_field.line_y * inch + 5, str(values.get(form_field.name) or ""))
+
+    table = treatment_table(treatment_data)
+    available_width = PAGE_WIDTH - 2 * MARGIN
+    top = TABLE_TOP - 0.2 * inch
+    while True:
+        parts = table.split(available_width, top - MARGIN)
+        if not parts:
+            # Not even one row fits (an unusually tall row); draw it anyway rather than loop forever
+            parts = [table]
+        part = parts[0]
+        _width, height = part.wrapOn(p, available_width, top - MARGIN)
+        part.drawOn(p, MARGIN, top - height)
+        p.showPage()
+        if len(parts) < 2:
+            break
+        table = parts[1]
+        p.setFont("Helvetica-Bold", 12)
+        owner_name, animal_name = owner_info.get("Owner's Name") or "", animal_info.get("Animal's Name") or ""
+        p.drawString(MARGIN, PAGE_HEIGHT - 0.7 * inch, f"Animal Record (continued) - {owner_name} / {animal_name}")
+        top = CONTINUATION_TABLE_TOP
+
+
+def create_animal_record_pdf(owner_info, animal_info, treatment_data_str):
+    """Render a single record to a PDF and return it as a BytesIO"""
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    render_record(p, owner_info, animal_info, treatment_data_str)
+    p.save()
+    buffer.seek(0)
+    return buffer
+
+
+# Record fields record_to_pdf_fields and record_pdf_filename read; project exports down to these
+PDF_FIELDS = ("serial_number", "owner_name", "home_phone", "address", "data_entry_by", "animal_name",
+              "animal_species", "species", "animal_breed", "breed", "animal_color", "colors_markings",
+              "animal_sex", "sex", "animal_age", "age", "date_of_birth", "treatment_entries")
+PDF_PROJECTION = {field: 1 for field in PDF_FIELDS}
+
+
+def record_to_pdf_fields(record):
+    """(owner_info, animal_info, treatment_data) for a saved record from either entry form"""
+    owner_info = {
+        "Owner's Name": record.get("owner_name", ""),
+        "Home Phone #": record.get("home_phone", ""),
+        "Address": record.get("address", ""),
+        "Data Entry By": record.get("data_entry_by", ""),
+    }
+    animal_info = {
+        "Animal's Name": record.get("animal_name", ""),
+        "Species": record.get("animal_species") or record.get("species", ""),
+        "Breed": record.get("animal_breed") or record.get("breed", ""),
+        "Colors and Markings": record.get("animal_color") or record.get("colors_markings", ""),
+        "Sex": record.get("animal_sex") or record.get("sex", ""),
+        "Age": record.get("animal_age") or record.get("age", ""),
+        "Date of Birth": record.get("date_of_birth") or "",
+    }
+    return owner_info, animal_info, record.get("treatment_entries") or ""
+
+
+def render_records_pdf(records):
+    """Render many records (dicts as stored in MongoDB) into one PDF; returns a BytesIO"""
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    for record in records:
+        render_record(p, *record_to_pdf_fields(record))
+    p.save()
+    buffer.seek(0)
+    return buffer
+
+
+def _render_chunk_bytes(records):
+    return [create_animal_record_pdf(*record_to_pdf_fields(record)).getvalue() for record in records]
+
+
+def record_pdf_filename(record, index):
+    """Zip entry name; the position keeps it unique when serial numbers repeat or are missing"""
+    serial_number = record.get("serial_number") or "no-serial"
+    name = f"{index + 1:05d}-{serial_number}-{record.get('animal_name') or 'Unknown'}"
+    return f"Animal-Record-{name}.pdf".replace("/", "-")
+
+
+def _chunks(records, chunk_size):
+    """Lists of up to chunk_size picklable records (without _id), read lazily from records"""
+    records = iter(records)
+    while True:
+        chunk = [{key: value for key, value in record.items() if key != "_id"}
+                 for record in itertools.islice(records, chunk_size)]
+        if not chunk:
+            return
+        yield chunk
+
+
+def render_records_zip(records, workers=None, chunk_size=8):
+    """
+    Render each record to its own PDF in a process pool and return a zip of them as a BytesIO
+
+    records may be a cursor: it is read as rendering progresses, with at most two
+    chunks per worker in flight, instead of being loaded up front.
+    """
+    workers = workers or int(os.environ.get("PDF_RENDER_WORKERS", str(os.cpu_count() or 2)))
+    buffer = io.BytesIO()
+    index = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+            zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        pending = deque()
+
+        def write_oldest():
+            nonlocal index
+            chunk, future = pending.popleft()
+            for record, pdf_bytes in zip(chunk, future.result()):
+                archive.writestr(record_pdf_filename(record, index), pdf_bytes)
+                index += 1
+
+        for chunk in _chunks(records, chunk_size):
+            pending.append((chunk, executor.submit(_render_chunk_bytes, chunk)))
+            if len(pending) >= 2 * workers:
+                write_oldest()
+        while pending:
+            write_oldest()
+    buffer.seek(0)
+    return buffer
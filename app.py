@@ -3,31 +3,38 @@
 """
 Main application entry point with Streamlit UI
 """
+import uuid
 import streamlit as st
 from soap_note_manager import SOAPNoteManager
+import metrics
 
 def get_next_patient_id(manager):
-    """Generate next patient ID as Pxxxx (xxxx: 0001-9999)"""
-    patients = manager.db_manager.patients_collection.find().sort("patient_id", -1)
-    last_id = None
-    for p in patients:
-        last_id = p["patient_id"]
-        break
-    if last_id and last_id.startswith("P"):
-        num = int(last_id[1:])
-        next_num = num + 1
-    else:
-        next_num = 1
-    return f"P{next_num:04d}"
+    """Preview the next patient ID as Pxxxx (reserved only when the patient is saved)"""
+    return manager.db_manager.peek_next_patient_id()
+
+@st.fragment(run_every=1.0)
+def dictation_results(manager):
+    """Apply phrases recognized in the background; reruns every second without blocking the page"""
+    if not manager.process_dictation_results():
+        st.rerun()  # Session ended: redraw the page without the polling fragment
+    for line in manager.dictation_log[-20:]:
+        st.write(line)
 
 def main():
     """Main function to run the SOAP notes application with Streamlit UI"""
     st.set_page_config(page_title="Medical SOAP Notes Manager", layout="centered")
     st.title("Medical SOAP Notes Manager")
 
+    # Serve /metrics and /metrics.json when SOAP_METRICS_PORT is set (once per process)
+    metrics.start_http_server_from_env()
+
+    # Keep the draft owner in the URL so a page reload or reconnect still owns its drafts
+    if "session" not in st.query_params:
+        st.query_params["session"] = uuid.uuid4().hex
+
     # Initialize the manager in session state
     if "manager" not in st.session_state:
-        st.session_state.manager = SOAPNoteManager()
+        st.session_state.manager = SOAPNoteManager(warm_cache=True, session_id=st.query_params["session"])
         st.session_state.manager.add_patient("P0001", "John Doe", "1980-05-15", "555-1234")
         st.session_state.manager.add_doctor("D001", "Dr. Smith", "Family Medicine", "555-5678")
 
@@ -56,6 +63,30 @@ def main():
                 manager.start_new_note(patient_id, doctor_id)
                 st.success(f"Started new note for patient {patient_id} by doctor {doctor_id}")
 
+        # Notes autosaved but never saved (e.g. after a reload, a crashed worker or in another tab)
+        drafts = [draft for draft in manager.open_drafts() if draft["_id"] != manager.current_draft_id]
+        if drafts:
+            st.subheader("Unsaved drafts")
+            for draft in drafts:
+                col_info, col_resume, col_discard = st.columns([3, 1, 1])
+                claimable = manager.can_resume_draft(draft)
+                with col_info:
+                    st.write(f"Patient {draft['patient_id']} / {draft['doctor_id']}, "
+                             f"last edited {draft['updated_at']:%Y-%m-%d %H:%M}"
+                             + ("" if claimable else " (open in another session)"))
+                with col_resume:
+                    if claimable:
+                        if st.button("Resume", key=f"resume_{draft['_id']}"):
+                            manager.resume_draft(draft["_id"])
+                            st.rerun()
+                    elif st.button("Take over", key=f"take_over_{draft['_id']}"):
+                        manager.resume_draft(draft["_id"], take_over=True)
+                        st.rerun()
+                with col_discard:
+                    if claimable and st.button("Discard", key=f"discard_{draft['_id']}"):
+                        manager.discard_draft(draft["_id"])
+                        st.rerun()
+
     elif choice == "Manual Dictation":
         
         # subjective = st.text_area("Subjective")
@@ -76,11 +107,19 @@ def main():
     
     
     elif choice == "Voice Dictation":
-        if st.button("Begin Voice Dictation"):
-            manager.start_voice_dictation_session()
-            st.info("Voice Dictation session started.")
-        
-            
+        if not manager.dictation_active and st.button("Begin Voice Dictation"):
+            if manager.start_voice_dictation_session():
+                st.info("Voice Dictation session started.")
+        if manager.dictation_active:
+            if st.button("Stop Voice Dictation"):
+                manager.stop_dictation_session()
+                st.rerun()
+            dictation_results(manager)
+        else:
+            # What the last session heard
+            for line in manager.dictation_log[-20:]:
+                st.write(line)
+
 
     elif choice == "Save current note":
         if st.button("Save Note"):
@@ -100,10 +139,13 @@ def main():
     elif choice == "Search notes":
         with st.form("search_notes_form"):
             query = st.text_input("Enter search query")
+            field = st.selectbox("Section", ["all", "subjective", "objective", "assessment", "plan"])
+            page = st.number_input("Page", min_value=1, value=1)
             submitted = st.form_submit_button("Search")
             if submitted:
-                notes = manager.search_notes(query)
-                st.write(f"Found {len(notes)} notes matching '{query}'")
+                page_size = 20
+                notes = manager.search_notes(query, field, limit=page_size, skip=(page - 1) * page_size)
+                st.write(f"Page {page}: {len(notes)} notes matching '{query}'")
                 for note in notes:
                     st.write(f"Patient: {note['patient_id']}, Date: {note['date']}")
 
@@ -122,6 +164,7 @@ def main():
             submitted = st.form_submit_button("Add Patient")
             if submitted:
                 dob_str = dob.strftime("%Y-%m-%d")
+                next_patient_id = manager.db_manager.allocate_patient_id()
                 success = manager.add_patient(next_patient_id, name, dob_str, contact)
                 if success:
                     st.success(f"Patient {name} added successfully with ID {next_patient_id}!")
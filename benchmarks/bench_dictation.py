@@ -0,0 +1,114 @@
+"""
+Offline dictation benchmark
+
+Generates WAV fixtures with matching transcripts, then times the dictation path
+(capture -> recognize -> categorize) with the fixture recognizer backend, both
+phrase-by-phrase and through the background capture pipeline. Needs no network
+and no microphone.
+
+Usage:
+    python benchmarks/bench_dictation.py --phrases 200 --workers 4
+"""
+import argparse
+import json
+import math
+import os
+import struct
+import sys
+import tempfile
+import time
+import wave
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from models import SOAPNote
+from speech_recognition_manager import SpeechRecognitionManager
+from text_processor import TextProcessor
+
+PHRASES = [
+    "patient reports sharp pain in the lower back",
+    "blood pressure is one thirty over eighty five",
+    "impression is likely lumbar strain",
+    "plan to prescribe ibuprofen and follow up in two weeks",
+    "complains of stiffness in the morning",
+    "temperature ninety eight point six on examination",
+    "rule out disc herniation",
+    "recommend physical therapy twice a week",
+]
+
+
+def write_fixtures(directory: str, count: int, sample_rate: int = 16000, seconds: float = 0.5):
+    """Write count WAV files with distinct tones and a transcript next to each"""
+    frames = int(sample_rate * seconds)
+    for i in range(count):
+        frequency = 220 + i  # distinct audio per phrase so fingerprints differ
+        samples = (int(8000 * math.sin(2 * math.pi * frequency * n / sample_rate)) for n in range(frames))
+        base = os.path.join(directory, f"phrase_{i:05d}")
+        with wave.open(base + ".wav", "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(b"".join(struct.pack("<h", s) for s in samples))
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(PHRASES[i % len(PHRASES)])
+
+
+def bench_sequential(directory: str) -> dict:
+    manager = SpeechRecognitionManager.from_fixture_directory(directory)
+    processor = TextProcessor()
+    note = SOAPNote("P0001", "D001", datetime.now())
+    phrases = 0
+    start = time.perf_counter()
+    while True:
+        text = manager.listen_for_speech()
+        if not text and manager.source_exhausted:
+            break
+        if text:
+            processor.categorize_text(text, note)
+            phrases += 1
+    elapsed = time.perf_counter() - start
+    return {"mode": "sequential", "phrases": phrases, "seconds": elapsed,
+            "phrases_per_second": phrases / elapsed if elapsed else 0.0}
+
+
+def bench_pipeline(directory: str, workers: int) -> dict:
+    manager = SpeechRecognitionManager.from_fixture_directory(directory)
+    processor = TextProcessor()
+    note = SOAPNote("P0001", "D001", datetime.now())
+    phrases = 0
+    start = time.perf_counter()
+    pipeline = manager.start_background_capture(workers=workers)
+    for result in pipeline.results():
+        if result.text:
+            processor.categorize_text(result.text, note)
+            phrases += 1
+    elapsed = time.perf_counter() - start
+    return {"mode": f"pipeline[{workers}]", "phrases": phrases, "seconds": elapsed,
+            "phrases_per_second": phrases / elapsed if elapsed else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--phrases", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--fixtures", help="Existing fixture directory (name.wav + name.txt)")
+    parser.add_argument("--stages", action="store_true", help="Also print per-stage latency metrics")
+    args = parser.parse_args()
+    if args.stages:
+        metrics.enable()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.fixtures
+        if not directory:
+            directory = tmp
+            write_fixtures(directory, args.phrases)
+        results = [bench_sequential(directory), bench_pipeline(directory, args.workers)]
+    print(json.dumps(results, indent=2))
+    if args.stages:
+        print(json.dumps(metrics.REGISTRY.snapshot()["stages"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
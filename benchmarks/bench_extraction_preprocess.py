@@ -0,0 +1,240 @@
+"""
+Extraction preprocessing benchmark
+
+Compares sending raw chart photos to the vision model against sending them
+through image_preprocess at several token budgets. Reports preprocessing time,
+request payload size, model round-trip latency and, when expected results are
+available, field-level extraction accuracy.
+
+Fixtures are a directory of chart photos (name.jpg / name.png), each with a
+name.json holding the expected extraction (owner_info / animal_info). Without
+--fixtures, labelled synthetic 12 MP chart photos are generated: each field is
+printed at its own text size and the expected values are known.
+
+Without --model-url, a local fake model server is started. For synthetic
+photos it answers with the photo's expected values, blanking every field whose
+printed text would be smaller than MIN_LEGIBLE_PX in the image it received, so
+field_accuracy shows how much each budget shrinks the text (a stand-in for a
+real model's legibility limit, not a measurement of one).
+
+Usage:
+    python benchmarks/bench_extraction_preprocess.py --fixtures charts/ --model-url http://gpu:8000
+"""
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+# synthetic_data needs the project root (models); the animal chart modules come first
+sys.path[:0] = [os.path.join(ROOT, "animal_chart"), BENCHMARKS_DIR, ROOT]
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+from extraction import EXTRACTION_PROMPT, HTTPModelBackend, encode_image, parse_extraction_response
+from fake_model_server import start_fake_model_server
+from image_preprocess import PreprocessConfig, preprocess_for_model
+import synthetic_data
+
+FIELD_GROUPS = ("owner_info", "animal_info")
+# Smallest text height (pixels) the fake model reads in a synthetic photo
+MIN_LEGIBLE_PX = 9
+# Text heights, in pixels of the 2550 x 3300 page, that synthetic fields are printed at
+FIELD_TEXT_PX = (24, 32, 40, 56)
+
+
+def synthetic_expected(rng):
+    """Expected extraction of a synthetic chart"""
+    species = rng.choice(list(synthetic_data.SPECIES_BREEDS))
+    return {
+        "owner_info": {
+            "Owner's Name": f"{rng.choice(synthetic_data.FIRST_NAMES)} {rng.choice(synthetic_data.LAST_NAMES)}",
+            "Home Phone #": f"(909) 555-{rng.randint(0, 9999):04d}",
+        },
+        "animal_info": {
+            "Animal's Name": rng.choice(synthetic_data.PET_NAMES),
+            "Species": species,
+            "Breed": rng.choice(synthetic_data.SPECIES_BREEDS[species]),
+            "Age": str(rng.randint(1, 15)),
+        },
+    }
+
+
+def synthetic_chart(seed, size=(3024, 4032)):
+    """
+    A phone-style photo of a lined chart form: skewed, off-center, on a dark desk
+
+    Returns:
+        (photo, expected extraction, {field name: text height in page pixels}, page height in the photo)
+    """
+    rng = random.Random(seed)
+    expected = synthetic_expected(rng)
+    page = Image.new("L", (2550, 3300), 242)
+    draw = ImageDraw.Draw(page)
+    text_px = {}
+    y = 120
+    for group in FIELD_GROUPS:
+        for name, value in expected[group].items():
+            height = text_px[name] = rng.choice(FIELD_TEXT_PX)
+            draw.text((140, y), f"{name}: {value}", fill=20, font=ImageFont.load_default(size=height))
+            y += height + 40
+    for y in range(y + 60, 3100, 70):
+        draw.line((120, y + 30, 2430, y + 30), fill=40, width=3)
+        words = rng.randint(3, 12)
+        x = 140
+        for _ in range(words):
+            width = rng.randint(60, 220)
+            draw.rectangle((x, y, x + width, y + 22), fill=rng.randint(10, 80))
+            x += width + 30
+    page = page.rotate(rng.uniform(-4, 4), expand=True, fillcolor=0).convert("RGB")
+    page = page.resize((int(page.width * 1.05), int(page.height * 1.05)))
+    photo = Image.new("RGB", size, (70, 55, 45))
+    photo.paste(page, (rng.randint(0, 200), rng.randint(0, 300)))
+    return photo, expected, text_px, page.height
+
+
+class SyntheticChartModel:
+    """
+    Fake-model responder for synthetic charts
+
+    Answers with the expected values of the chart being sent (set with expect()),
+    leaving out fields whose text is below MIN_LEGIBLE_PX at the received size.
+    """
+
+    def __init__(self):
+        self.chart = None
+
+    def expect(self, chart):
+        self.chart = chart
+
+    def __call__(self, image_bytes):
+        expected, text_px, page_height = self.chart
+        # Preprocessing crops to the page, so its height approximates the page's at the received scale
+        scale = min(1.0, Image.open(io.BytesIO(image_bytes)).height / page_height)
+        return {group: {name: value if text_px[name] * scale >= MIN_LEGIBLE_PX else ""
+                        for name, value in fields.items()}
+                for group, fields in expected.items()}
+
+
+def load_fixtures(directory):
+    fixtures = []
+    for filename in sorted(os.listdir(directory)):
+        base, extension = os.path.splitext(filename)
+        if extension.lower() not in (".jpg", ".jpeg", ".png"):
+            continue
+        expected_path = os.path.join(directory, base + ".json")
+        expected = None
+        if os.path.exists(expected_path):
+            with open(expected_path, encoding="utf-8") as f:
+                expected = json.load(f)
+        image = ImageOps.exif_transpose(Image.open(os.path.join(directory, filename)))
+        image.load()
+        fixtures.append((filename, image, expected))
+    return fixtures
+
+
+def _normalize(value):
+    return " ".join(str(value or "").lower().split())
+
+
+def field_accuracy(expected, actual):
+    """(matching fields, compared fields) over owner_info and animal_info"""
+    matched = compared = 0
+    for group in FIELD_GROUPS:
+        for key, value in (expected.get(group) or {}).items():
+            compared += 1
+            if _normalize(value) == _normalize((actual.get(group) or {}).get(key)):
+                matched += 1
+    return matched, compared
+
+
+def run_variant(name, fixtures, backend, config, before_request=None):
+    """
+    Args:
+        before_request: Called with each fixture's filename before its model request
+    """
+    prep_seconds, payload_bytes, model_seconds = [], [], []
+    matched = compared = 0
+    for filename, image, expected in fixtures:
+        if before_request:
+            before_request(filename)
+        start = time.perf_counter()
+        prepared = preprocess_for_model(image, config) if config else image
+        prep_seconds.append(time.perf_counter() - start)
+        payload_bytes.append(len(encode_image(prepared)))
+
+        start = time.perf_counter()
+        response = backend.generate_batch(EXTRACTION_PROMPT, [prepared])[0]
+        model_seconds.append(time.perf_counter() - start)
+
+        if expected is not None:
+            try:
+                result = parse_extraction_response(response)
+            except ValueError:
+                result = {}
+            group_matched, group_compared = field_accuracy(expected, result)
+            matched += group_matched
+            compared += group_compared
+
+    return {
+        "variant": name,
+        "images": len(fixtures),
+        "prep_ms_median": statistics.median(prep_seconds) * 1000,
+        "payload_kb_median": statistics.median(payload_bytes) / 1024,
+        "model_ms_median": statistics.median(model_seconds) * 1000,
+        "total_ms_median": statistics.median(p + m for p, m in zip(prep_seconds, model_seconds)) * 1000,
+        "field_accuracy": matched / compared if compared else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extraction preprocessing benchmark")
+    parser.add_argument("--fixtures", help="Directory of chart photos with expected .json results")
+    parser.add_argument("--synthetic", type=int, default=4, help="Synthetic photos when no fixtures are given")
+    parser.add_argument("--model-url", help="Model server implementing /generate_batch (default: fake server)")
+    parser.add_argument("--budgets", default="800,1600,3200", help="Comma separated image-token budgets")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    charts = {}
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+    else:
+        fixtures = []
+        for i in range(args.synthetic):
+            photo, expected, text_px, page_height = synthetic_chart(i)
+            fixtures.append((f"synthetic-{i}", photo, expected))
+            charts[f"synthetic-{i}"] = (expected, text_px, page_height)
+
+    server = before_request = None
+    model_url = args.model_url
+    if not model_url:
+        # Requests are sent one at a time, so the responder knows which chart it is looking at
+        responder = SyntheticChartModel() if charts else None
+        before_request = (lambda filename: responder.expect(charts[filename])) if responder else None
+        server, model_url = start_fake_model_server(responder=responder)
+    backend = HTTPModelBackend(model_url)
+
+    variants = [("raw", None)]
+    for budget in (int(b) for b in args.budgets.split(",")):
+        variants.append((f"preprocessed[{budget} tokens]", PreprocessConfig(max_tokens=budget)))
+        variants.append((f"binarized[{budget} tokens]", PreprocessConfig(max_tokens=budget, binarize=True)))
+
+    results = [run_variant(name, fixtures, backend, config, before_request) for name, config in variants]
+    if server:
+        server.shutdown()
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
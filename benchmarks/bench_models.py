@@ -0,0 +1,119 @@
+"""
+Model memory and serialization benchmark
+
+Compares the slotted models in models.py with the previous asdict-based
+dataclasses (reproduced below as the baseline) for encounters of growing
+length: memory held by one open note, measured with tracemalloc, and the time
+to turn it into the document that is saved.
+
+Usage:
+    python benchmarks/bench_models.py --entries 50,200,1000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import SOAPNote, TranscriptEntry
+
+PHRASES = [
+    "patient reports sharp pain in the lower back",
+    "blood pressure is one thirty over eighty five",
+    "impression is likely lumbar strain",
+    "plan to prescribe ibuprofen and follow up in two weeks",
+]
+
+
+@dataclass
+class BaselineTranscriptEntry:
+    timestamp: datetime
+    speaker: str
+    text: str
+    section: str = ""
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class BaselineSOAPNote:
+    patient_id: str
+    doctor_id: str
+    date: datetime
+    subjective: str = ""
+    objective: str = ""
+    assessment: str = ""
+    plan: str = ""
+    raw_transcript: List[Dict] = None
+
+    def __post_init__(self):
+        if self.raw_transcript is None:
+            self.raw_transcript = []
+
+    def to_dict(self):
+        return asdict(self)
+
+    def add_transcript_entry(self, entry: BaselineTranscriptEntry):
+        self.raw_transcript.append(entry.to_dict())
+
+
+def build_note(note_class, entry_class, entries: int):
+    start = datetime(2025, 1, 1, 9, 0)
+    note = note_class("P0001", "D001", start)
+    for i in range(entries):
+        # Fresh strings per entry, as recognized speech would be
+        text = "".join([PHRASES[i % len(PHRASES)], " "])
+        note.add_transcript_entry(entry_class(start + timedelta(seconds=5 * i), "doctor", text))
+    return note
+
+
+def note_memory(note_class, entry_class, entries: int) -> int:
+    """Bytes still allocated after building one note"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    note = build_note(note_class, entry_class, entries)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del note
+    return size
+
+
+def serialize_seconds(note, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        note.to_dict()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", default="50,200,1000", help="Comma separated transcript lengths")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    results = []
+    for entries in (int(n) for n in args.entries.split(",")):
+        row = {"entries": entries}
+        for label, note_class, entry_class in (("baseline", BaselineSOAPNote, BaselineTranscriptEntry),
+                                               ("slots", SOAPNote, TranscriptEntry)):
+            note = build_note(note_class, entry_class, entries)
+            row[f"{label}_bytes_per_note"] = note_memory(note_class, entry_class, entries)
+            row[f"{label}_to_dict_ms"] = serialize_seconds(note, args.repeat) * 1000
+        row["memory_ratio"] = row["slots_bytes_per_note"] / row["baseline_bytes_per_note"]
+        row["to_dict_speedup"] = row["baseline_to_dict_ms"] / row["slots_to_dict_ms"]
+        results.append(row)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Benchmark suite for the hot paths of the SOAP notes and animal chart apps
+
+Loads deterministic synthetic data at several sizes and times text
+categorization, note saving, search and per-patient lookup, animal record
+search and PDF rendering. Runs against a local mongod (--mongodb-uri) or, by
+default, the in-memory mongomock stand-in. Results are written as JSON; pass
+--baseline with an earlier result file to print the change per benchmark.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 100,1000 --output results.json
+    python benchmarks/run_benchmarks.py --mongodb-uri mongodb://localhost:27017/ --baseline results.json
+    python benchmarks/run_benchmarks.py --storage sqlite --only notes
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANIMAL_CHART = os.path.join(ROOT, "animal_chart")
+sys.path.insert(0, ROOT)
+sys.path.insert(1, os.path.dirname(os.path.abspath(__file__)))
+# animal_chart modules come after the root so "database_manager" resolves to the SOAP notes one;
+# the animal chart's is imported as animal_chart.database_manager
+sys.path.append(ANIMAL_CHART)
+
+import pymongo
+
+import synthetic_data
+from database_manager import DatabaseManager
+import animal_chart.database_manager as animal_db
+from models import SOAPNote
+from sqlite_database_manager import SQLiteDatabaseManager
+from text_processor import TextProcessor
+
+BENCH_DB = "soapnote_benchmark"
+
+# The managers report through st.* calls; outside `streamlit run` each one logs a bare-mode warning
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(lambda record: False)
+
+
+def make_client(uri):
+    if uri:
+        return pymongo.MongoClient(uri)
+    import mongomock
+    return mongomock.MongoClient()
+
+
+def timed(function, repeat):
+    """Call function repeat times and return per-call durations in milliseconds"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def summarize(name, size, durations, **extra):
+    ordered = sorted(durations)
+    return {
+        "name": name,
+        "size": size,
+        "calls": len(durations),
+        "mean_ms": statistics.fmean(durations),
+        "median_ms": statistics.median(durations),
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        **extra,
+    }
+
+
+def bench_categorize(size, repeat):
+    processor = TextProcessor()
+    rng = random.Random(size)
+    utterances = [synthetic_data.utterance(rng) for _ in range(size)]
+    note = SOAPNote("P0001", "D001", datetime.now())
+
+    def categorize_all():
+        for text in utterances:
+            processor.categorize_text(text, note)
+        note.subjective = note.objective = note.assessment = note.plan = ""
+
+    return summarize("TextProcessor.categorize_text", size, timed(categorize_all, repeat),
+                     per_item_us=statistics.median(timed(categorize_all, 1)) * 1000 / size)
+
+
+def open_notes_backend(storage, client, search_backend, directory, size):
+    """A fresh storage backend for one data size, and the label its search results are reported under"""
+    if storage == "sqlite":
+        return SQLiteDatabaseManager(os.path.join(directory, f"{BENCH_DB}-{size}.db")), "sqlite"
+    client.drop_database(BENCH_DB)
+    return DatabaseManager(client=client, db_name=BENCH_DB, search_backend=search_backend), search_backend
+
+
+def bench_notes(db_manager, search_label, size, repeat):
+    patient_count = max(10, size // 10)
+    for patient in synthetic_data.patients(patient_count):
+        db_manager.add_patient(patient)
+    for doctor in synthetic_data.doctors(20):
+        db_manager.add_doctor(doctor)
+    notes = list(synthetic_data.soap_notes(size, patient_count, 20))
+
+    save_durations = []
+    for note in notes:
+        start = time.perf_counter()
+        db_manager.save_soap_note(note)
+        save_durations.append((time.perf_counter() - start) * 1000)
+
+    rng = random.Random(size)
+    queries = [" ".join(synthetic_data.utterance(rng).split()[:2]) for _ in range(repeat)]
+    search_durations = timed(lambda: db_manager.search_notes(queries[rng.randrange(len(queries))], limit=20),
+                             repeat)
+    patient_durations = timed(
+        lambda: db_manager.get_patient_notes(f"P{rng.randint(1, patient_count):04d}", limit=10), repeat)
+
+    transcript_lengths = [len(note.raw_transcript) for note in notes]
+    return [
+        summarize("DatabaseManager.save_soap_note", size, save_durations,
+                  median_transcript_entries=statistics.median(transcript_lengths)),
+        summarize(f"DatabaseManager.search_notes[{search_label}]", size, search_durations),
+        summarize("DatabaseManager.get_patient_notes", size, patient_durations),
+    ]
+
+
+def bench_animal_records(client, size, repeat):
+    collection = client[BENCH_DB].animal_records
+    collection.drop()
+    animal_db._create_indexes(collection)
+    collection.insert_many([dict(record, search_keys=animal_db.search_keys(record))
+                            for record in synthetic_data.animal_records(size)])
+    rng = random.Random(size)
+    terms = [rng.choice(synthetic_data.PET_NAMES) for _ in range(repeat)]
+    if not animal_db.search_records(collection, terms[0]):
+        # search_records reports errors and returns []; timing that would measure nothing
+        raise RuntimeError(f"search_records found no record named {terms[0]!r}")
+    durations = timed(lambda: animal_db.search_records(collection, terms[rng.randrange(len(terms))]), repeat)
+    return summarize("search_records", size, durations)
+
+
+def bench_pdf(size, repeat):
+    from pdf_renderer import create_animal_record_pdf, record_to_pdf_fields
+    records = list(synthetic_data.animal_records(size, with_images=False))
+    fields = [record_to_pdf_fields(record) for record in records]
+
+    def render_all():
+        for owner_info, animal_info, treatment in fields:
+            create_animal_record_pdf(owner_info, animal_info, treatment)
+
+    return summarize("create_animal_record_pdf", size, timed(render_all, repeat),
+                     per_record_ms=statistics.median(timed(render_all, 1)) / size)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Print each benchmark's median against the same benchmark in a baseline file"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+    print(f"\n{'benchmark':<45} {'size':>7} {'baseline':>10} {'now':>10} {'change':>8}")
+    for result in results:
+        before = baseline.get((result["name"], result["size"]))
+        if not before:
+            continue
+        change = (result["median_ms"] - before["median_ms"]) / before["median_ms"] * 100 if before["median_ms"] else 0
+        print(f"{result['name']:<45} {result['size']:>7} {before['median_ms']:>9.2f}ms "
+              f"{result['median_ms']:>9.2f}ms {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SOAP notes / animal chart benchmark suite")
+    parser.add_argument("--sizes", default="100,1000", help="Comma separated data sizes")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed calls per query benchmark")
+    parser.add_argument("--pdf-size", type=int, default=50, help="Records rendered per PDF benchmark run")
+    parser.add_argument("--mongodb-uri", help="Benchmark against this mongod (default: in-memory mongomock)")
+    parser.add_argument("--storage", choices=["mongodb", "sqlite"], default="mongodb",
+                        help="Backend for the notes benchmarks (sqlite uses a temporary file)")
+    parser.add_argument("--search-backend", choices=["text", "memory"],
+                        help="Default: text with a real mongod, memory with mongomock (no $text support)")
+    parser.add_argument("--only", help="Comma separated benchmark groups: categorize,notes,animal,pdf")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier JSON result to compare against")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    groups = set(args.only.split(",")) if args.only else {"categorize", "notes", "animal", "pdf"}
+    search_backend = args.search_backend or ("text" if args.mongodb_uri else "memory")
+    client = make_client(args.mongodb_uri)
+    sqlite_directory = tempfile.TemporaryDirectory()
+
+    results = []
+    for size in sizes:
+        if "categorize" in groups:
+            results.append(bench_categorize(size, args.repeat))
+        if "notes" in groups:
+            db_manager, search_label = open_notes_backend(args.storage, client, search_backend,
+                                                          sqlite_directory.name, size)
+            results.extend(bench_notes(db_manager, search_label, size, args.repeat))
+            db_manager.close_connection()
+        if "animal" in groups:
+            results.append(bench_animal_records(client, size, args.repeat))
+    if "pdf" in groups:
+        results.append(bench_pdf(args.pdf_size, max(1, args.repeat // 5)))
+    client.drop_database(BENCH_DB)
+    sqlite_directory.cleanup()
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "backend": "mongod" if args.mongodb_uri else "mongomock",
+        "storage": args.storage,
+        "results": results,
+    }
+    for result in results:
+        print(f"{result['name']:<45} size={result['size']:<7} median={result['median_ms']:.2f}ms "
+              f"p95={result['p95_ms']:.2f}ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Deterministic synthetic data for benchmarks
+
+Every generator takes a seed, so two runs with the same arguments produce the
+same patients, doctors, notes and animal records and their timings can be
+compared. Nothing here is real patient data.
+"""
+import base64
+import io
+import random
+from datetime import datetime, timedelta
+
+from PIL import Image, ImageDraw
+
+from models import Doctor, Patient, SOAPNote, TranscriptEntry
+
+FIRST_NAMES = ["James", "Maria", "Wei", "Aisha", "Carlos", "Olga", "Kenji", "Fatima", "Liam", "Priya",
+               "Noah", "Sofia", "Mateo", "Hana", "Ethan", "Amara"]
+LAST_NAMES = ["Smith", "Garcia", "Chen", "Khan", "Lopez", "Ivanova", "Sato", "Haddad", "Murphy", "Patel",
+              "Kim", "Rossi", "Nguyen", "Okafor", "Cohen", "Silva"]
+SPECIALTIES = ["Family Medicine", "Internal Medicine", "Pediatrics", "Cardiology", "Orthopedics"]
+
+# Utterances per section, in the style of dictated encounters
+SECTION_PHRASES = {
+    "subjective": [
+        "patient reports sharp pain in the lower back for three days",
+        "complains of headache and nausea since yesterday",
+        "states the cough is worse at night",
+        "denies fever or chills",
+        "history of hypertension controlled on lisinopril",
+        "feels tired and short of breath on exertion",
+    ],
+    "objective": [
+        "blood pressure one thirty over eighty five",
+        "temperature ninety eight point six",
+        "heart rate seventy two regular rhythm",
+        "lungs clear to auscultation bilaterally",
+        "tenderness over the lumbar paraspinal muscles",
+        "no edema in the lower extremities",
+    ],
+    "assessment": [
+        "impression is likely lumbar strain",
+        "diagnosis acute bronchitis",
+        "rule out migraine versus tension headache",
+        "hypertension stable",
+        "differential includes viral syndrome",
+    ],
+    "plan": [
+        "prescribe ibuprofen four hundred milligrams as needed",
+        "follow up in two weeks",
+        "recommend physical therapy twice a week",
+        "order chest x ray and basic metabolic panel",
+        "refer to cardiology for evaluation",
+    ],
+}
+SECTIONS = list(SECTION_PHRASES)
+
+SPECIES_BREEDS = {
+    "Dog": ["Beagle", "Labrador", "Poodle", "German Shepherd", "Chihuahua"],
+    "Cat": ["Siamese", "Maine Coon", "Domestic Shorthair", "Persian"],
+    "Rabbit": ["Holland Lop", "Rex"],
+}
+PET_NAMES = ["Biscuit", "Luna", "Max", "Bella", "Milo", "Coco", "Rocky", "Daisy", "Oliver", "Nala"]
+TREATMENTS = ["Vaccination DHPP", "Rash on stomach, prescribed ointment", "Annual exam, healthy",
+              "Ear infection, cleaned and medicated", "Dental cleaning", "Limping on left hind leg, x-ray"]
+
+BASE_DATE = datetime(2025, 1, 1)
+
+
+def utterance(rng: random.Random, section: str = "") -> str:
+    section = section or rng.choice(SECTIONS)
+    return rng.choice(SECTION_PHRASES[section])
+
+
+def patients(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        yield Patient(
+            patient_id=f"P{i:04d}",
+            name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            date_of_birth=(BASE_DATE - timedelta(days=rng.randint(365 * 2, 365 * 90))).strftime("%Y-%m-%d"),
+            contact=f"555-{rng.randint(0, 9999):04d}",
+            created_at=BASE_DATE,
+        )
+
+
+def doctors(count: int, seed: int = 2):
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        yield Doctor(
+            doctor_id=f"D{i:03d}",
+            name=f"Dr. {rng.choice(LAST_NAMES)}",
+            specialty=rng.choice(SPECIALTIES),
+            contact=f"555-{rng.randint(0, 9999):04d}",
+            created_at=BASE_DATE,
+        )
+
+
+def soap_notes(count: int, patient_count: int, doctor_count: int, seed: int = 3,
+               min_entries: int = 20, max_entries: int = 200):
+    """
+    SOAP notes with raw transcripts of min_entries..max_entries utterances
+
+    Transcript lengths follow a triangular distribution peaking near the low
+    end, like real encounters (most are short, a few run long).
+    """
+    rng = random.Random(seed)
+    for i in range(count):
+        date = BASE_DATE + timedelta(minutes=17 * i)
+        note = SOAPNote(
+            patient_id=f"P{rng.randint(1, patient_count):04d}",
+            doctor_id=f"D{rng.randint(1, doctor_count):03d}",
+            date=date,
+        )
+        sections = {section: [] for section in SECTIONS}
+        for n in range(int(rng.triangular(min_entries, max_entries, min_entries))):
+            section = rng.choice(SECTIONS)
+            text = utterance(rng, section)
+            sections[section].append(text)
+            note.add_transcript_entry(TranscriptEntry(
+                timestamp=date + timedelta(seconds=5 * n),
+                speaker=rng.choice(["doctor", "patient"]),
+                text=text,
+                section=section,
+            ))
+        for section, texts in sections.items():
+            setattr(note, section, " ".join(texts))
+        yield note
+
+
+def chart_image(rng: random.Random, size=(850, 1100)):
+    """Small grayscale stand-in for a photographed chart, returned as PNG bytes"""
+    image = Image.new("L", size, 240)
+    draw = ImageDraw.Draw(image)
+    for y in range(150, size[1] - 60, 36):
+        draw.line((40, y, size[0] - 40, y), fill=60, width=2)
+        x = 50
+        for _ in range(rng.randint(2, 8)):
+            width = rng.randint(30, 110)
+            draw.rectangle((x, y - 18, x + width, y - 6), fill=rng.randint(10, 90))
+            x += width + 15
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def animal_records(count: int, seed: int = 4, with_images: bool = True, treatment_lines: int = 6):
+    """Animal chart records shaped like the ones llamaApp saves, optionally with an inline image"""
+    rng = random.Random(seed)
+    image_data = base64.b64encode(chart_image(rng)).decode() if with_images else None
+    for i in range(count):
+        species = rng.choice(list(SPECIES_BREEDS))
+        created = BASE_DATE + timedelta(minutes=23 * i)
+        record = {
+            "serial_number": f"{created:%Y%m%d}-{i % 1000:03d}",
+            "owner_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "address": f"{rng.randint(1, 9999)} West Highland Ave, San Bernardino, CA",
+            "home_phone": f"(909) 555-{rng.randint(0, 9999):04d}",
+            "other_phone": "",
+            "data_entry_by": "benchmark",
+            "animal_name": rng.choice(PET_NAMES),
+            "animal_species": species,
+            "animal_breed": rng.choice(SPECIES_BREEDS[species]),
+            "animal_sex": rng.choice(["M", "F"]),
+            "animal_age": str(rng.randint(1, 16)),
+            "animal_color": rng.choice(["Black", "Tricolor", "White", "Brown and white"]),
+            "treatment_entries": "\n".join(
+                f"{rng.randint(1, 12)}-{rng.randint(1, 28)}-25|{rng.randint(5, 90)} lbs|"
+                f"{rng.choice(TREATMENTS)}|{rng.randint(20, 400)}.00"
+                for _ in range(rng.randint(1, treatment_lines))
+            ),
+            "created_at": created.isoformat(),
+        }
+        if image_data:
+            # One shared image keeps generation cheap; size is what matters for the benchmarks
+            record["image_data"] = image_data
+            record["image_filename"] = f"chart-{i}.png"
+        yield record
@@ -0,0 +1,291 @@
+# File: bulk_import.py
+"""
+Bulk import of patients, doctors and SOAP notes from JSONL/CSV exports
+"""
+import argparse
+import csv
+import dataclasses
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from pymongo.errors import BulkWriteError
+from models import Patient, Doctor, SOAPNote
+
+DUPLICATE_KEY_ERROR = 11000
+PATIENT_ID_PATTERN = re.compile(r"^P(\d+)$")
+
+RECORD_TYPES = {
+    "patients": (Patient, "patients_collection"),
+    "doctors": (Doctor, "doctors_collection"),
+    "notes": (SOAPNote, "notes_collection"),
+}
+
+
+class ValidationError(ValueError):
+    """A source row does not match its model"""
+
+
+@dataclass
+class ImportReport:
+    kind: str
+    path: str
+    processed: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    failed: int = 0
+    errors: List[str] = field(default_factory=list)
+    max_errors: int = 100
+
+    def add_error(self, message: str):
+        if len(self.errors) < self.max_errors:
+            self.errors.append(message)
+
+    def summary(self) -> str:
+        return (f"{self.kind}: {self.processed} processed, {self.inserted} inserted, "
+                f"{self.duplicates} duplicates, {self.invalid} invalid, {self.failed} failed")
+
+
+def read_rows(path: str) -> Iterator[Tuple[int, Dict]]:
+    """Stream (line number, row) pairs from a .jsonl or .csv file"""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for line_number, row in enumerate(csv.DictReader(f), start=2):
+                yield line_number, row
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as e:
+                    yield line_number, {"__error__": f"invalid JSON: {e}"}
+
+
+def import_key(row: Dict) -> str:
+    """Stable key for a source row, derived from its content so it is the same in any file"""
+    return hashlib.sha1(json.dumps(row, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _parse_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, dict) and "$date" in value:
+        value = value["$date"]
+    if isinstance(value, str) and value:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    raise ValueError(f"not a datetime: {value!r}")
+
+
+def build_document(model, row: Dict) -> Dict:
+    """
+    Validate a source row against a models.py dataclass and return the document to insert
+
+    Raises:
+        ValidationError: Missing required fields, unknown fields or wrong types
+    """
+    if "__error__" in row:
+        raise ValidationError(row["__error__"])
+
+    model_fields = {f.name: f for f in dataclasses.fields(model)}
+    unknown = set(row) - set(model_fields) - {"_id"}
+    if unknown:
+        raise ValidationError(f"unknown fields: {', '.join(sorted(unknown))}")
+
+    kwargs = {}
+    for name, model_field in model_fields.items():
+        value = row.get(name)
+        required = model_field.default is dataclasses.MISSING and model_field.default_factory is dataclasses.MISSING
+        if value is None or value == "":
+            if required:
+                raise ValidationError(f"missing required field: {name}")
+            continue
+        try:
+            if model_field.type is datetime:
+                value = _parse_datetime(value)
+            elif name == "raw_transcript":
+                if isinstance(value, str):
+                    value = json.loads(value)
+                if not isinstance(value, list):
+                    raise ValueError("raw_transcript must be a list")
+                for entry in value:
+                    if isinstance(entry, dict) and entry.get("timestamp"):
+                        entry["timestamp"] = _parse_datetime(entry["timestamp"])
+            elif model_field.type is str and not isinstance(value, str):
+                raise ValueError(f"expected a string, got {type(value).__name__}")
+        except ValueError as e:
+            raise ValidationError(f"{name}: {e}")
+        kwargs[name] = value
+
+    record = model(**kwargs)
+    if isinstance(record, SOAPNote):
+        record.clean_fields()
+    return record.to_dict()
+
+
+class BulkImporter:
+    def __init__(self, db_manager, batch_size: int = 1000, checkpoint_path: Optional[str] = None,
+                 progress: Optional[Callable[[ImportReport], None]] = None):
+        """
+        Initialize the importer
+
+        Args:
+            db_manager: DatabaseManager whose collections receive the records
+            batch_size: Documents per insert_many call
+            checkpoint_path: JSON file recording how far each import got, for resuming
+            progress: Called with the running report after every batch
+
+        Raises:
+            ValueError: db_manager is not the MongoDB storage backend
+        """
+        missing = [attr for _, attr in RECORD_TYPES.values() if getattr(db_manager, attr, None) is None]
+        if missing:
+            raise ValueError(f"Bulk import needs the MongoDB storage backend; "
+                             f"{type(db_manager).__name__} has no {', '.join(missing)}")
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path
+        self.progress = progress
+
+    def _load_checkpoint(self, kind: str, path: str) -> Tuple[int, ImportReport]:
+        """Rows already written and the report so far, or (0, a new report) without a matching checkpoint"""
+        report = ImportReport(kind=kind, path=path)
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return 0, report
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("kind") != kind or checkpoint.get("path") != os.path.abspath(path):
+            return 0, report
+        if checkpoint.get("report"):
+            report = ImportReport(**dict(checkpoint["report"], kind=kind, path=path))
+        return checkpoint.get("rows_done", 0), report
+
+    def _save_checkpoint(self, kind: str, path: str, rows_done: int, report: ImportReport):
+        if not self.checkpoint_path:
+            return
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "kind": kind,
+                "path": os.path.abspath(path),
+                "rows_done": rows_done,
+                "report": dataclasses.asdict(report),
+                "updated_at": datetime.now().isoformat(),
+            }, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _flush(self, collection, batch: List[Tuple[int, Dict]], report: ImportReport):
+        documents = [document for _, document in batch]
+        try:
+            result = collection.insert_many(documents, ordered=False)
+            report.inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            details = e.details
+            report.inserted += details.get("nInserted", 0)
+            for write_error in details.get("writeErrors", []):
+                line_number = batch[write_error["index"]][0]
+                if write_error.get("code") == DUPLICATE_KEY_ERROR:
+                    report.duplicates += 1
+                else:
+                    report.failed += 1
+                    report.add_error(f"line {line_number}: {write_error.get('errmsg')}")
+
+    def _advance_patient_ids(self, highest_patient_number: int):
+        if highest_patient_number:
+            self.db_manager.patient_id_allocator.advance_to(highest_patient_number)
+
+    def import_file(self, kind: str, path: str, resume: bool = True) -> ImportReport:
+        """
+        Stream a JSONL/CSV file into the collection for kind ("patients", "doctors" or "notes")
+
+        Rows are validated one by one and written with unordered insert_many in
+        batches. Duplicate keys are counted per row instead of aborting the batch.
+        With a checkpoint file, a crashed import resumes after the last written batch;
+        notes carry an import_key (a hash of the source row) so a replayed batch, or
+        the same note in another file, is reported as duplicates, and the report
+        continues from the checkpoint's counts. After every patient batch the patient
+        ID counter is moved past the highest Pxxxx written so far.
+        """
+        if kind not in RECORD_TYPES:
+            raise ValueError(f"Unknown record type: {kind}")
+        model, collection_attr = RECORD_TYPES[kind]
+        collection = getattr(self.db_manager, collection_attr)
+
+        if resume:
+            rows_done, report = self._load_checkpoint(kind, path)
+        else:
+            rows_done, report = 0, ImportReport(kind=kind, path=path)
+        batch: List[Tuple[int, Dict]] = []
+        row_index = 0
+        highest_patient_number = 0
+
+        for row_index, (line_number, row) in enumerate(read_rows(path), start=1):
+            if row_index <= rows_done:
+                continue
+            report.processed += 1
+            try:
+                document = build_document(model, row)
+            except (ValidationError, TypeError) as e:
+                report.invalid += 1
+                report.add_error(f"line {line_number}: {e}")
+                continue
+            if kind == "notes":
+                document["import_key"] = import_key(row)
+            elif kind == "patients":
+                match = PATIENT_ID_PATTERN.match(document["patient_id"])
+                if match:
+                    highest_patient_number = max(highest_patient_number, int(match.group(1)))
+            batch.append((line_number, document))
+
+            if len(batch) >= self.batch_size:
+                self._flush(collection, batch, report)
+                batch = []
+                # Before the checkpoint, so a resumed import never needs the skipped rows' IDs
+                self._advance_patient_ids(highest_patient_number)
+                self._save_checkpoint(kind, path, row_index, report)
+                if self.progress:
+                    self.progress(report)
+
+        if batch:
+            self._flush(collection, batch, report)
+        self._advance_patient_ids(highest_patient_number)
+        if kind == "notes" and report.inserted:
+            self.db_manager.invalidate_search_index()
+        elif report.inserted:
+            self.db_manager.invalidate_lookup_caches()
+        self._save_checkpoint(kind, path, max(row_index, rows_done), report)
+        if self.progress:
+            self.progress(report)
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import records from a JSONL or CSV export")
+    parser.add_argument("kind", choices=sorted(RECORD_TYPES))
+    parser.add_argument("path")
+    parser.add_argument("--mongodb-uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--db-name", default="medical_records")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--checkpoint", help="Checkpoint file used to resume an interrupted import")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    from database_manager import DatabaseManager
+
+    db_manager = DatabaseManager(args.mongodb_uri, args.db_name)
+    importer = BulkImporter(db_manager, args.batch_size, args.checkpoint,
+                            progress=lambda report: print(report.summary(), flush=True))
+    report = importer.import_file(args.kind, args.path, resume=not args.no_resume)
+    for error in report.errors:
+        print(error)
+    db_manager.close_connection()
+
+
+if __name__ == "__main__":
+    main()
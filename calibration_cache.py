@@ -0,0 +1,55 @@
+# File: calibration_cache.py
+"""
+Persistent cache of microphone ambient-noise calibration
+"""
+import json
+import os
+import tempfile
+import time
+from typing import Optional
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".soapnote", "calibration.json")
+
+
+class CalibrationCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_age_seconds: float = 12 * 3600):
+        """
+        Initialize the calibration cache
+
+        Args:
+            path: JSON file holding calibrated energy thresholds per device
+            max_age_seconds: How long a calibration stays valid
+        """
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, device_key: str) -> Optional[float]:
+        """Return the cached energy threshold for a device, or None if missing or expired"""
+        entry = self._load().get(device_key)
+        if not entry:
+            return None
+        if time.time() - entry.get("calibrated_at", 0) > self.max_age_seconds:
+            return None
+        return entry.get("energy_threshold")
+
+    def set(self, device_key: str, energy_threshold: float):
+        """Store a freshly calibrated energy threshold for a device"""
+        data = self._load()
+        data[device_key] = {"energy_threshold": energy_threshold, "calibrated_at": time.time()}
+        directory = os.path.dirname(self.path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # Write then rename so concurrent workers never read a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # Caching is best effort; calibration still applies to this process
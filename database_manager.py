@@ -2,37 +2,109 @@
 """
 Database operations for the Medical SOAP Notes system
 """
+import re
+import threading
 import pymongo
+from pymongo import ReturnDocument
+from bson import ObjectId
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any
 from models import Patient, Doctor, SOAPNote
+from search_index import InvertedIndex, SOAP_FIELDS, tokenize
+from mongo_client_registry import get_client, release_client, ensure_indexes, get_pool_stats
+from id_allocator import CounterAllocator
+from storage_backend import StorageBackend
+import metrics
 import streamlit as st
 
-class DatabaseManager:
-    def __init__(self, mongodb_uri: str = "mongodb://localhost:27017/", db_name: str = "medical_records"):
+# Bump when _create_indexes changes so every deployment rebuilds indexes once
+SCHEMA_VERSION = 3
+# Counter incremented on every note write, so in-process search indexes notice other processes' writes
+SEARCH_GENERATION_COUNTER = "soap_notes_search_generation"
+# Names of the indexes _create_indexes builds; a missing one triggers a rebuild
+EXPECTED_INDEXES = {
+    "soap_notes": ["patient_id_1_date_-1", "doctor_id_1", "import_key_1", "soap_text"],
+    "patients": ["patient_id_1"],
+    "doctors": ["doctor_id_1"],
+    "soap_note_drafts": ["status_1_updated_at_-1"],
+}
+
+class DatabaseManager(StorageBackend):
+    def __init__(self, mongodb_uri: str = "mongodb://localhost:27017/", db_name: str = "medical_records",
+                 search_backend: str = "text", max_pool_size: Optional[int] = None,
+                 min_pool_size: Optional[int] = None, client: Optional[pymongo.MongoClient] = None,
+                 lookup_cache_size: int = 1024, lookup_cache_ttl_seconds: float = 300.0):
         """
         Initialize database connection and collections
         
         Args:
             mongodb_uri: MongoDB connection string
             db_name: Database name
+            search_backend: "text" for the MongoDB text index, "memory" for the in-process BM25 index
+                (rebuilt when another process writes notes)
+            max_pool_size: Connection pool size of the shared client
+            min_pool_size: Connections kept open by the shared client
+            client: Use this client instead of the shared one (e.g. a test or benchmark stand-in)
+            lookup_cache_size: Patients (and doctors) kept in the process-wide lookup caches
+            lookup_cache_ttl_seconds: How long a cached patient or doctor is trusted
         """
-        self.client = pymongo.MongoClient(mongodb_uri)
+        # A stand-in client is a separate database even under the same URI
+        cache_namespace = ("mongodb", mongodb_uri, db_name) if client is None else None
+        super().__init__(cache_namespace, lookup_cache_size, lookup_cache_ttl_seconds)
+        if search_backend not in ("text", "memory"):
+            raise ValueError(f"Unknown search backend: {search_backend}")
+        self.client = client if client is not None else \
+            get_client(mongodb_uri, max_pool_size=max_pool_size, min_pool_size=min_pool_size)
+        self.db_name = db_name
         self.db = self.client[db_name]
         self.notes_collection = self.db.soap_notes
         self.patients_collection = self.db.patients
         self.doctors_collection = self.db.doctors
-        self._create_indexes()
+        self.counters_collection = self.db.counters
+        self.drafts_collection = self.db.soap_note_drafts
+        self.patient_id_allocator = CounterAllocator(
+            self.counters_collection, "patient_id", seed=self._highest_patient_number
+        )
+        self.search_backend = search_backend
+        self.search_index = InvertedIndex(SOAP_FIELDS)
+        self._search_index_loaded = False
+        # SEARCH_GENERATION_COUNTER value the in-process index reflects
+        self._search_generation = 0
+        self._search_generation_lock = threading.Lock()
+        ensure_indexes(self.client, db_name, "soap_notes", SCHEMA_VERSION, self._create_indexes,
+                       EXPECTED_INDEXES)
     
     def _create_indexes(self):
         """Create database indexes for better performance"""
         self.notes_collection.create_index([("patient_id", 1), ("date", -1)])
         self.notes_collection.create_index("doctor_id")
+        self.notes_collection.create_index("import_key", unique=True, sparse=True)
+        self.notes_collection.create_index(
+            [(field, pymongo.TEXT) for field in SOAP_FIELDS],
+            name="soap_text"
+        )
         self.patients_collection.create_index("patient_id", unique=True)
         self.doctors_collection.create_index("doctor_id", unique=True)
+        self.drafts_collection.create_index([("status", 1), ("updated_at", -1)])
+    
+    def _highest_patient_number(self) -> int:
+        """Highest numeric part of existing Pxxxx patient IDs (uses the patient_id index)"""
+        last = self.patients_collection.find_one(
+            {"patient_id": {"$regex": r"^P\d+$"}},
+            {"patient_id": 1},
+            sort=[("patient_id", -1)]
+        )
+        return int(last["patient_id"][1:]) if last else 0
+    
+    def allocate_patient_id(self) -> str:
+        """Reserve the next patient ID (Pxxxx); safe under concurrent users"""
+        return f"P{self.patient_id_allocator.next_value():04d}"
+    
+    def peek_next_patient_id(self) -> str:
+        """Preview the next patient ID without reserving it"""
+        return f"P{self.patient_id_allocator.peek():04d}"
     
-    def add_patient(self, patient: Patient) -> bool:
-        """Add a new patient to the database"""
+    def _insert_patient(self, patient: Patient) -> bool:
         try:
             self.patients_collection.insert_one(patient.to_dict())
             st.write(f"Patient {patient.name} added successfully")
@@ -41,8 +113,7 @@ class DatabaseManager:
             st.write(f"Patient with ID {patient.patient_id} already exists")
             return False
     
-    def add_doctor(self, doctor: Doctor) -> bool:
-        """Add a new doctor to the database"""
+    def _insert_doctor(self, doctor: Doctor) -> bool:
         try:
             self.doctors_collection.insert_one(doctor.to_dict())
             st.write(f"Doctor {doctor.name} added successfully")
@@ -51,49 +122,270 @@ class DatabaseManager:
             st.write(f"Doctor with ID {doctor.doctor_id} already exists")
             return False
     
-    def get_patient(self, patient_id: str) -> Optional[Dict]:
-        """Get patient by ID"""
+    @metrics.timed("db.get_patient")
+    def _find_patient(self, patient_id: str) -> Optional[Dict]:
         return self.patients_collection.find_one({"patient_id": patient_id})
     
-    def get_doctor(self, doctor_id: str) -> Optional[Dict]:
-        """Get doctor by ID"""
+    @metrics.timed("db.get_doctor")
+    def _find_doctor(self, doctor_id: str) -> Optional[Dict]:
         return self.doctors_collection.find_one({"doctor_id": doctor_id})
     
+    def iter_patients(self, limit: int = 0) -> Iterator[Dict]:
+        """Patients, most recently added first"""
+        return self.patients_collection.find({}, batch_size=1000).sort("created_at", -1).limit(limit)
+    
+    def iter_doctors(self, limit: int = 0) -> Iterator[Dict]:
+        """Doctors, most recently added first"""
+        return self.doctors_collection.find({}, batch_size=1000).sort("created_at", -1).limit(limit)
+    
+    @metrics.timed("db.save_soap_note")
     def save_soap_note(self, note: SOAPNote) -> bool:
         """Save SOAP note to database"""
         try:
             note.clean_fields()
-            result = self.notes_collection.insert_one(note.to_dict())
+            note_dict = note.to_dict()
+            result = self.notes_collection.insert_one(note_dict)
+            self._note_written(result.inserted_id, note_dict)
             st.write(f"SOAP note saved successfully with ID: {result.inserted_id}")
             return True
         except Exception as e:
+            metrics.increment("soap_db_failures_total", operation="save_soap_note", error=type(e).__name__)
+            st.write(f"Error saving note: {e}")
+            return False
+    
+    @metrics.timed("db.finalize_draft")
+    def finalize_draft(self, draft_id: ObjectId, owner: Optional[str] = None) -> bool:
+        """
+        Turn an autosaved draft into a saved SOAP note
+        
+        The draft already holds the whole note, so this is a server-side copy
+        ($merge into soap_notes, keeping the draft's _id) followed by deleting
+        the draft. Repeating it after a failure cannot create a duplicate note.
+        
+        Args:
+            owner: Only finalize the draft while this session owns it (see DraftStore)
+        """
+        draft_filter: Dict[str, Any] = {"_id": draft_id}
+        if owner is not None:
+            draft_filter["owner"] = owner
+        try:
+            self.drafts_collection.aggregate([
+                {"$match": draft_filter},
+                {"$project": {
+                    "patient_id": 1, "doctor_id": 1, "date": 1, "raw_transcript": 1,
+                    **{field: {"$trim": {"input": {"$ifNull": [f"${field}", ""]}}} for field in SOAP_FIELDS}
+                }},
+                {"$merge": {"into": self.notes_collection.name, "on": "_id",
+                            "whenMatched": "replace", "whenNotMatched": "insert"}},
+            ])
+            note = self.notes_collection.find_one({"_id": draft_id})
+            if note is None:
+                st.write(f"Draft {draft_id} not found")
+                return False
+            try:
+                self.drafts_collection.delete_one(draft_filter)
+            except Exception as e:
+                # The note is saved; a leftover draft only shows up again in the drafts list
+                st.write(f"Saved note, but could not remove its draft: {e}")
+            self._note_written(draft_id, note)
+            st.write(f"SOAP note saved successfully with ID: {draft_id}")
+            return True
+        except Exception as e:
+            metrics.increment("soap_db_failures_total", operation="finalize_draft", error=type(e).__name__)
             st.write(f"Error saving note: {e}")
             return False
     
+    @metrics.timed("db.get_patient_notes")
     def get_patient_notes(self, patient_id: str, limit: int = 10) -> List[Dict]:
         """Get SOAP notes for a specific patient"""
         notes = self.notes_collection.find({"patient_id": patient_id}).sort("date", -1).limit(limit)
         return list(notes)
     
-    def search_notes(self, query: str, field: str = "all") -> List[Dict]:
-        """Search SOAP notes by text content"""
-        if field == "all":
-            search_query = {
-                "$or": [
-                    {"subjective": {"$regex": query, "$options": "i"}},
-                    {"objective": {"$regex": query, "$options": "i"}},
-                    {"assessment": {"$regex": query, "$options": "i"}},
-                    {"plan": {"$regex": query, "$options": "i"}}
-                ]
-            }
-        else:
-            search_query = {field: {"$regex": query, "$options": "i"}}
+    @staticmethod
+    def _note_filter(patient_id: Optional[str] = None, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None) -> Dict[str, Any]:
+        query: Dict[str, Any] = {}
+        if patient_id:
+            query["patient_id"] = patient_id
+        if since or until:
+            query["date"] = {}
+            if since:
+                query["date"]["$gte"] = since
+            if until:
+                query["date"]["$lt"] = until
+        return query
+    
+    def iter_notes(self, patient_id: Optional[str] = None, since: Optional[datetime] = None,
+                   until: Optional[datetime] = None, batch_size: int = 500,
+                   projection: Optional[Dict] = None) -> Iterator[Dict]:
+        """
+        Stream SOAP notes from the database without building a list
+
+        Args:
+            patient_id: Only notes for this patient (newest first, using the patient/date index)
+            since: Only notes dated on or after this time
+            until: Only notes dated before this time
+            batch_size: Documents fetched per round trip
+            projection: Fields to return (default: all)
+        """
+        query = self._note_filter(patient_id, since, until)
+        sort = [("date", -1)] if patient_id else [("_id", 1)]
+        cursor = self.notes_collection.find(query, projection, batch_size=batch_size).sort(sort)
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+    
+    @staticmethod
+    def _text_search_query(query: str, field: str) -> Optional[Dict[str, Any]]:
+        """
+        $text filter requiring every query term, like the in-process index (None if no terms)
         
-        return list(self.notes_collection.find(search_query))
+        Quoted terms are ANDed by the text index. With a field, each term must also
+        start a word in that field; the text index alone matches any field.
+        """
+        if field != "all" and field not in SOAP_FIELDS:
+            raise ValueError(f"Unknown SOAP field: {field}")
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return None
+        search_query: Dict[str, Any] = {"$text": {"$search": " ".join(f'"{term}"' for term in terms)}}
+        if field != "all":
+            search_query["$and"] = [
+                {field: {"$regex": rf"\b{re.escape(term)}", "$options": "i"}} for term in terms
+            ]
+        return search_query
+    
+    def iter_search_notes(self, query: str, field: str = "all", batch_size: int = 500,
+                          patient_id: Optional[str] = None, since: Optional[datetime] = None,
+                          until: Optional[datetime] = None) -> Iterator[Dict]:
+        """
+        Stream every note matching a text search (text index backend)
+        
+        Notes come in index order, not by relevance: sorting by textScore would
+        make the server collect the whole result before returning the first note.
+        """
+        text_query = self._text_search_query(query, field)
+        if text_query is None:
+            return
+        search_query = self._note_filter(patient_id, since, until)
+        search_query.update(text_query)
+        cursor = self.notes_collection.find(search_query, batch_size=batch_size)
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+    
+    @metrics.timed("db.search_notes")
+    def search_notes(self, query: str, field: str = "all", limit: int = 20, skip: int = 0) -> List[Dict]:
+        """
+        Search SOAP notes by text content
+        
+        Args:
+            query: Search terms; a note must contain all of them
+            field: "all" or one of subjective/objective/assessment/plan
+            limit: Maximum number of notes to return
+            skip: Number of ranked notes to skip (for pagination)
+            
+        Returns:
+            Matching notes, best match first
+        """
+        if field != "all" and field not in SOAP_FIELDS:
+            raise ValueError(f"Unknown SOAP field: {field}")
+        
+        if self.search_backend == "memory":
+            return self._search_memory_index(query, field, limit, skip)
+        
+        # The text index narrows the candidates; a field filter is only applied to those
+        search_query = self._text_search_query(query, field)
+        if search_query is None:
+            return []
+        cursor = self.notes_collection.find(
+            search_query,
+            {"score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"})]).skip(skip).limit(limit)
+        return list(cursor)
+    
+    def _read_search_generation(self) -> int:
+        counter = self.counters_collection.find_one({"_id": SEARCH_GENERATION_COUNTER})
+        return counter["seq"] if counter else 0
+    
+    def _bump_search_generation(self) -> int:
+        counter = self.counters_collection.find_one_and_update(
+            {"_id": SEARCH_GENERATION_COUNTER}, {"$inc": {"seq": 1}},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return counter["seq"]
+    
+    def _note_written(self, note_id, note: Dict):
+        """
+        Record a note write for every process's in-process search index
+        
+        The local index takes the note directly when no other process wrote in
+        between; otherwise it is left stale and rebuilt on the next search.
+        """
+        try:
+            generation = self._bump_search_generation()
+        except Exception as e:
+            # The note is saved; other processes only see it after their next rebuild
+            metrics.increment("soap_db_failures_total", operation="search_generation", error=type(e).__name__)
+            self._search_index_loaded = False
+            return
+        with self._search_generation_lock:
+            if self._search_index_loaded and generation == self._search_generation + 1:
+                self.search_index.add_document(note_id, note)
+                self._search_generation = generation
+    
+    def rebuild_search_index(self):
+        """Load every note into the in-process search index"""
+        with self._search_generation_lock:
+            # Read first: a write during the load bumps it again and triggers another rebuild
+            generation = self._read_search_generation()
+            self.search_index.clear()
+            projection = {field: 1 for field in SOAP_FIELDS}
+            for note in self.notes_collection.find({}, projection, batch_size=1000):
+                self.search_index.add_document(note["_id"], note)
+            self._search_generation = generation
+            self._search_index_loaded = True
+    
+    def invalidate_search_index(self):
+        """Drop in-process indexes, here and in other processes, so they are rebuilt (e.g. after a bulk import)"""
+        self.search_index.clear()
+        self._search_index_loaded = False
+        self._bump_search_generation()
+    
+    def _search_memory_index(self, query: str, field: str, limit: int, skip: int) -> List[Dict]:
+        """
+        Rank notes with the in-process index and fetch only the requested page
+        
+        Each search reads SEARCH_GENERATION_COUNTER (one small find_one) and
+        rebuilds the index when a note was written by another process.
+        """
+        if not self._search_index_loaded or self._read_search_generation() != self._search_generation:
+            self.rebuild_search_index()
+        
+        fields = None if field == "all" else [field]
+        ranked, _total = self.search_index.search(query, fields=fields, limit=limit, skip=skip)
+        if not ranked:
+            return []
+        
+        scores = dict(ranked)
+        notes = {note["_id"]: note for note in self.notes_collection.find({"_id": {"$in": list(scores)}})}
+        results = []
+        for note_id, score in ranked:
+            note = notes.get(note_id)
+            if note is not None:
+                note["score"] = score
+                results.append(note)
+        return results
+    
+    def pool_stats(self) -> Dict[str, Dict[str, float]]:
+        """Connection pool statistics (checkouts, wait time, open connections) of the shared client"""
+        return get_pool_stats(self.client)
     
     def close_connection(self):
-        """Close MongoDB connection"""
-        self.client.close()
+        """Release the shared MongoDB client; it is closed once no manager uses it"""
+        release_client(self.client)
     st.write("Database connection closed")
 
 # ==========================================
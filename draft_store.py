@@ -0,0 +1,218 @@
+# File: draft_store.py
+"""
+Autosave of in-progress SOAP notes
+
+Every open note has a draft document in the soap_note_drafts collection.
+Transcript entries and section updates are buffered and written together on a
+debounce timer, so a burst of dictation becomes one update_one with $push and
+$set. A draft survives a crashed worker and is turned into a saved note by
+DatabaseManager.finalize_draft.
+
+Each draft records the session that owns it; pass a stable owner (e.g. a
+session id kept across page reloads) so a restarted session finds its drafts
+right away. Every open draft is listed. A session may resume or discard its own
+drafts and drafts nobody has touched for stale_after_seconds; a draft that is
+still active elsewhere is only resumed with an explicit take-over, after which
+the previous owner can neither write nor finalize it.
+"""
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from bson import ObjectId
+from models import SOAPNote, TranscriptEntry
+from search_index import SOAP_FIELDS
+import metrics
+
+OPEN = "open"
+
+
+class _PendingWrite:
+    __slots__ = ("entries", "sections", "first_change", "timer")
+
+    def __init__(self):
+        self.entries: List[Dict] = []
+        self.sections: Dict[str, str] = {}
+        self.first_change = time.monotonic()
+        self.timer: Optional[threading.Timer] = None
+
+
+class DraftStore:
+    def __init__(self, drafts_collection, debounce_seconds: float = 2.0, max_delay_seconds: float = 10.0,
+                 owner: Optional[str] = None, stale_after_seconds: float = 30 * 60):
+        """
+        Initialize the draft store
+
+        Args:
+            drafts_collection: Collection holding open drafts
+            debounce_seconds: Quiet period after the last change before pending changes are written
+            max_delay_seconds: Longest a change waits during continuous dictation
+            owner: Stable session or user id stored on drafts created here (default: a new random id,
+                so drafts of an earlier run are only claimable once stale or taken over)
+            stale_after_seconds: Idle time after which another session may resume or discard a draft
+                without taking it over explicitly
+        """
+        self.drafts_collection = drafts_collection
+        self.owner = owner or uuid.uuid4().hex
+        self.stale_after_seconds = stale_after_seconds
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.writes = 0
+        self.last_error: Optional[Exception] = None
+        self._pending: Dict[ObjectId, _PendingWrite] = {}
+        self._lock = threading.Lock()
+        # Serializes flushes so transcript batches for a draft are pushed in order
+        self._flush_lock = threading.Lock()
+
+    def create(self, note: SOAPNote) -> ObjectId:
+        """Persist a new draft for a note and return its id"""
+        document = note.to_dict()
+        document.update({"status": OPEN, "owner": self.owner, "updated_at": datetime.now()})
+        return self.drafts_collection.insert_one(document).inserted_id
+
+    def append_entry(self, draft_id: ObjectId, entry: Dict):
+        """Queue a raw_transcript entry for the draft"""
+        with self._lock:
+            self._pending_for(draft_id).entries.append(entry)
+            self._schedule(draft_id)
+
+    def set_sections(self, draft_id: ObjectId, sections: Dict[str, str]):
+        """Queue the latest text of one or more SOAP sections; later values replace earlier ones"""
+        with self._lock:
+            self._pending_for(draft_id).sections.update(sections)
+            self._schedule(draft_id)
+
+    def _pending_for(self, draft_id: ObjectId) -> _PendingWrite:
+        pending = self._pending.get(draft_id)
+        if pending is None:
+            pending = self._pending[draft_id] = _PendingWrite()
+        return pending
+
+    def _schedule(self, draft_id: ObjectId):
+        """(Re)start the debounce timer, without pushing the write past max_delay_seconds"""
+        pending = self._pending[draft_id]
+        if pending.timer is not None:
+            pending.timer.cancel()
+        waited = time.monotonic() - pending.first_change
+        delay = max(0.0, min(self.debounce_seconds, self.max_delay_seconds - waited))
+        pending.timer = threading.Timer(delay, self.flush, args=(draft_id,))
+        pending.timer.daemon = True
+        pending.timer.start()
+
+    def flush(self, draft_id: Optional[ObjectId] = None) -> bool:
+        """
+        Write pending changes now, for one draft or all of them
+
+        Returns:
+            False if a write failed; its changes are kept and retried on the next flush
+        """
+        with self._flush_lock:
+            return self._flush(draft_id)
+
+    def _flush(self, draft_id: Optional[ObjectId]) -> bool:
+        with self._lock:
+            draft_ids = [draft_id] if draft_id is not None else list(self._pending)
+            batches = []
+            for pending_id in draft_ids:
+                pending = self._pending.pop(pending_id, None)
+                if pending is None:
+                    continue
+                if pending.timer is not None:
+                    pending.timer.cancel()
+                batches.append((pending_id, pending))
+
+        ok = True
+        for pending_id, pending in batches:
+            update: Dict = {"$set": dict(pending.sections, updated_at=datetime.now())}
+            if pending.entries:
+                update["$push"] = {"raw_transcript": {"$each": pending.entries}}
+            try:
+                with metrics.timer("draft.write"):
+                    result = self.drafts_collection.update_one({"_id": pending_id, "owner": self.owner}, update)
+                self.writes += 1
+                if result.matched_count == 0:
+                    # Discarded or taken over by another session; the changes have nowhere to go
+                    self.last_error = LookupError(f"Draft {pending_id} is no longer owned by this session")
+                    ok = False
+            except Exception as e:
+                self.last_error = e
+                ok = False
+                with self._lock:
+                    # Put the changes back in front of anything queued meanwhile
+                    current = self._pending.get(pending_id)
+                    if current is not None:
+                        pending.entries.extend(current.entries)
+                        pending.sections.update(current.sections)
+                        if current.timer is not None:
+                            current.timer.cancel()
+                    pending.first_change = time.monotonic()
+                    self._pending[pending_id] = pending
+                    self._schedule(pending_id)
+        return ok
+
+    def _claimable(self, draft_id: Optional[ObjectId] = None) -> Dict:
+        """Filter for open drafts this session owns or that have gone stale"""
+        stale_before = datetime.now() - timedelta(seconds=self.stale_after_seconds)
+        query: Dict = {"status": OPEN, "$or": [{"owner": self.owner}, {"updated_at": {"$lt": stale_before}}]}
+        if draft_id is not None:
+            query["_id"] = draft_id
+        return query
+
+    def can_claim(self, draft: Dict) -> bool:
+        """True if this session may resume or discard the draft without taking it over"""
+        stale_before = datetime.now() - timedelta(seconds=self.stale_after_seconds)
+        return draft.get("owner") == self.owner or draft.get("updated_at", stale_before) < stale_before
+
+    def taken_over(self, draft_id: ObjectId) -> bool:
+        """True if the draft still exists but another session owns it now"""
+        try:
+            draft = self.drafts_collection.find_one({"_id": draft_id}, {"owner": 1})
+        except Exception:
+            return False
+        return draft is not None and draft.get("owner") != self.owner
+
+    def open_drafts(self, patient_id: Optional[str] = None, doctor_id: Optional[str] = None) -> List[Dict]:
+        """
+        Summaries of every open draft, most recently updated first
+
+        Use can_claim() to tell drafts this session may resume from ones active elsewhere.
+        """
+        query: Dict = {"status": OPEN}
+        if patient_id:
+            query["patient_id"] = patient_id
+        if doctor_id:
+            query["doctor_id"] = doctor_id
+        projection = {"patient_id": 1, "doctor_id": 1, "date": 1, "owner": 1, "updated_at": 1}
+        return list(self.drafts_collection.find(query, projection).sort("updated_at", -1))
+
+    def load(self, draft_id: ObjectId, take_over: bool = False) -> Optional[SOAPNote]:
+        """
+        Rebuild the in-memory note from a stored draft and make this session its owner
+
+        Args:
+            take_over: Also claim a draft another session is still editing; that
+                session's later writes and finalize are rejected
+        """
+        self.flush(draft_id)
+        query = {"_id": draft_id, "status": OPEN} if take_over else self._claimable(draft_id)
+        draft = self.drafts_collection.find_one_and_update(
+            query, {"$set": {"owner": self.owner, "updated_at": datetime.now()}}
+        )
+        if draft is None:
+            return None
+        return SOAPNote(
+            patient_id=draft["patient_id"],
+            doctor_id=draft["doctor_id"],
+            date=draft["date"],
+            raw_transcript=[TranscriptEntry.from_dict(entry) for entry in draft.get("raw_transcript", [])],
+            **{field: draft.get(field, "") for field in SOAP_FIELDS}
+        )
+
+    def discard(self, draft_id: ObjectId) -> bool:
+        """Drop one of this session's (or a stale) draft and any pending changes"""
+        with self._lock:
+            pending = self._pending.pop(draft_id, None)
+            if pending is not None and pending.timer is not None:
+                pending.timer.cancel()
+        return self.drafts_collection.delete_one(self._claimable(draft_id)).deleted_count > 0
@@ -0,0 +1,74 @@
+# File: id_allocator.py
+"""
+Atomic, counter-based ID allocation backed by a MongoDB counters collection
+"""
+import threading
+from typing import Callable, Optional
+from pymongo import ReturnDocument
+
+
+class CounterAllocator:
+    def __init__(self, counters_collection, name: str, block_size: int = 1,
+                 seed: Optional[Callable[[], int]] = None):
+        """
+        Initialize an allocator for one named sequence
+
+        Args:
+            counters_collection: Collection holding {"_id": name, "seq": last_value} documents
+            name: Sequence name
+            block_size: Values reserved per round trip; values of an unused block are skipped
+                when the process exits, so keep this at 1 for gap-free sequences
+            seed: Returns the highest value already in use; consulted once when the
+                counter document does not exist yet
+        """
+        self.counters = counters_collection
+        self.name = name
+        self.block_size = block_size
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._next = 0
+        self._block_end = 0
+        self._seeded = seed is None
+
+    def _ensure_seeded(self):
+        if self._seeded:
+            return
+        if self.counters.find_one({"_id": self.name}, {"_id": 1}) is None:
+            # $max keeps the counter correct if several processes seed concurrently
+            self.counters.update_one({"_id": self.name}, {"$max": {"seq": self.seed()}}, upsert=True)
+        self._seeded = True
+
+    def next_value(self) -> int:
+        """Return the next value of the sequence; unique across processes"""
+        with self._lock:
+            if self._next >= self._block_end:
+                self._ensure_seeded()
+                counter = self.counters.find_one_and_update(
+                    {"_id": self.name},
+                    {"$inc": {"seq": self.block_size}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+                self._block_end = counter["seq"] + 1
+                self._next = self._block_end - self.block_size
+            value = self._next
+            self._next += 1
+            return value
+
+    def advance_to(self, value: int):
+        """Make sure the sequence never hands out value or anything below it (e.g. after an import)"""
+        with self._lock:
+            self._ensure_seeded()
+            self.counters.update_one({"_id": self.name}, {"$max": {"seq": value}}, upsert=True)
+            if self._next <= value:
+                # Drop the rest of a reserved block that the imported IDs overlap
+                self._next = self._block_end = 0
+
+    def peek(self) -> int:
+        """Return the value next_value() would most likely hand out, without reserving it"""
+        with self._lock:
+            if self._next < self._block_end:
+                return self._next
+            self._ensure_seeded()
+            counter = self.counters.find_one({"_id": self.name})
+            return (counter["seq"] if counter else 0) + 1
@@ -0,0 +1,96 @@
+# File: keyword_matcher.py
+"""
+Aho-Corasick multi-pattern keyword matching
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+
+class KeywordMatcher:
+    def __init__(self):
+        """Initialize an empty automaton"""
+        # Trie nodes are parallel lists indexed by node number; node 0 is the root
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[str]] = [set()]
+        # Keywords ending at each node, including those reachable via failure links
+        self._matches: List[tuple] = [()]
+        self._patterns: Dict[str, Set[str]] = {}
+        self._compiled = True
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def add_keywords(self, label: str, keywords: Iterable[str]):
+        """
+        Add keywords that count towards a label
+
+        New keywords are inserted into the existing trie; failure links are
+        recomputed on the next match instead of rebuilding from scratch.
+        """
+        for keyword in keywords:
+            keyword = keyword.lower()
+            if not keyword:
+                continue
+            labels = self._patterns.setdefault(keyword, set())
+            if label in labels:
+                continue
+            labels.add(label)
+
+            node = 0
+            for char in keyword:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(set())
+                    self._goto[node][char] = next_node
+                node = next_node
+            self._output[node].add(keyword)
+            self._compiled = False
+
+    def _compile(self):
+        """Compute failure links and merged match lists breadth-first"""
+        self._matches = [()] * len(self._goto)
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._matches[child] = tuple(self._output[child])
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._matches[child] = tuple(self._output[child]) + self._matches[self._fail[child]]
+        self._compiled = True
+
+    def iter_matches(self, text: str):
+        """Yield (end_index, keyword) for every keyword occurrence in one pass over text"""
+        if not self._compiled:
+            self._compile()
+
+        goto = self._goto
+        fail = self._fail
+        matches = self._matches
+        node = 0
+        for index, char in enumerate(text.lower()):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for keyword in matches[node]:
+                yield index, keyword
+
+    def count_labels(self, text: str) -> Dict[str, int]:
+        """Count keyword hits per label in a single scan of the text"""
+        counts: Dict[str, int] = {}
+        for _index, keyword in self.iter_matches(text):
+            for label in self._patterns[keyword]:
+                counts[label] = counts.get(label, 0) + 1
+        return counts
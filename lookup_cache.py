@@ -0,0 +1,129 @@
+# File: lookup_cache.py
+"""
+In-process LRU/TTL cache for patient and doctor lookups
+
+Caches are shared per process (see shared_cache), so every Streamlit session
+and manager talking to the same database reuses the same entries.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+_shared_lock = threading.Lock()
+_shared_caches: Dict[Hashable, "LookupCache"] = {}
+
+
+class LookupCache:
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0, negative_ttl_seconds: float = 10.0):
+        """
+        Initialize an empty cache
+
+        Args:
+            max_entries: Entries kept before the least recently used one is evicted
+            ttl_seconds: How long a found record is served without asking the database
+            negative_ttl_seconds: How long "not found" is remembered; kept short because
+                another process may add the record meanwhile
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped by every invalidate(); a load that straddles one must not be cached
+        self._generation = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Optional[Dict], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: Hashable):
+        """Return the cached value (None for a cached miss) or _MISSING"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            if value is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Optional[Dict], generation: Optional[int] = None):
+        """
+        Cache a record, or None to remember that the key does not exist
+
+        With generation (from generation()), the value is dropped if the cache was
+        invalidated since, because it may have been read before the change.
+        """
+        ttl = self.ttl_seconds if value is not None else self.negative_ttl_seconds
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[Hashable], Optional[Dict]]) -> Optional[Dict]:
+        """
+        Return the record for key, calling loader on a miss
+
+        A copy is returned so callers can modify it without changing the cached record.
+        """
+        generation = self.generation()
+        value = self._lookup(key)
+        if value is _MISSING:
+            value = loader(key)
+            self.put(key, value, generation)
+        return dict(value) if value is not None else None
+
+    def generation(self) -> int:
+        """Invalidation counter, for put()"""
+        with self._lock:
+            return self._generation
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Forget one key, or everything when key is None"""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            }
+
+
+def shared_cache(namespace: Hashable, max_entries: int = 1024, ttl_seconds: float = 300.0) -> LookupCache:
+    """
+    Return the process-wide cache for a namespace (e.g. database and record type)
+
+    The first caller's size and TTL apply; later callers get the existing cache.
+    """
+    with _shared_lock:
+        cache = _shared_caches.get(namespace)
+        if cache is None:
+            cache = _shared_caches[namespace] = LookupCache(max_entries, ttl_seconds)
+        return cache
@@ -2,11 +2,49 @@
 # File: main.py
 """
 Main application entry point
+
+    python main.py                                       # interactive session
+    python main.py export notes.jsonl --since 2025-06-01 # streaming export (jsonl, csv or pdf)
 """
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
 from soap_note_manager import SOAPNoteManager
 
+def export_main(argv):
+    """Export SOAP notes to a file, e.g. from a nightly cron job"""
+    parser = argparse.ArgumentParser(prog="main.py export", description="Export SOAP notes")
+    parser.add_argument("output", help="Output file (.jsonl, .csv or .pdf)")
+    parser.add_argument("--format", choices=["jsonl", "csv", "pdf"], help="Default: from the file extension")
+    parser.add_argument("--patient", help="Only notes for this patient ID")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Only notes on or after this date")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Only notes before this date")
+    parser.add_argument("--last-days", type=int, help="Only notes from the last N days (overrides --since)")
+    parser.add_argument("--query", help="Only notes matching this text search")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--mongodb-uri", default=os.environ.get("MONGODB_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--db-name", default="medical_records")
+    parser.add_argument("--storage", choices=["mongodb", "sqlite"], help="Default: SOAP_STORAGE, else mongodb")
+    parser.add_argument("--sqlite-path", help="SQLite database file (default: SOAP_SQLITE_PATH, else <db-name>.db)")
+    args = parser.parse_args(argv)
+    
+    since = datetime.now() - timedelta(days=args.last_days) if args.last_days else args.since
+    manager = SOAPNoteManager(args.mongodb_uri, args.db_name, autosave=False, storage=args.storage,
+                              sqlite_path=args.sqlite_path)
+    try:
+        count = manager.export_notes(args.output, args.format, args.patient, since, args.until,
+                                     args.query, args.batch_size)
+    finally:
+        manager.close()
+    print(f"Exported {count} notes to {args.output}")
+
 def main():
     """Main function to run the SOAP notes application"""
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        export_main(sys.argv[2:])
+        return
+    
     # Initialize the manager
     manager = SOAPNoteManager()
     
@@ -32,7 +70,7 @@ def main():
             manager.start_new_note(patient_id, doctor_id)
         
         elif choice == "2":
-            manager.start_dictation_session()
+            manager.start_voice_dictation_session()
         
         elif choice == "3":
             manager.save_note()
@@ -0,0 +1,282 @@
+# File: metrics.py
+"""
+Per-stage latency histograms and counters for the dictation pipeline
+
+Stages are timed with the @timed decorator or the timer() context manager and
+exported in the Prometheus text format or as a JSON snapshot. Collection is
+off unless SOAP_METRICS=1 (or enable() is called); while off, a timed call
+costs one attribute check.
+"""
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+# Upper bounds in seconds, from a keyword match to a slow network recognition
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_METRIC = "soap_stage_seconds"
+ERROR_METRIC = "soap_stage_errors_total"
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "max")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside the bucket that holds it"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+class _StageTimer:
+    __slots__ = ("registry", "stage", "start")
+
+    def __init__(self, registry: "MetricsRegistry", stage: str):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.stage, time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.registry.increment(ERROR_METRIC, stage=self.stage, error=exc_type.__name__)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = False, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize an empty registry
+
+        Args:
+            enabled: Record observations (when False every call returns immediately)
+            buckets: Histogram upper bounds in seconds, ascending
+        """
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.started_at = datetime.now()
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._lock = threading.Lock()
+
+    def timer(self, stage: str):
+        """Context manager timing one execution of a stage"""
+        if not self.enabled:
+            return _NOOP_TIMER
+        return _StageTimer(self, stage)
+
+    def observe(self, stage: str, seconds: float):
+        """Record one duration for a stage"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def increment(self, name: str, amount: float = 1, **labels: str):
+        """Add to a counter; each distinct label set is its own series"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self):
+        """Drop everything recorded so far"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.started_at = datetime.now()
+
+    def snapshot(self) -> Dict:
+        """Histograms and counters as plain data, with estimated percentiles in milliseconds"""
+        with self._lock:
+            stages = {}
+            for stage, histogram in sorted(self._histograms.items()):
+                stages[stage] = {
+                    "count": histogram.count,
+                    "sum_seconds": histogram.sum,
+                    "mean_ms": histogram.sum / histogram.count * 1000 if histogram.count else 0.0,
+                    "p50_ms": histogram.quantile(0.5) * 1000,
+                    "p95_ms": histogram.quantile(0.95) * 1000,
+                    "p99_ms": histogram.quantile(0.99) * 1000,
+                    "max_ms": histogram.max * 1000,
+                    "buckets": dict(zip([str(b) for b in histogram.buckets] + ["+Inf"], histogram.counts)),
+                }
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+        return {
+            "enabled": self.enabled,
+            "started_at": self.started_at.isoformat(),
+            "stages": stages,
+            "counters": counters,
+        }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            if self._histograms:
+                lines.append(f"# HELP {STAGE_METRIC} Time spent in each dictation pipeline stage")
+                lines.append(f"# TYPE {STAGE_METRIC} histogram")
+            for stage, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{STAGE_METRIC}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{STAGE_METRIC}_sum{{stage="{stage}"}} {histogram.sum!r}')
+                lines.append(f'{STAGE_METRIC}_count{{stage="{stage}"}} {histogram.count}')
+
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                label_text = ",".join(f'{label}="{_escape(label_value)}"' for label, label_value in labels)
+                series = f"{name}{{{label_text}}}" if label_text else name
+                lines.append(f"{series} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REGISTRY = MetricsRegistry(enabled=os.environ.get("SOAP_METRICS", "").lower() in ("1", "true", "yes"))
+
+
+def enable():
+    REGISTRY.enabled = True
+
+
+def disable():
+    REGISTRY.enabled = False
+
+
+def timer(stage: str):
+    """Context manager timing a block as one execution of stage in the default registry"""
+    return REGISTRY.timer(stage)
+
+
+def increment(name: str, amount: float = 1, **labels: str):
+    REGISTRY.increment(name, amount, **labels)
+
+
+def timed(stage: str) -> Callable:
+    """Decorator recording each call of the function as one execution of stage"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not REGISTRY.enabled:
+                return function(*args, **kwargs)
+            with _StageTimer(REGISTRY, stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = REGISTRY.to_json().encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = REGISTRY.to_prometheus().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_servers: Dict[Tuple[str, int], ThreadingHTTPServer] = {}
+_servers_lock = threading.Lock()
+
+
+def start_http_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve /metrics (Prometheus) and /metrics.json from a daemon thread and enable collection
+
+    Calling it again for the same address returns the running server, so it is
+    safe from code that reruns (e.g. a Streamlit script).
+    """
+    with _servers_lock:
+        server = _servers.get((host, port))
+        if server is None:
+            server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            _servers[(host, port)] = server
+    enable()
+    return server
+
+
+def start_http_server_from_env() -> Optional[ThreadingHTTPServer]:
+    """Start the metrics endpoint when SOAP_METRICS_PORT is set"""
+    port = os.environ.get("SOAP_METRICS_PORT")
+    if not port:
+        return None
+    return start_http_server(int(port), os.environ.get("SOAP_METRICS_HOST", "127.0.0.1"))
+
+
+def write_snapshot(path: str):
+    """Write the JSON snapshot of the default registry to a file"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.to_json())
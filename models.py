@@ -2,16 +2,16 @@
 """
 Data models for the Medical SOAP Notes system
 """
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
 class SpeakerType(Enum):
     DOCTOR = "doctor"
     PATIENT = "patient"
 
-@dataclass
+@dataclass(slots=True)
 class Patient:
     patient_id: str
     name: str
@@ -24,9 +24,10 @@ class Patient:
             self.created_at = datetime.now()
     
     def to_dict(self):
-        return asdict(self)
+        return {"patient_id": self.patient_id, "name": self.name, "date_of_birth": self.date_of_birth,
+                "contact": self.contact, "created_at": self.created_at}
 
-@dataclass
+@dataclass(slots=True)
 class Doctor:
     doctor_id: str
     name: str
@@ -39,9 +40,10 @@ class Doctor:
             self.created_at = datetime.now()
     
     def to_dict(self):
-        return asdict(self)
+        return {"doctor_id": self.doctor_id, "name": self.name, "specialty": self.specialty,
+                "contact": self.contact, "created_at": self.created_at}
 
-@dataclass
+@dataclass(slots=True)
 class TranscriptEntry:
     timestamp: datetime
     speaker: str
@@ -49,9 +51,13 @@ class TranscriptEntry:
     section: str = ""
     
     def to_dict(self):
-        return asdict(self)
+        return {"timestamp": self.timestamp, "speaker": self.speaker, "text": self.text, "section": self.section}
+    
+    @classmethod
+    def from_dict(cls, entry: Dict) -> "TranscriptEntry":
+        return cls(entry.get("timestamp"), entry.get("speaker", ""), entry.get("text", ""), entry.get("section", ""))
 
-@dataclass
+@dataclass(slots=True)
 class SOAPNote:
     patient_id: str
     doctor_id: str
@@ -60,17 +66,32 @@ class SOAPNote:
     objective: str = ""
     assessment: str = ""
     plan: str = ""
-    raw_transcript: List[Dict] = None
+    # TranscriptEntry objects until serialized; stored dicts are accepted as well
+    raw_transcript: List[Union[TranscriptEntry, Dict]] = None
     
     def __post_init__(self):
         if self.raw_transcript is None:
             self.raw_transcript = []
     
     def to_dict(self):
-        return asdict(self)
+        """Document for the database; section strings are shared, only transcript entries are converted"""
+        return {
+            "patient_id": self.patient_id,
+            "doctor_id": self.doctor_id,
+            "date": self.date,
+            "subjective": self.subjective,
+            "objective": self.objective,
+            "assessment": self.assessment,
+            "plan": self.plan,
+            "raw_transcript": self.transcript_dicts(),
+        }
+    
+    def transcript_dicts(self) -> List[Dict]:
+        """The raw transcript in its stored dict form"""
+        return [entry.to_dict() if isinstance(entry, TranscriptEntry) else entry for entry in self.raw_transcript]
     
     def add_transcript_entry(self, entry: TranscriptEntry):
-        self.raw_transcript.append(entry.to_dict())
+        self.raw_transcript.append(entry)
     
     def clean_fields(self):
         """Clean up whitespace in text fields"""
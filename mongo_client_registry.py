@@ -0,0 +1,217 @@
+# File: mongo_client_registry.py
+"""
+Process-wide MongoDB client registry with connection pool statistics
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+import pymongo
+from pymongo import monitoring
+
+DEFAULT_URI = "mongodb://localhost:27017/"
+
+_lock = threading.Lock()
+_clients: Dict[Tuple, pymongo.MongoClient] = {}
+_refcounts: Dict[Tuple, int] = {}
+_pool_stats: Dict[Tuple, "PoolStats"] = {}
+_index_versions: Dict[Tuple[str, str, str], int] = {}
+_index_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Collects connection pool events for one client"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checkins = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.pools_cleared = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _record_wait(self, event):
+        wait = getattr(event, "duration", None)
+        if wait is None:
+            started = getattr(self._local, "checkout_started", None)
+            wait = time.perf_counter() - started if started is not None else 0.0
+        self._local.checkout_started = None
+        return wait
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait = self._record_wait(event)
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def connection_check_out_failed(self, event):
+        wait = self._record_wait(event)
+        with self._lock:
+            self.checkout_failures += 1
+            self.total_wait_seconds += wait
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checkins += 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def snapshot(self) -> Dict[str, float]:
+        """Return the current counters as a plain dict"""
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checkins": self.checkins,
+                "in_use": self.checkouts - self.checkins,
+                "connections_created": self.connections_created,
+                "connections_closed": self.connections_closed,
+                "open_connections": self.connections_created - self.connections_closed,
+                "pools_cleared": self.pools_cleared,
+                "total_wait_seconds": self.total_wait_seconds,
+                "avg_wait_seconds": self.total_wait_seconds / self.checkouts if self.checkouts else 0.0,
+                "max_wait_seconds": self.max_wait_seconds,
+            }
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def _client_key(uri: str, max_pool_size: Optional[int], min_pool_size: Optional[int],
+                wait_queue_timeout_ms: Optional[int]) -> Tuple:
+    if max_pool_size is None:
+        max_pool_size = _env_int("MONGODB_MAX_POOL_SIZE") or 100
+    if min_pool_size is None:
+        min_pool_size = _env_int("MONGODB_MIN_POOL_SIZE") or 0
+    if wait_queue_timeout_ms is None:
+        wait_queue_timeout_ms = _env_int("MONGODB_WAIT_QUEUE_TIMEOUT_MS")
+    return (uri, max_pool_size, min_pool_size, wait_queue_timeout_ms)
+
+
+def get_client(uri: str = DEFAULT_URI, max_pool_size: Optional[int] = None,
+               min_pool_size: Optional[int] = None,
+               wait_queue_timeout_ms: Optional[int] = None) -> pymongo.MongoClient:
+    """
+    Return the shared client for a URI and pool configuration, creating it once per process
+
+    Pool sizes default to the MONGODB_MAX_POOL_SIZE, MONGODB_MIN_POOL_SIZE and
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS environment variables.
+    """
+    key = _client_key(uri, max_pool_size, min_pool_size, wait_queue_timeout_ms)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            stats = PoolStats()
+            _, max_size, min_size, wait_timeout = key
+            options = {"maxPoolSize": max_size, "minPoolSize": min_size, "event_listeners": [stats]}
+            if wait_timeout is not None:
+                options["waitQueueTimeoutMS"] = wait_timeout
+            client = pymongo.MongoClient(uri, **options)
+            _clients[key] = client
+            _pool_stats[key] = stats
+            _refcounts[key] = 0
+        _refcounts[key] += 1
+        return client
+
+
+def release_client(client: pymongo.MongoClient):
+    """Drop one reference to a shared client, closing it when nobody uses it anymore"""
+    with _lock:
+        for key, registered in list(_clients.items()):
+            if registered is client:
+                _refcounts[key] -= 1
+                if _refcounts[key] <= 0:
+                    client.close()
+                    del _clients[key], _refcounts[key], _pool_stats[key]
+                    for index_key in [k for k in _index_versions if k[0] == key[0]]:
+                        del _index_versions[index_key]
+                return
+
+
+def get_pool_stats(client: Optional[pymongo.MongoClient] = None) -> Dict[str, Dict[str, float]]:
+    """Return pool statistics for one shared client, or for every registered client by URI"""
+    with _lock:
+        items = [(key, _pool_stats[key]) for key, registered in _clients.items()
+                 if client is None or registered is client]
+    return {f"{key[0]} (maxPoolSize={key[1]})": stats.snapshot() for key, stats in items}
+
+
+def _indexes_present(client: pymongo.MongoClient, db_name: str,
+                     expected_indexes: Dict[str, Iterable[str]]) -> bool:
+    """True if every named index exists on its collection"""
+    for collection_name, names in expected_indexes.items():
+        existing = client[db_name][collection_name].index_information()
+        if any(name not in existing for name in names):
+            return False
+    return True
+
+
+def ensure_indexes(client: pymongo.MongoClient, db_name: str, schema: str, version: int,
+                   create: Callable[[], None],
+                   expected_indexes: Optional[Dict[str, Iterable[str]]] = None) -> bool:
+    """
+    Run an index creation function once per process and schema version
+
+    The applied version is also recorded in the database's ``schema_versions``
+    collection, so other processes skip the index builds as well, unless one of
+    expected_indexes ({collection: [index name, ...]}) has been dropped since.
+    Only callers for the same database and schema wait for each other; the
+    registry lock is not held during the round trips.
+
+    Returns:
+        True if create() ran
+    """
+    with _lock:
+        uri = next((key[0] for key, registered in _clients.items() if registered is client), id(client))
+        key = (uri, db_name, schema)
+        if _index_versions.get(key, -1) >= version:
+            return False
+        schema_lock = _index_locks.setdefault(key, threading.Lock())
+
+    with schema_lock:
+        with _lock:
+            if _index_versions.get(key, -1) >= version:
+                return False
+        versions = client[db_name].schema_versions
+        applied = versions.find_one({"_id": schema})
+        created = False
+        if not (applied and applied.get("version", -1) >= version) or \
+                (expected_indexes and not _indexes_present(client, db_name, expected_indexes)):
+            create()
+            versions.update_one({"_id": schema}, {"$max": {"version": version}}, upsert=True)
+            created = True
+        with _lock:
+            _index_versions[key] = version
+        return created
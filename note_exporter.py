@@ -0,0 +1,135 @@
+# File: note_exporter.py
+"""
+Streaming export of SOAP notes to JSONL, CSV or PDF
+
+Notes are written one at a time as they arrive from a MongoDB cursor, so the
+exporter holds a single note in memory regardless of how many are exported.
+"""
+import csv
+import json
+import os
+from datetime import datetime
+from typing import Dict, IO, Iterable, Optional
+from bson import ObjectId
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen import canvas
+from search_index import SOAP_FIELDS
+
+CSV_FIELDS = ["_id", "patient_id", "doctor_id", "date"] + list(SOAP_FIELDS)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def write_jsonl(notes: Iterable[Dict], out: IO[str]) -> int:
+    """Write one JSON object per note (including the raw transcript); returns the count"""
+    count = 0
+    for note in notes:
+        out.write(json.dumps(note, default=_json_default))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def write_csv(notes: Iterable[Dict], out: IO[str]) -> int:
+    """Write the note header and SOAP sections as CSV (no transcript); returns the count"""
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    count = 0
+    for note in notes:
+        row = {name: note.get(name, "") for name in CSV_FIELDS}
+        row["_id"] = str(row["_id"])
+        if isinstance(row["date"], datetime):
+            row["date"] = row["date"].isoformat()
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_pdf(notes: Iterable[Dict], out: IO[bytes]) -> int:
+    """
+    Write notes to a PDF report, one after another with page breaks as needed; returns the count
+
+    Each note is laid out and drawn as soon as it is read. ReportLab keeps the
+    finished pages' content until the document is saved, so PDF exports of very
+    large result sets are better split by date range.
+    """
+    p = canvas.Canvas(out, pagesize=letter)
+    width, height = letter
+    margin = 0.75 * inch
+    text_width = width - 2 * margin
+    line_height = 12
+    y = height - margin
+
+    def ensure_room(lines=1):
+        nonlocal y
+        if y - lines * line_height < margin:
+            p.showPage()
+            y = height - margin
+
+    count = 0
+    for note in notes:
+        date = note.get("date")
+        date_text = date.strftime("%Y-%m-%d %H:%M") if isinstance(date, datetime) else str(date or "")
+        ensure_room(3)
+        p.setFont("Helvetica-Bold", 12)
+        p.drawString(margin, y, f"Patient {note.get('patient_id', '')} - Doctor {note.get('doctor_id', '')}")
+        p.setFont("Helvetica", 9)
+        p.drawRightString(width - margin, y, date_text)
+        y -= line_height * 1.5
+        for section in SOAP_FIELDS:
+            ensure_room(2)
+            p.setFont("Helvetica-Bold", 10)
+            p.drawString(margin, y, section.upper())
+            y -= line_height
+            p.setFont("Helvetica", 10)
+            for line in simpleSplit(note.get(section) or "-", "Helvetica", 10, text_width):
+                ensure_room()
+                p.drawString(margin, y, line)
+                y -= line_height
+        y -= line_height
+        p.line(margin, y + line_height / 2, width - margin, y + line_height / 2)
+        count += 1
+    p.save()
+    return count
+
+
+# format -> (writer, binary output)
+EXPORT_FORMATS: Dict[str, tuple] = {
+    "jsonl": (write_jsonl, False),
+    "csv": (write_csv, False),
+    "pdf": (write_pdf, True),
+}
+
+
+def export_to_file(notes: Iterable[Dict], path: str, fmt: Optional[str] = None) -> int:
+    """
+    Stream notes into a file; the format defaults to the file extension
+
+    The file is written under a temporary name and renamed when complete, so a
+    failed nightly export never leaves a truncated file in place.
+    """
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    writer, binary = EXPORT_FORMATS[fmt]
+    tmp_path = path + ".tmp"
+    try:
+        if binary:
+            with open(tmp_path, "wb") as out:
+                count = writer(notes, out)
+        else:
+            with open(tmp_path, "w", newline="", encoding="utf-8") as out:
+                count = writer(notes, out)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
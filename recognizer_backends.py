@@ -0,0 +1,105 @@
+# File: recognizer_backends.py
+"""
+Pluggable speech recognizer backends
+"""
+import hashlib
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+import speech_recognition as sr
+
+
+def audio_fingerprint(audio: sr.AudioData) -> str:
+    """Stable content hash of captured audio"""
+    return hashlib.sha256(audio.get_raw_data()).hexdigest()
+
+
+class RecognizerBackend(ABC):
+    """Turns captured audio into text"""
+    name = "base"
+
+    @abstractmethod
+    def recognize(self, audio: sr.AudioData) -> str:
+        """
+        Recognize a phrase
+
+        Raises:
+            sr.UnknownValueError: The audio could not be understood
+            sr.RequestError: The backend could not be reached
+        """
+
+
+class GoogleRecognizerBackend(RecognizerBackend):
+    """Google Web Speech API (requires network access)"""
+    name = "google"
+
+    def __init__(self, recognizer: Optional[sr.Recognizer] = None, language: str = "en-US"):
+        self.recognizer = recognizer or sr.Recognizer()
+        self.language = language
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        return self.recognizer.recognize_google(audio, language=self.language)
+
+
+class FixtureRecognizerBackend(RecognizerBackend):
+    """Deterministic offline stand-in that maps known audio to fixture transcripts"""
+    name = "fixture"
+
+    def __init__(self, transcripts: Optional[Dict[str, str]] = None):
+        """
+        Initialize the fixture backend
+
+        Args:
+            transcripts: Mapping of audio_fingerprint() to transcript text
+        """
+        self.transcripts: Dict[str, str] = dict(transcripts or {})
+
+    def add(self, audio: sr.AudioData, text: str):
+        """Register the transcript for a piece of audio"""
+        self.transcripts[audio_fingerprint(audio)] = text
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        text = self.transcripts.get(audio_fingerprint(audio))
+        if text is None:
+            raise sr.UnknownValueError()
+        return text
+
+    @classmethod
+    def from_directory(cls, directory: str) -> Tuple["FixtureRecognizerBackend", List[str]]:
+        """
+        Build a backend from a fixture directory
+
+        Every ``name.wav`` is paired with a ``name.txt`` transcript next to it.
+
+        Returns:
+            (backend, WAV paths in sorted order)
+        """
+        backend = cls()
+        recognizer = sr.Recognizer()
+        wav_paths = sorted(
+            os.path.join(directory, filename)
+            for filename in os.listdir(directory)
+            if filename.lower().endswith(".wav")
+        )
+        for wav_path in wav_paths:
+            transcript_path = os.path.splitext(wav_path)[0] + ".txt"
+            if not os.path.exists(transcript_path):
+                continue
+            with open(transcript_path, encoding="utf-8") as f:
+                text = f.read().strip()
+            with sr.AudioFile(wav_path) as source:
+                backend.add(recognizer.record(source), text)
+        return backend, wav_paths
+
+
+def create_backend(name: str = "google", **kwargs) -> RecognizerBackend:
+    """Create a recognizer backend by name ("google" or "fixture")"""
+    if name == "google":
+        return GoogleRecognizerBackend(**kwargs)
+    if name == "fixture":
+        directory = kwargs.pop("directory", None)
+        if directory:
+            backend, _paths = FixtureRecognizerBackend.from_directory(directory)
+            return backend
+        return FixtureRecognizerBackend(**kwargs)
+    raise ValueError(f"Unknown recognizer backend: {name}")
@@ -0,0 +1,159 @@
+# File: search_index.py
+"""
+In-process full-text search index for SOAP notes
+"""
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple, Any
+
+SOAP_FIELDS = ("subjective", "objective", "assessment", "plan")
+
+STOP_WORDS = frozenset([
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has",
+    "he", "in", "is", "it", "its", "of", "on", "or", "she", "that", "the",
+    "to", "was", "were", "will", "with"
+])
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase text and split it into searchable terms"""
+    if not text:
+        return []
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+
+class InvertedIndex:
+    def __init__(self, fields: Iterable[str] = SOAP_FIELDS, k1: float = 1.2, b: float = 0.75):
+        """
+        Initialize an empty inverted index
+
+        Args:
+            fields: Document fields that are indexed and can be filtered on
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+        """
+        self.fields = tuple(fields)
+        self.k1 = k1
+        self.b = b
+        # term -> doc_id -> field -> term frequency
+        self._postings: Dict[str, Dict[Any, Dict[str, int]]] = defaultdict(dict)
+        # doc_id -> field -> token count
+        self._doc_lengths: Dict[Any, Dict[str, int]] = {}
+        self._doc_terms: Dict[Any, set] = {}
+        self._field_length_totals: Dict[str, int] = {field: 0 for field in self.fields}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self._doc_lengths
+
+    def add_document(self, doc_id, document: Dict[str, Any]):
+        """Index (or re-index) the searchable fields of a document"""
+        with self._lock:
+            if doc_id in self._doc_lengths:
+                self.remove_document(doc_id)
+
+            lengths = {}
+            terms = set()
+            for field in self.fields:
+                tokens = tokenize(document.get(field) or "")
+                lengths[field] = len(tokens)
+                self._field_length_totals[field] += len(tokens)
+                terms.update(tokens)
+                for token in tokens:
+                    field_counts = self._postings[token].setdefault(doc_id, {})
+                    field_counts[field] = field_counts.get(field, 0) + 1
+            self._doc_lengths[doc_id] = lengths
+            self._doc_terms[doc_id] = terms
+
+    def remove_document(self, doc_id):
+        """Drop a document from the index"""
+        with self._lock:
+            lengths = self._doc_lengths.pop(doc_id, None)
+            if lengths is None:
+                return
+            for field, length in lengths.items():
+                self._field_length_totals[field] -= length
+            for term in self._doc_terms.pop(doc_id, ()):
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def clear(self):
+        """Remove every document from the index"""
+        with self._lock:
+            self._postings.clear()
+            self._doc_lengths.clear()
+            self._doc_terms.clear()
+            self._field_length_totals = {field: 0 for field in self.fields}
+
+    def search(self, query: str, fields: Optional[Iterable[str]] = None,
+               limit: int = 20, skip: int = 0) -> Tuple[List[Tuple[Any, float]], int]:
+        """
+        Rank documents against a query with BM25
+
+        Args:
+            query: Free-text query; every term must match (AND semantics)
+            fields: Restrict matching and scoring to these fields (default: all)
+            limit: Page size
+            skip: Number of ranked results to skip
+
+        Returns:
+            (page of (doc_id, score) pairs, total number of matches)
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return [], 0
+        search_fields = self.fields if fields is None else tuple(f for f in fields if f in self.fields)
+        if not search_fields:
+            return [], 0
+
+        with self._lock:
+            n_docs = len(self._doc_lengths)
+            if n_docs == 0:
+                return [], 0
+            avg_length = sum(self._field_length_totals[f] for f in search_fields) / n_docs or 1.0
+
+            # Intersect postings starting from the rarest term
+            term_postings = []
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    return [], 0
+                matching = {
+                    doc_id: sum(counts.get(f, 0) for f in search_fields)
+                    for doc_id, counts in postings.items()
+                }
+                matching = {doc_id: tf for doc_id, tf in matching.items() if tf}
+                if not matching:
+                    return [], 0
+                term_postings.append(matching)
+            term_postings.sort(key=len)
+
+            candidates = set(term_postings[0])
+            for matching in term_postings[1:]:
+                candidates &= matching.keys()
+                if not candidates:
+                    return [], 0
+
+            scores = {}
+            for matching in term_postings:
+                idf = math.log(1 + (n_docs - len(matching) + 0.5) / (len(matching) + 0.5))
+                for doc_id in candidates:
+                    tf = matching[doc_id]
+                    length = sum(self._doc_lengths[doc_id][f] for f in search_fields)
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = heapq.nlargest(skip + limit, scores.items(), key=lambda item: item[1])
+        return ranked[skip:], len(scores)
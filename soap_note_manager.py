@@ -4,23 +4,61 @@
 Main SOAP note management system
 """
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Iterator, Optional, List, Dict
 from models import SOAPNote, Patient, Doctor, SpeakerType, TranscriptEntry
-from database_manager import DatabaseManager
+from storage_backend import StorageBackend, open_storage
 from speech_recognition_manager import SpeechRecognitionManager
 from text_processor import TextProcessor
+from note_exporter import export_to_file
+from draft_store import DraftStore
+import metrics
+from bson import ObjectId
 import streamlit as st
 
 class SOAPNoteManager:
-    def __init__(self, mongodb_uri: str = "mongodb://localhost:27017/", db_name: str = "medical_records"):
-        """Initialize the SOAP Note Manager with all components"""
-        self.db_manager = DatabaseManager(mongodb_uri, db_name)
-        self.speech_manager = SpeechRecognitionManager()
+    def __init__(self, mongodb_uri: str = "mongodb://localhost:27017/", db_name: str = "medical_records",
+                 speech_manager: Optional[SpeechRecognitionManager] = None, autosave: bool = True,
+                 autosave_debounce_seconds: float = 2.0, storage: Optional[str] = None,
+                 sqlite_path: Optional[str] = None, db_manager: Optional[StorageBackend] = None,
+                 warm_cache: bool = False, session_id: Optional[str] = None):
+        """
+        Initialize the SOAP Note Manager with all components
+        
+        Args:
+            autosave: Keep a draft of the current note in the database while it is edited
+                (MongoDB storage only)
+            autosave_debounce_seconds: Quiet period before buffered draft changes are written
+            storage: "mongodb" or "sqlite" (default: the SOAP_STORAGE environment variable, else mongodb)
+            sqlite_path: SQLite database file (default: SOAP_SQLITE_PATH, else <db_name>.db)
+            db_manager: Use this storage backend instead of opening one
+            warm_cache: Load recently added patients and doctors into the lookup cache now
+            session_id: Stable id owning this session's drafts, e.g. kept across page reloads
+                (default: a new id per manager)
+        """
+        self.db_manager = db_manager if db_manager is not None else \
+            open_storage(storage, mongodb_uri, db_name, sqlite_path)
+        self._speech_manager = speech_manager
         self.text_processor = TextProcessor()
+        self.draft_store = DraftStore(self.db_manager.drafts_collection, autosave_debounce_seconds,
+                                      owner=session_id) \
+            if autosave and self.db_manager.drafts_collection is not None else None
+        if warm_cache:
+            self.db_manager.warm_lookup_caches()
         
         # Current session variables
         self.current_note: Optional[SOAPNote] = None
+        self.current_draft_id: Optional[ObjectId] = None
         self.current_speaker = SpeakerType.DOCTOR
+        self.dictation_section = ""
+        self.dictation_log: List[str] = []
+        self._dictation_pipeline = None
+    
+    @property
+    def speech_manager(self) -> SpeechRecognitionManager:
+        """Speech recognition, created on first use so headless runs never touch audio devices"""
+        if self._speech_manager is None:
+            self._speech_manager = SpeechRecognitionManager()
+        return self._speech_manager
     
     def add_patient(self, patient_id: str, name: str, dob: str, contact: str = "") -> bool:
         """Add a new patient"""
@@ -51,10 +89,13 @@ class SOAPNoteManager:
             doctor_id=doctor_id,
             date=datetime.now()
         )
+        if self.draft_store is not None:
+            self.current_draft_id = self.draft_store.create(self.current_note)
         
         st.write(f"New SOAP note started for patient {patient_id} with doctor {doctor_id}")
         return True
     
+    @metrics.timed("note.add_dictation")
     def add_dictation_to_note(self, text: str, speaker: SpeakerType, section: str = "") -> bool:
         """Add dictated text to the current SOAP note"""
         if not self.current_note:
@@ -76,6 +117,13 @@ class SOAPNoteManager:
         
         # Process and categorize the text
         categorized_section = self.text_processor.categorize_text(text, self.current_note, section)
+        metrics.increment("soap_dictation_entries_total", speaker=speaker.value, section=categorized_section)
+        
+        if self.current_draft_id is not None:
+            self.draft_store.append_entry(self.current_draft_id, transcript_entry.to_dict())
+            self.draft_store.set_sections(
+                self.current_draft_id, {categorized_section: getattr(self.current_note, categorized_section)}
+            )
         
         st.write(f"Added dictation from {speaker.value} to {categorized_section}: {text[:50]}...")
         return True
@@ -99,17 +147,35 @@ class SOAPNoteManager:
         if plan:
             self.add_dictation_to_note(plan, self.current_speaker, "plan")
             self.current_note.plan = plan
+        
+        if self.current_draft_id is not None:
+            self.draft_store.set_sections(self.current_draft_id, {
+                name: getattr(self.current_note, name)
+                for name, text in (("subjective", subjective), ("objective", objective),
+                                   ("assessment", assessment), ("plan", plan)) if text
+            })
 
         st.success("Typed dictation added to SOAP note.")
         return True
 
     
 
-    def start_voice_dictation_session(self):
-        """Start an interactive dictation session"""
+    def start_voice_dictation_session(self, workers: int = 2) -> bool:
+        """
+        Start a dictation session and return without waiting for speech
+        
+        Phrases are captured on a background thread and recognized concurrently
+        (SpeechRecognitionManager.start_background_capture), so the next phrase is
+        heard while earlier ones are still being recognized. Call
+        process_dictation_results() periodically (e.g. from an auto-refreshing
+        Streamlit fragment) to apply results in the order they were spoken.
+        
+        Args:
+            workers: Number of phrases recognized at the same time
+        """
         if not self.current_note:
             st.write("No active SOAP note. Please start a new note first.")
-            return
+            return False
         
         st.write("\n=== DICTATION SESSION STARTED ===")
         st.sidebar.write("Commands:")
@@ -120,77 +186,159 @@ class SOAPNoteManager:
         st.sidebar.write("- Just speak normally to add dictation")
         st.sidebar.write("=====================================\n")
         
-        current_section = ""
-        
-        while True:
-            try:
-                st.write(f"\nCurrent speaker: {self.current_speaker.value}")
-                if current_section:
-                    st.write(f"Current section: {current_section}")
-                
-                text = self.speech_manager.listen_for_speech()
-                
-                if text:
-                    text_lower = text.lower()
-                    
-                    # Handle commands
-                    if text_lower in ["doctor", "dr"]:
-                        self.current_speaker = SpeakerType.DOCTOR
-                        st.write("Switched to doctor")
-                        continue
-                    elif text_lower in ["patient", "pt"]:
-                        self.current_speaker = SpeakerType.PATIENT
-                        st.write("Switched to patient")
-                        continue
-                    elif text_lower in ["subjective", "subject"]:
-                        current_section = "subjective"
-                        st.write("Section set to subjective")
-                        continue
-                    elif text_lower in ["objective", "object"]:
-                        current_section = "objective"
-                        st.write("Section set to objective")
-                        continue
-                    elif text_lower in ["assessment", "assess"]:
-                        current_section = "assessment"
-                        st.write("Section set to assessment")
-                        continue
-                    elif text_lower in ["plan"]:
-                        current_section = "plan"
-                        st.write("Section set to plan")
-                        continue
-                    elif text_lower in ["save"]:
-                        self.save_note()
-                        continue
-                    elif text_lower in ["quit", "exit", "stop"]:
-                        st.write("Ending dictation session")
-                        break
-                    
-                    # Add dictation to note
-                    self.add_dictation_to_note(text, self.current_speaker, current_section)
-                
-            except KeyboardInterrupt:
-                st.write("\nDictation session interrupted")
-                break
+        self.dictation_section = ""
+        self.dictation_log = [f"Current speaker: {self.current_speaker.value}"]
+        self._dictation_pipeline = self.speech_manager.start_background_capture(workers=workers)
+        return True
+    
+    @property
+    def dictation_active(self) -> bool:
+        return self._dictation_pipeline is not None
+    
+    def process_dictation_results(self, timeout: float = 0.0) -> bool:
+        """
+        Apply the recognized phrases that are ready, without blocking for more
+        
+        Args:
+            timeout: Longest wait for the next phrase when none is ready
+            
+        Returns:
+            True while the session is still running
+        """
+        pipeline = self._dictation_pipeline
+        if pipeline is None:
+            return False
+        result = pipeline.get_result(timeout=timeout)
+        while result is not None:
+            if not self._handle_dictation_result(result):
+                self.dictation_log.append("Ending dictation session")
+                self._end_dictation()
+                return False
+            result = pipeline.get_result(timeout=0)
+        if pipeline.finished:
+            self.dictation_log.append("Audio source exhausted, ending dictation session")
+            self._end_dictation()
+            return False
+        return True
+    
+    def _handle_dictation_result(self, result) -> bool:
+        """Apply one recognized phrase (a command or dictation); False on a quit command"""
+        if result.error:
+            self.dictation_log.append(result.error)
+            return True
+        if not result.text:
+            return True
+        
+        text = result.text
+        text_lower = text.lower()
+        
+        # Handle commands
+        if text_lower in ["doctor", "dr"]:
+            self.current_speaker = SpeakerType.DOCTOR
+            self.dictation_log.append("Switched to doctor")
+        elif text_lower in ["patient", "pt"]:
+            self.current_speaker = SpeakerType.PATIENT
+            self.dictation_log.append("Switched to patient")
+        elif text_lower in ["subjective", "subject"]:
+            self.dictation_section = "subjective"
+            self.dictation_log.append("Section set to subjective")
+        elif text_lower in ["objective", "object"]:
+            self.dictation_section = "objective"
+            self.dictation_log.append("Section set to objective")
+        elif text_lower in ["assessment", "assess"]:
+            self.dictation_section = "assessment"
+            self.dictation_log.append("Section set to assessment")
+        elif text_lower in ["plan"]:
+            self.dictation_section = "plan"
+            self.dictation_log.append("Section set to plan")
+        elif text_lower in ["save"]:
+            self.save_note()
+        elif text_lower in ["quit", "exit", "stop"]:
+            return False
+        # Add dictation to note
+        elif self.add_dictation_to_note(text, self.current_speaker, self.dictation_section):
+            self.dictation_log.append(f"{self.current_speaker.value}: {text}")
+        return True
+    
+    def _end_dictation(self):
+        # Phrases captured after "quit" are dropped
+        self._dictation_pipeline = None
+        self.speech_manager.stop_background_capture()
+    
     def stop_dictation_session(self):
         """Stop the current dictation session."""
         # Add your logic to stop dictation here
         # For example, if you have a speech_manager:
-        if hasattr(self, "speech_manager"):
-            self.speech_manager.stop_listening = True  # Or your actual stop logic
+        self._dictation_pipeline = None
+        if self._speech_manager is not None:
+            self.speech_manager.stop_background_capture()
         st.write("Dictation session stopped.")
 
+    @metrics.timed("note.save")
     def save_note(self) -> bool:
         """Save the current SOAP note"""
         if not self.current_note:
             st.write("No active SOAP note to save")
             return False
         
-        success = self.db_manager.save_soap_note(self.current_note)
+        success = False
+        if self.current_draft_id is not None and self.draft_store.flush(self.current_draft_id):
+            # The draft already holds the note; finalizing is a server-side copy
+            success = self.db_manager.finalize_draft(self.current_draft_id, owner=self.draft_store.owner)
+        if not success and self.current_draft_id is not None and self.draft_store.taken_over(self.current_draft_id):
+            # Another session resumed this draft; saving our copy too would duplicate the note
+            st.write(f"Draft {self.current_draft_id} was taken over by another session; note not saved")
+            return False
+        if not success:
+            # No draft, or it was discarded elsewhere or could not be finalized: save the in-memory note
+            success = self.db_manager.save_soap_note(self.current_note)
+            if success and self.current_draft_id is not None:
+                self.draft_store.discard(self.current_draft_id)
         if success:
             self.print_note_summary()
             self.current_note = None
+            self.current_draft_id = None
         return success
     
+    def open_drafts(self, patient_id: Optional[str] = None, doctor_id: Optional[str] = None) -> List[Dict]:
+        """Every unfinished note; see can_resume_draft() for those that need a take-over"""
+        if self.draft_store is None:
+            return []
+        return self.draft_store.open_drafts(patient_id, doctor_id)
+    
+    def can_resume_draft(self, draft: Dict) -> bool:
+        """True if the draft belongs to this session or was left idle, so no take-over is needed"""
+        return self.draft_store is not None and self.draft_store.can_claim(draft)
+    
+    def resume_draft(self, draft_id, take_over: bool = False) -> bool:
+        """
+        Make an autosaved draft the current note
+        
+        Args:
+            take_over: Resume it even if another session is still editing it;
+                that session can no longer save it
+        """
+        if self.draft_store is None:
+            return False
+        draft_id = ObjectId(draft_id)
+        note = self.draft_store.load(draft_id, take_over=take_over)
+        if note is None:
+            st.write(f"Draft {draft_id} not found or being edited in another session")
+            return False
+        self.current_note = note
+        self.current_draft_id = draft_id
+        st.write(f"Resumed draft for patient {note.patient_id} started {note.date}")
+        return True
+    
+    def discard_draft(self, draft_id) -> None:
+        """Delete one of this session's (or a stale) autosaved drafts"""
+        if self.draft_store is not None and not self.draft_store.discard(ObjectId(draft_id)):
+            st.write(f"Draft {draft_id} is being edited in another session")
+            return
+        if self.current_draft_id == ObjectId(draft_id):
+            self.current_note = None
+            self.current_draft_id = None
+    
     def print_note_summary(self):
         """Print a summary of the current SOAP note"""
         if not self.current_note:
@@ -217,11 +365,40 @@ class SOAPNoteManager:
         """Get SOAP notes for a specific patient"""
         return self.db_manager.get_patient_notes(patient_id, limit)
     
-    def search_notes(self, query: str, field: str = "all") -> List[Dict]:
+    def search_notes(self, query: str, field: str = "all", limit: int = 20, skip: int = 0) -> List[Dict]:
         """Search SOAP notes by text content"""
-        return self.db_manager.search_notes(query, field)
+        return self.db_manager.search_notes(query, field, limit, skip)
+    
+    def iter_notes(self, patient_id: Optional[str] = None, since: Optional[datetime] = None,
+                   until: Optional[datetime] = None, batch_size: int = 500) -> Iterator[Dict]:
+        """Stream notes (optionally for one patient and/or a date range) without loading them all"""
+        return self.db_manager.iter_notes(patient_id, since, until, batch_size)
+    
+    def iter_search_notes(self, query: str, field: str = "all", batch_size: int = 500,
+                          patient_id: Optional[str] = None, since: Optional[datetime] = None,
+                          until: Optional[datetime] = None) -> Iterator[Dict]:
+        """Stream every note matching a text search, optionally for one patient and/or date range"""
+        return self.db_manager.iter_search_notes(query, field, batch_size, patient_id, since, until)
+    
+    def export_notes(self, path: str, fmt: Optional[str] = None, patient_id: Optional[str] = None,
+                     since: Optional[datetime] = None, until: Optional[datetime] = None,
+                     query: Optional[str] = None, batch_size: int = 500) -> int:
+        """
+        Export notes to a JSONL, CSV or PDF file and return the number written
+        
+        Notes are streamed from the database in batches of batch_size, so memory
+        use does not grow with the number of notes.
+        """
+        if query:
+            notes = self.iter_search_notes(query, batch_size=batch_size, patient_id=patient_id,
+                                           since=since, until=until)
+        else:
+            notes = self.iter_notes(patient_id, since, until, batch_size)
+        return export_to_file(notes, path, fmt)
     
     def close(self):
         """Close all connections and cleanup"""
+        if self.draft_store is not None:
+            self.draft_store.flush()
         self.db_manager.close_connection()
 
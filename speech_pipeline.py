@@ -0,0 +1,158 @@
+# File: speech_pipeline.py
+"""
+Background speech capture and concurrent recognition
+"""
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import speech_recognition as sr
+import metrics
+
+_SENTINEL = object()
+
+@dataclass
+class RecognitionResult:
+    sequence: int
+    text: Optional[str]
+    error: str = ""
+
+
+def microphone_audio_source(recognizer: sr.Recognizer, microphone: sr.Microphone,
+                            stop_event: threading.Event, timeout: int = 10,
+                            phrase_time_limit: int = 40) -> Iterator[sr.AudioData]:
+    """Yield one AudioData per phrase heard on the microphone until stop_event is set"""
+    with microphone as source:
+        while not stop_event.is_set():
+            try:
+                with metrics.timer("speech.listen"):
+                    audio = recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
+            except sr.WaitTimeoutError:
+                continue
+            yield audio
+
+
+def wav_file_audio_source(recognizer: sr.Recognizer, paths: Iterable[str]) -> Iterator[sr.AudioData]:
+    """Yield one AudioData per WAV file, for offline runs without a microphone"""
+    for path in paths:
+        with sr.AudioFile(str(path)) as source:
+            yield recognizer.record(source)
+
+
+class CapturePipeline:
+    def __init__(self, recognize: Callable[[sr.AudioData], str], workers: int = 2, max_pending: int = 8):
+        """
+        Initialize a capture pipeline
+
+        Args:
+            recognize: Function turning captured audio into text
+            workers: Number of phrases recognized concurrently
+            max_pending: Captured phrases that may wait for a worker before capture blocks
+        """
+        self.recognize = recognize
+        self.workers = workers
+        self._chunks: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._done: Dict[int, RecognitionResult] = {}
+        self._condition = threading.Condition()
+        self._next_sequence = 0
+        self._captured: Optional[int] = None  # set once the audio source is exhausted
+
+    @property
+    def stop_event(self) -> threading.Event:
+        return self._stop_event
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    @property
+    def finished(self) -> bool:
+        """True once every captured phrase has been returned"""
+        with self._condition:
+            return self._captured is not None and self._next_sequence >= self._captured
+
+    def start(self, audio_source: Iterable[sr.AudioData]):
+        """Start capturing from audio_source and recognizing in the background"""
+        producer = threading.Thread(target=self._produce, args=(audio_source,), daemon=True)
+        self._threads = [producer] + [
+            threading.Thread(target=self._recognize_chunks, daemon=True) for _ in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stop capturing; phrases already captured are still recognized"""
+        self._stop_event.set()
+
+    def _put(self, item) -> bool:
+        """Put into the bounded chunk queue, giving up if the pipeline is stopped"""
+        while True:
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if self._stop_event.is_set() and item is not _SENTINEL:
+                    return False
+
+    def _produce(self, audio_source: Iterable[sr.AudioData]):
+        sequence = 0
+        try:
+            for audio in audio_source:
+                if self._stop_event.is_set() or not self._put((sequence, audio)):
+                    break
+                sequence += 1
+        finally:
+            with self._condition:
+                self._captured = sequence
+                self._condition.notify_all()
+            for _ in range(self.workers):
+                self._put(_SENTINEL)
+
+    def _recognize_chunks(self):
+        while True:
+            item = self._chunks.get()
+            if item is _SENTINEL:
+                break
+            sequence, audio = item
+            try:
+                result = RecognitionResult(sequence, self.recognize(audio))
+            except sr.UnknownValueError:
+                metrics.increment("soap_speech_failures_total", reason="unknown_value")
+                result = RecognitionResult(sequence, None, "Could not understand the speech")
+            except sr.RequestError as e:
+                metrics.increment("soap_speech_failures_total", reason="request_error")
+                result = RecognitionResult(sequence, None, f"Error with speech recognition service: {e}")
+            except Exception as e:
+                metrics.increment("soap_speech_failures_total", reason="error")
+                result = RecognitionResult(sequence, None, str(e))
+            with self._condition:
+                self._done[sequence] = result
+                self._condition.notify_all()
+
+    def get_result(self, timeout: Optional[float] = None) -> Optional[RecognitionResult]:
+        """
+        Return the next result in capture order
+
+        Returns:
+            The next RecognitionResult, or None on timeout or once every captured phrase was returned
+        """
+        with self._condition:
+            ready = self._condition.wait_for(
+                lambda: self._next_sequence in self._done or self._captured == self._next_sequence,
+                timeout=timeout
+            )
+            if not ready or self._next_sequence not in self._done:
+                return None
+            result = self._done.pop(self._next_sequence)
+            self._next_sequence += 1
+            return result
+
+    def results(self) -> Iterator[RecognitionResult]:
+        """Yield results in capture order until the audio source is exhausted or stopped"""
+        while True:
+            result = self.get_result()
+            if result is None:
+                return
+            yield result
@@ -4,18 +4,100 @@ Speech recognition and dictation handling
 """
 import speech_recognition as sr
 import streamlit as st
-from typing import Optional
+from typing import Iterable, Optional
+from speech_pipeline import CapturePipeline, microphone_audio_source, wav_file_audio_source
+from recognizer_backends import RecognizerBackend, GoogleRecognizerBackend, FixtureRecognizerBackend
+from calibration_cache import CalibrationCache
+import metrics
 
 class SpeechRecognitionManager:
-    def __init__(self):
-        """Initialize speech recognition components"""
+    def __init__(self, backend: Optional[RecognizerBackend] = None,
+                 audio_source: Optional[Iterable[sr.AudioData]] = None,
+                 device_index: Optional[int] = None,
+                 calibration_cache: Optional[CalibrationCache] = None):
+        """
+        Initialize speech recognition components
+        
+        The microphone is opened and calibrated on first use, so constructing
+        the manager works on hosts without audio devices.
+        
+        Args:
+            backend: Recognizer backend (defaults to Google Web Speech)
+            audio_source: Iterable of AudioData to use instead of the microphone
+            device_index: Microphone device index (None for the system default)
+            calibration_cache: Where calibrated energy thresholds are persisted
+        """
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        self.backend = backend or GoogleRecognizerBackend(self.recognizer)
+        self.audio_source = iter(audio_source) if audio_source is not None else None
+        self.source_exhausted = False
+        self.device_index = device_index
+        self.calibration_cache = calibration_cache or CalibrationCache()
+        self._microphone: Optional[sr.Microphone] = None
+        
+        self.pipeline: Optional[CapturePipeline] = None
+    
+    @property
+    def microphone(self) -> sr.Microphone:
+        """The microphone, opened and calibrated on first access"""
+        if self._microphone is None:
+            microphone = sr.Microphone(device_index=self.device_index)
+            self._calibrate(microphone)
+            self._microphone = microphone
+        return self._microphone
+    
+    def _device_key(self) -> str:
+        """Identify the microphone for the calibration cache"""
+        if self.device_index is None:
+            return "default"
+        try:
+            name = sr.Microphone.list_microphone_names()[self.device_index]
+        except (IndexError, OSError, AttributeError):
+            name = ""
+        return f"{self.device_index}:{name}"
+    
+    def _calibrate(self, microphone: sr.Microphone, force: bool = False):
+        """Apply a cached energy threshold, or adjust for ambient noise and cache the result"""
+        device_key = self._device_key()
+        cached_threshold = None if force else self.calibration_cache.get(device_key)
+        if cached_threshold is not None:
+            self.recognizer.energy_threshold = cached_threshold
+            st.write("Speech recognition initialized with cached calibration")
+            return
         
         # Adjust for ambient noise
-        with self.microphone as source:
+        with microphone as source, metrics.timer("speech.calibrate"):
             self.recognizer.adjust_for_ambient_noise(source)
             st.write("Speech recognition initialized and calibrated")
+        self.calibration_cache.set(device_key, self.recognizer.energy_threshold)
+    
+    def recalibrate(self):
+        """Force a fresh ambient-noise calibration of the microphone"""
+        self._calibrate(self.microphone, force=True)
+    
+    @classmethod
+    def from_fixture_directory(cls, directory: str) -> "SpeechRecognitionManager":
+        """Create an offline manager that replays WAV fixtures with their .txt transcripts"""
+        backend, wav_paths = FixtureRecognizerBackend.from_directory(directory)
+        return cls(backend=backend, audio_source=wav_file_audio_source(sr.Recognizer(), wav_paths))
+    
+    @metrics.timed("speech.recognize")
+    def recognize(self, audio: sr.AudioData) -> str:
+        """Convert captured audio to text"""
+        return self.backend.recognize(audio)
+    
+    def capture_audio(self, timeout: int = 10, phrase_time_limit: int = 40) -> Optional[sr.AudioData]:
+        """Capture one phrase from the audio source or microphone"""
+        if self.audio_source is not None:
+            audio = next(self.audio_source, None)
+            if audio is None:
+                self.source_exhausted = True
+            return audio
+        
+        with self.microphone as source:
+            st.write("Listening... (speak now)")
+            with metrics.timer("speech.listen"):
+                return self.recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
     
     def listen_for_speech(self, timeout: int = 10, phrase_time_limit: int = 40) -> Optional[str]:
         """
@@ -29,35 +111,75 @@ class SpeechRecognitionManager:
             Recognized text or None if failed
         """
         try:
-            with self.microphone as source:
-                st.write("Listening... (speak now)")
-                audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
+            audio = self.capture_audio(timeout, phrase_time_limit)
+            if audio is None:
+                return None
             
             st.write("Processing speech...")
-            text = self.recognizer.recognize_google(audio)
+            text = self.recognize(audio)
             return text
         
         except sr.WaitTimeoutError:
+            metrics.increment("soap_speech_failures_total", reason="timeout")
             st.write("No speech detected within timeout period")
             return None
         except sr.UnknownValueError:
+            metrics.increment("soap_speech_failures_total", reason="unknown_value")
             st.write("Could not understand the speech")
             return None
         except sr.RequestError as e:
+            metrics.increment("soap_speech_failures_total", reason="request_error")
             st.write(f"Error with speech recognition service: {e}")
             return None
     
     def test_microphone(self) -> bool:
         """Test if microphone is working"""
         try:
-            with self.microphone as source:
-                st.write("Testing microphone... Say something!")
-                audio = self.recognizer.listen(source, timeout=3, phrase_time_limit=5)
-                text = self.recognizer.recognize_google(audio)
-                st.write(f"Microphone test successful. You said: {text}")
-                return True
+            st.write("Testing microphone... Say something!")
+            audio = self.capture_audio(timeout=3, phrase_time_limit=5)
+            if audio is None:
+                st.write("Microphone test failed: no audio captured")
+                return False
+            text = self.recognize(audio)
+            st.write(f"Microphone test successful. You said: {text}")
+            return True
         except Exception as e:
             st.write(f"Microphone test failed: {e}")
             return False
+    
+    def start_background_capture(self, audio_source: Optional[Iterable[sr.AudioData]] = None,
+                                 workers: int = 2, max_pending: int = 8,
+                                 timeout: int = 10, phrase_time_limit: int = 40) -> CapturePipeline:
+        """
+        Capture phrases on a background thread and recognize them concurrently
+        
+        Args:
+            audio_source: Iterable of AudioData (defaults to the microphone);
+                use speech_pipeline.wav_file_audio_source for offline runs
+            workers: Number of phrases recognized at the same time
+            max_pending: Captured phrases buffered before capture waits for recognition
+            timeout: Maximum time to wait for each phrase to start
+            phrase_time_limit: Maximum time for a single phrase
+            
+        Returns:
+            The running pipeline; read ordered results with get_result() or results()
+        """
+        self.stop_background_capture()
+        pipeline = CapturePipeline(self.recognize, workers=workers, max_pending=max_pending)
+        if audio_source is None and self.audio_source is not None:
+            audio_source = self.audio_source
+        elif audio_source is None:
+            audio_source = microphone_audio_source(
+                self.recognizer, self.microphone, pipeline.stop_event, timeout, phrase_time_limit
+            )
+        pipeline.start(audio_source)
+        self.pipeline = pipeline
+        return pipeline
+    
+    def stop_background_capture(self):
+        """Stop the background capture pipeline, if one is running"""
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.pipeline = None
 
 # ==========================================
@@ -0,0 +1,362 @@
+# File: sqlite_database_manager.py
+"""
+Embedded SQLite storage for single-machine deployments and hermetic tests
+
+Notes live in one table with a (patient_id, date) index; an external-content
+FTS5 table kept in sync by triggers serves search_notes. The database runs in
+WAL mode so readers never wait for the writer.
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from models import Patient, Doctor, SOAPNote
+from search_index import SOAP_FIELDS, tokenize
+from storage_backend import StorageBackend
+import metrics
+import streamlit as st
+
+# Bump when SCHEMA changes; stored in PRAGMA user_version
+SCHEMA_VERSION = 1
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS patients (
+    patient_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    date_of_birth TEXT,
+    contact TEXT DEFAULT '',
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS doctors (
+    doctor_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    specialty TEXT DEFAULT '',
+    contact TEXT DEFAULT '',
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS soap_notes (
+    id INTEGER PRIMARY KEY,
+    patient_id TEXT NOT NULL,
+    doctor_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    subjective TEXT DEFAULT '',
+    objective TEXT DEFAULT '',
+    assessment TEXT DEFAULT '',
+    plan TEXT DEFAULT '',
+    raw_transcript TEXT DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS soap_notes_patient_date ON soap_notes (patient_id, date DESC);
+CREATE INDEX IF NOT EXISTS soap_notes_doctor ON soap_notes (doctor_id);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS soap_notes_fts USING fts5(
+    {", ".join(SOAP_FIELDS)}, content='soap_notes', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS soap_notes_fts_insert AFTER INSERT ON soap_notes BEGIN
+    INSERT INTO soap_notes_fts (rowid, {", ".join(SOAP_FIELDS)})
+    VALUES (new.id, {", ".join("new." + field for field in SOAP_FIELDS)});
+END;
+CREATE TRIGGER IF NOT EXISTS soap_notes_fts_delete AFTER DELETE ON soap_notes BEGIN
+    INSERT INTO soap_notes_fts (soap_notes_fts, rowid, {", ".join(SOAP_FIELDS)})
+    VALUES ('delete', old.id, {", ".join("old." + field for field in SOAP_FIELDS)});
+END;
+CREATE TRIGGER IF NOT EXISTS soap_notes_fts_update AFTER UPDATE ON soap_notes BEGIN
+    INSERT INTO soap_notes_fts (soap_notes_fts, rowid, {", ".join(SOAP_FIELDS)})
+    VALUES ('delete', old.id, {", ".join("old." + field for field in SOAP_FIELDS)});
+    INSERT INTO soap_notes_fts (rowid, {", ".join(SOAP_FIELDS)})
+    VALUES (new.id, {", ".join("new." + field for field in SOAP_FIELDS)});
+END;
+"""
+
+NOTE_COLUMNS = ("patient_id", "doctor_id", "date") + tuple(SOAP_FIELDS) + ("raw_transcript",)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) and value else value
+
+
+def _match_expression(query: str, field: str) -> Optional[str]:
+    """FTS5 query matching notes with all of the words in query, like the other search backends"""
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return None
+    expression = " AND ".join(f'"{term}"' for term in terms)
+    return expression if field == "all" else f"{{{field}}} : ({expression})"
+
+
+class SQLiteDatabaseManager(StorageBackend):
+    def __init__(self, path: str = "medical_records.db", lookup_cache_size: int = 1024,
+                 lookup_cache_ttl_seconds: float = 300.0):
+        """
+        Open (and if needed create) a SQLite database file
+
+        Args:
+            path: Database file, or ":memory:" for a throwaway database
+            lookup_cache_size: Patients (and doctors) kept in the process-wide lookup caches
+            lookup_cache_ttl_seconds: How long a cached patient or doctor is trusted
+        """
+        # Every ":memory:" connection is its own database, so it gets caches of its own
+        cache_namespace = None if path == ":memory:" else ("sqlite", os.path.abspath(path))
+        super().__init__(cache_namespace, lookup_cache_size, lookup_cache_ttl_seconds)
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock:
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                return
+            self._conn.executescript(SCHEMA)
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _execute(self, sql: str, params: Tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def _fetch_batches(self, sql: str, params: Tuple, batch_size: int) -> Iterator[sqlite3.Row]:
+        """Yield rows of a query, holding the connection lock only while a batch is fetched"""
+        cursor = self._conn.cursor()
+        try:
+            with self._lock:
+                cursor.execute(sql, params)
+            while True:
+                with self._lock:
+                    rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _note_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        note = dict(row)
+        note["_id"] = note.pop("id")
+        if "date" in note:
+            note["date"] = _parse_datetime(note["date"])
+        if "raw_transcript" in note:
+            entries = json.loads(note["raw_transcript"] or "[]")
+            for entry in entries:
+                entry["timestamp"] = _parse_datetime(entry.get("timestamp"))
+            note["raw_transcript"] = entries
+        return note
+
+    @staticmethod
+    def _person_from_row(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        person = dict(row)
+        person["created_at"] = _parse_datetime(person.get("created_at"))
+        return person
+
+    @staticmethod
+    def _select_columns(projection: Optional[Dict]) -> str:
+        if not projection:
+            return "id, " + ", ".join(NOTE_COLUMNS)
+        return ", ".join(["id"] + [column for column in NOTE_COLUMNS if projection.get(column)])
+
+    def _highest_patient_number(self) -> int:
+        """Highest numeric part of existing Pxxxx patient IDs"""
+        row = self._execute(
+            "SELECT MAX(CAST(SUBSTR(patient_id, 2) AS INTEGER)) FROM patients "
+            "WHERE patient_id GLOB 'P[0-9]*' AND SUBSTR(patient_id, 2) NOT GLOB '*[^0-9]*'"
+        ).fetchone()
+        return row[0] or 0
+
+    def allocate_patient_id(self) -> str:
+        """Reserve the next patient ID (Pxxxx); safe under concurrent users and processes"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT seq FROM counters WHERE name = 'patient_id'").fetchone()
+                seq = (row[0] if row else self._highest_patient_number()) + 1
+                self._conn.execute(
+                    "INSERT INTO counters (name, seq) VALUES ('patient_id', ?) "
+                    "ON CONFLICT (name) DO UPDATE SET seq = excluded.seq", (seq,)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return f"P{seq:04d}"
+
+    def peek_next_patient_id(self) -> str:
+        """Preview the next patient ID without reserving it"""
+        row = self._execute("SELECT seq FROM counters WHERE name = 'patient_id'").fetchone()
+        return f"P{(row[0] if row else self._highest_patient_number()) + 1:04d}"
+
+    def _insert_patient(self, patient: Patient) -> bool:
+        try:
+            self._execute(
+                "INSERT INTO patients (patient_id, name, date_of_birth, contact, created_at) VALUES (?, ?, ?, ?, ?)",
+                (patient.patient_id, patient.name, patient.date_of_birth, patient.contact,
+                 patient.created_at.isoformat())
+            )
+            st.write(f"Patient {patient.name} added successfully")
+            return True
+        except sqlite3.IntegrityError:
+            st.write(f"Patient with ID {patient.patient_id} already exists")
+            return False
+
+    def _insert_doctor(self, doctor: Doctor) -> bool:
+        try:
+            self._execute(
+                "INSERT INTO doctors (doctor_id, name, specialty, contact, created_at) VALUES (?, ?, ?, ?, ?)",
+                (doctor.doctor_id, doctor.name, doctor.specialty, doctor.contact, doctor.created_at.isoformat())
+            )
+            st.write(f"Doctor {doctor.name} added successfully")
+            return True
+        except sqlite3.IntegrityError:
+            st.write(f"Doctor with ID {doctor.doctor_id} already exists")
+            return False
+
+    @metrics.timed("db.get_patient")
+    def _find_patient(self, patient_id: str) -> Optional[Dict]:
+        return self._person_from_row(
+            self._execute("SELECT * FROM patients WHERE patient_id = ?", (patient_id,)).fetchone()
+        )
+
+    @metrics.timed("db.get_doctor")
+    def _find_doctor(self, doctor_id: str) -> Optional[Dict]:
+        return self._person_from_row(
+            self._execute("SELECT * FROM doctors WHERE doctor_id = ?", (doctor_id,)).fetchone()
+        )
+
+    def iter_patients(self, limit: int = 0) -> Iterator[Dict]:
+        """Patients, most recently added first"""
+        sql = "SELECT * FROM patients ORDER BY created_at DESC LIMIT ?"
+        for row in self._fetch_batches(sql, (limit or -1,), 1000):
+            yield self._person_from_row(row)
+
+    def iter_doctors(self, limit: int = 0) -> Iterator[Dict]:
+        """Doctors, most recently added first"""
+        sql = "SELECT * FROM doctors ORDER BY created_at DESC LIMIT ?"
+        for row in self._fetch_batches(sql, (limit or -1,), 1000):
+            yield self._person_from_row(row)
+
+    @metrics.timed("db.save_soap_note")
+    def save_soap_note(self, note: SOAPNote) -> bool:
+        """Save SOAP note to database"""
+        try:
+            note.clean_fields()
+            cursor = self._execute(
+                f"INSERT INTO soap_notes ({', '.join(NOTE_COLUMNS)}) VALUES ({', '.join('?' * len(NOTE_COLUMNS))})",
+                (note.patient_id, note.doctor_id, note.date.isoformat(),
+                 *(getattr(note, field) for field in SOAP_FIELDS),
+                 json.dumps(note.transcript_dicts(), default=_json_default))
+            )
+            st.write(f"SOAP note saved successfully with ID: {cursor.lastrowid}")
+            return True
+        except Exception as e:
+            metrics.increment("soap_db_failures_total", operation="save_soap_note", error=type(e).__name__)
+            st.write(f"Error saving note: {e}")
+            return False
+
+    @metrics.timed("db.get_patient_notes")
+    def get_patient_notes(self, patient_id: str, limit: int = 10) -> List[Dict]:
+        """Get SOAP notes for a specific patient"""
+        rows = self._execute(
+            f"SELECT {self._select_columns(None)} FROM soap_notes WHERE patient_id = ? "
+            "ORDER BY date DESC LIMIT ?", (patient_id, limit)
+        ).fetchall()
+        return [self._note_from_row(row) for row in rows]
+
+    @staticmethod
+    def _note_conditions(patient_id: Optional[str] = None, since: Optional[datetime] = None,
+                         until: Optional[datetime] = None, table: str = "") -> Tuple[List[str], List[Any]]:
+        prefix = f"{table}." if table else ""
+        conditions, params = [], []
+        if patient_id:
+            conditions.append(f"{prefix}patient_id = ?")
+            params.append(patient_id)
+        if since:
+            conditions.append(f"{prefix}date >= ?")
+            params.append(since.isoformat())
+        if until:
+            conditions.append(f"{prefix}date < ?")
+            params.append(until.isoformat())
+        return conditions, params
+
+    def iter_notes(self, patient_id: Optional[str] = None, since: Optional[datetime] = None,
+                   until: Optional[datetime] = None, batch_size: int = 500,
+                   projection: Optional[Dict] = None) -> Iterator[Dict]:
+        """
+        Stream SOAP notes from the database without building a list
+
+        Args:
+            patient_id: Only notes for this patient (newest first, using the patient/date index)
+            since: Only notes dated on or after this time
+            until: Only notes dated before this time
+            batch_size: Rows fetched at a time
+            projection: Fields to return (default: all)
+        """
+        conditions, params = self._note_conditions(patient_id, since, until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = "date DESC" if patient_id else "id"
+        sql = f"SELECT {self._select_columns(projection)} FROM soap_notes {where} ORDER BY {order}"
+        for row in self._fetch_batches(sql, tuple(params), batch_size):
+            yield self._note_from_row(row)
+
+    def _search_sql(self, field: str, conditions: List[str] = (), ranked: bool = True) -> str:
+        if field != "all" and field not in SOAP_FIELDS:
+            raise ValueError(f"Unknown SOAP field: {field}")
+        columns = ", ".join(f"n.{column}" for column in ("id",) + NOTE_COLUMNS)
+        where = " AND ".join(["soap_notes_fts MATCH ?", *conditions])
+        sql = (
+            f"SELECT {columns}, -bm25(soap_notes_fts) AS score FROM soap_notes_fts "
+            f"JOIN soap_notes n ON n.id = soap_notes_fts.rowid WHERE {where}"
+        )
+        return sql + " ORDER BY bm25(soap_notes_fts)" if ranked else sql
+
+    @metrics.timed("db.search_notes")
+    def search_notes(self, query: str, field: str = "all", limit: int = 20, skip: int = 0) -> List[Dict]:
+        """
+        Search SOAP notes by text content
+
+        Args:
+            query: Search terms; a note must contain all of them
+            field: "all" or one of subjective/objective/assessment/plan
+            limit: Maximum number of notes to return
+            skip: Number of ranked notes to skip (for pagination)
+
+        Returns:
+            Matching notes, best match first
+        """
+        sql = self._search_sql(field)
+        expression = _match_expression(query, field)
+        if expression is None:
+            return []
+        rows = self._execute(sql + " LIMIT ? OFFSET ?", (expression, limit, skip)).fetchall()
+        return [self._note_from_row(row) for row in rows]
+
+    def iter_search_notes(self, query: str, field: str = "all", batch_size: int = 500,
+                          patient_id: Optional[str] = None, since: Optional[datetime] = None,
+                          until: Optional[datetime] = None) -> Iterator[Dict]:
+        """Stream every note matching a text search, unranked so rows are not sorted up front"""
+        conditions, params = self._note_conditions(patient_id, since, until, table="n")
+        sql = self._search_sql(field, conditions, ranked=False)
+        expression = _match_expression(query, field)
+        if expression is None:
+            return
+        for row in self._fetch_batches(sql, (expression, *params), batch_size):
+            yield self._note_from_row(row)
+
+    def close_connection(self):
+        """Close the database file"""
+        with self._lock:
+            self._conn.close()
+        st.write("Database connection closed")
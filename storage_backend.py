@@ -0,0 +1,180 @@
+# File: storage_backend.py
+"""
+Storage interface shared by the MongoDB and SQLite database managers
+"""
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Hashable, Iterator, List, Optional
+from models import Patient, Doctor, SOAPNote
+from lookup_cache import LookupCache, shared_cache
+
+STORAGE_BACKENDS = ("mongodb", "sqlite")
+
+
+class StorageBackend(ABC):
+    """
+    Everything SOAPNoteManager and the exporters need from a database
+
+    Patient and doctor lookups go through an LRU/TTL cache shared by every
+    backend instance in the process that names the same database; backends
+    implement the uncached _find_*/_insert_* methods.
+    """
+
+    # Collection for autosaved drafts; None when the backend does not support them.
+    # Backends that set it also provide finalize_draft(draft_id) -> bool
+    drafts_collection = None
+
+    def __init__(self, cache_namespace: Optional[Hashable] = None, lookup_cache_size: int = 1024,
+                 lookup_cache_ttl_seconds: float = 300.0):
+        """
+        Args:
+            cache_namespace: Identifies the database for the shared lookup caches;
+                None gives this instance caches of its own
+            lookup_cache_size: Patients (and doctors) kept in the lookup caches
+            lookup_cache_ttl_seconds: How long a cached patient or doctor is trusted
+        """
+        if cache_namespace is None:
+            self.patient_cache = LookupCache(lookup_cache_size, lookup_cache_ttl_seconds)
+            self.doctor_cache = LookupCache(lookup_cache_size, lookup_cache_ttl_seconds)
+        else:
+            self.patient_cache = shared_cache((cache_namespace, "patients"), lookup_cache_size,
+                                              lookup_cache_ttl_seconds)
+            self.doctor_cache = shared_cache((cache_namespace, "doctors"), lookup_cache_size,
+                                             lookup_cache_ttl_seconds)
+
+    @abstractmethod
+    def allocate_patient_id(self) -> str:
+        """Reserve the next patient ID (Pxxxx); safe under concurrent users"""
+
+    @abstractmethod
+    def peek_next_patient_id(self) -> str:
+        """Preview the next patient ID without reserving it"""
+
+    @abstractmethod
+    def _insert_patient(self, patient: Patient) -> bool:
+        """Insert a patient; False if the ID already exists"""
+
+    @abstractmethod
+    def _insert_doctor(self, doctor: Doctor) -> bool:
+        """Insert a doctor; False if the ID already exists"""
+
+    @abstractmethod
+    def _find_patient(self, patient_id: str) -> Optional[Dict]:
+        """Read a patient from the database"""
+
+    @abstractmethod
+    def _find_doctor(self, doctor_id: str) -> Optional[Dict]:
+        """Read a doctor from the database"""
+
+    @abstractmethod
+    def iter_patients(self, limit: int = 0) -> Iterator[Dict]:
+        """Patients, most recently added first (limit 0 means all)"""
+
+    @abstractmethod
+    def iter_doctors(self, limit: int = 0) -> Iterator[Dict]:
+        """Doctors, most recently added first (limit 0 means all)"""
+
+    def add_patient(self, patient: Patient) -> bool:
+        """Add a new patient to the database"""
+        try:
+            return self._insert_patient(patient)
+        finally:
+            self.patient_cache.invalidate(patient.patient_id)
+
+    def add_doctor(self, doctor: Doctor) -> bool:
+        """Add a new doctor to the database"""
+        try:
+            return self._insert_doctor(doctor)
+        finally:
+            self.doctor_cache.invalidate(doctor.doctor_id)
+
+    def get_patient(self, patient_id: str) -> Optional[Dict]:
+        """Get patient by ID"""
+        return self.patient_cache.get_or_load(patient_id, self._find_patient)
+
+    def get_doctor(self, doctor_id: str) -> Optional[Dict]:
+        """Get doctor by ID"""
+        return self.doctor_cache.get_or_load(doctor_id, self._find_doctor)
+
+    def warm_lookup_caches(self) -> int:
+        """
+        Fill the patient and doctor caches with the most recently added records; returns the count
+
+        A shared cache that already holds entries (warmed by another session) is left alone.
+        """
+        count = 0
+        for cache, records, key in ((self.patient_cache, self.iter_patients, "patient_id"),
+                                    (self.doctor_cache, self.iter_doctors, "doctor_id")):
+            if cache.stats()["size"]:
+                continue
+            for record in records(cache.max_entries):
+                cache.put(record[key], record)
+                count += 1
+        return count
+
+    def invalidate_lookup_caches(self):
+        """Forget every cached patient and doctor (e.g. after a bulk import)"""
+        self.patient_cache.invalidate()
+        self.doctor_cache.invalidate()
+
+    def lookup_cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """Hit/miss statistics of the patient and doctor caches"""
+        return {"patients": self.patient_cache.stats(), "doctors": self.doctor_cache.stats()}
+
+    @abstractmethod
+    def save_soap_note(self, note: SOAPNote) -> bool:
+        """Save SOAP note to database"""
+
+    @abstractmethod
+    def get_patient_notes(self, patient_id: str, limit: int = 10) -> List[Dict]:
+        """Get SOAP notes for a specific patient, newest first"""
+
+    @abstractmethod
+    def iter_notes(self, patient_id: Optional[str] = None, since: Optional[datetime] = None,
+                   until: Optional[datetime] = None, batch_size: int = 500,
+                   projection: Optional[Dict] = None) -> Iterator[Dict]:
+        """Stream SOAP notes without building a list"""
+
+    @abstractmethod
+    def search_notes(self, query: str, field: str = "all", limit: int = 20, skip: int = 0) -> List[Dict]:
+        """Search SOAP notes by text content, best match first"""
+
+    @abstractmethod
+    def iter_search_notes(self, query: str, field: str = "all", batch_size: int = 500,
+                          patient_id: Optional[str] = None, since: Optional[datetime] = None,
+                          until: Optional[datetime] = None) -> Iterator[Dict]:
+        """Stream every note matching a text search, optionally for one patient and/or date range"""
+
+    @abstractmethod
+    def close_connection(self):
+        """Release the database connection"""
+
+    def invalidate_search_index(self):
+        """Drop cached search state after a bulk change; backends with a live index need nothing"""
+
+
+def open_storage(backend: Optional[str] = None, mongodb_uri: str = "mongodb://localhost:27017/",
+                 db_name: str = "medical_records", sqlite_path: Optional[str] = None,
+                 lookup_cache_size: int = 1024, lookup_cache_ttl_seconds: float = 300.0) -> StorageBackend:
+    """
+    Create the configured storage backend
+
+    Args:
+        backend: "mongodb" or "sqlite" (default: SOAP_STORAGE, else mongodb)
+        mongodb_uri: MongoDB connection string
+        db_name: MongoDB database name
+        sqlite_path: SQLite database file (default: SOAP_SQLITE_PATH, else <db_name>.db)
+        lookup_cache_size: Patients (and doctors) kept in the shared lookup caches
+        lookup_cache_ttl_seconds: How long a cached patient or doctor is trusted
+    """
+    backend = (backend or os.environ.get("SOAP_STORAGE") or "mongodb").lower()
+    cache_options = {"lookup_cache_size": lookup_cache_size, "lookup_cache_ttl_seconds": lookup_cache_ttl_seconds}
+    if backend == "mongodb":
+        from database_manager import DatabaseManager
+        return DatabaseManager(mongodb_uri, db_name, **cache_options)
+    if backend == "sqlite":
+        from sqlite_database_manager import SQLiteDatabaseManager
+        return SQLiteDatabaseManager(sqlite_path or os.environ.get("SOAP_SQLITE_PATH") or f"{db_name}.db",
+                                     **cache_options)
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,31 @@
+import math
+import os
+import struct
+import sys
+import wave
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# After the root, so "database_manager" is the SOAP notes one (as in benchmarks/run_benchmarks.py)
+sys.path.append(os.path.join(ROOT, "animal_chart"))
+
+
+@pytest.fixture
+def wav_fixtures(tmp_path):
+    """Write one WAV per phrase (a distinct tone each) with its .txt transcript; returns the directory"""
+    def write(phrases, sample_rate=8000, seconds=0.1):
+        frames = int(sample_rate * seconds)
+        for i, phrase in enumerate(phrases):
+            frequency = 220 + 10 * i
+            samples = (int(8000 * math.sin(2 * math.pi * frequency * n / sample_rate)) for n in range(frames))
+            base = tmp_path / f"phrase_{i:03d}"
+            with wave.open(str(base) + ".wav", "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(sample_rate)
+                wav.writeframes(b"".join(struct.pack("<h", s) for s in samples))
+            (tmp_path / f"phrase_{i:03d}.txt").write_text(phrase, encoding="utf-8")
+        return str(tmp_path)
+    return write
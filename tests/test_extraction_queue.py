@@ -0,0 +1,110 @@
+import io
+import time
+
+import pytest
+from PIL import Image
+
+from extraction import HTTPModelBackend
+from extraction_queue import DONE, FAILED, RUNNING, ExtractionQueue
+from fake_model_server import DEFAULT_RESPONSE, server_stats, start_fake_model_server
+
+# Image widths the responder and preprocess below treat specially
+UNPARSABLE_WIDTH, SERVER_ERROR_WIDTH, UNREADABLE_WIDTH = 13, 17, 19
+
+
+def image(width=10):
+    return Image.new("L", (width, 10), 255)
+
+
+def responder(png_bytes):
+    width = Image.open(io.BytesIO(png_bytes)).width
+    if width == SERVER_ERROR_WIDTH:
+        raise RuntimeError("model crashed")
+    if width == UNPARSABLE_WIDTH:
+        return "I could not read this chart"
+    return DEFAULT_RESPONSE
+
+
+def preprocess(img):
+    if img.width == UNREADABLE_WIDTH:
+        raise ValueError("no page found")
+    return img
+
+
+@pytest.fixture
+def fake_server():
+    servers = []
+
+    def start(**options):
+        server, url = start_fake_model_server(responder=responder, **options)
+        servers.append(server)
+        return server, HTTPModelBackend(url, timeout=10)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def test_jobs_are_sent_in_batches(fake_server):
+    server, backend = fake_server(delay=0.1)
+    extraction_queue = ExtractionQueue(backend, workers=1, batch_size=4, batch_wait=0.5)
+
+    job_ids = extraction_queue.submit_many([(image(), f"chart-{i}.png") for i in range(8)])
+    jobs = extraction_queue.wait(job_ids, timeout=10)
+
+    assert [job.status for job in jobs] == [DONE] * 8
+    assert all(job.result == DEFAULT_RESPONSE for job in jobs)
+    assert server_stats(server)["batch_sizes"] == [4, 4]
+
+
+def test_status_can_be_polled_while_the_model_runs(fake_server):
+    _server, backend = fake_server(delay=0.3)
+    extraction_queue = ExtractionQueue(backend, workers=1, batch_size=1)
+
+    job_id = extraction_queue.submit(image(), "chart.png")
+    seen = []
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        job = extraction_queue.status(job_id)
+        seen.append(job.status)
+        if job.status in (DONE, FAILED):
+            break
+        time.sleep(0.02)
+
+    assert RUNNING in seen and seen[-1] == DONE
+    assert job.image is None and job.filename == "chart.png" and job.finished_at is not None
+    assert extraction_queue.status("unknown") is None
+    assert extraction_queue.purge_finished(max_age=0) == 1
+    assert extraction_queue.status(job_id) is None
+
+
+def test_failures_stay_with_their_own_jobs(fake_server):
+    _server, backend = fake_server()
+    extraction_queue = ExtractionQueue(backend, workers=1, batch_size=3, batch_wait=0.5, preprocess=preprocess)
+
+    good, unparsable, unreadable = extraction_queue.submit_many(
+        [(image(), "good.png"), (image(UNPARSABLE_WIDTH), "unparsable.png"), (image(UNREADABLE_WIDTH), "blank.png")])
+    jobs = {job.job_id: job for job in extraction_queue.wait([good, unparsable, unreadable], timeout=10)}
+
+    assert jobs[good].status == DONE and jobs[good].result == DEFAULT_RESPONSE
+    assert jobs[unparsable].status == FAILED and "Could not parse" in jobs[unparsable].error
+    assert jobs[unreadable].status == FAILED and "preprocessing failed" in jobs[unreadable].error
+
+    # A failed model request fails only its batch, and the worker keeps going
+    crashed = extraction_queue.submit(image(SERVER_ERROR_WIDTH), "crash.png")
+    crash_job, = extraction_queue.wait([crashed], timeout=10)
+    assert crash_job.status == FAILED and "Model request failed" in crash_job.error
+    after, = extraction_queue.wait([extraction_queue.submit(image(), "after.png")], timeout=10)
+    assert after.status == DONE
+
+
+def test_server_stats_count_concurrent_requests(fake_server):
+    server, backend = fake_server(delay=0.01)
+    extraction_queue = ExtractionQueue(backend, workers=8, batch_size=1)
+
+    jobs = extraction_queue.wait(extraction_queue.submit_many([(image(), "") for _ in range(40)]), timeout=20)
+
+    assert all(job.status == DONE for job in jobs)
+    stats = server_stats(server)
+    assert stats["requests"] == stats["images"] == 40
+    assert stats["batch_sizes"] == [1] * 40
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+import speech_recognition as sr
+
+from recognizer_backends import FixtureRecognizerBackend, RecognizerBackend, audio_fingerprint, create_backend
+
+
+def record(path):
+    with sr.AudioFile(path) as source:
+        return sr.Recognizer().record(source)
+
+
+def test_recognizer_backend_is_abstract():
+    with pytest.raises(TypeError):
+        RecognizerBackend()
+
+    class Incomplete(RecognizerBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_fixture_backend_maps_each_wav_to_its_transcript(wav_fixtures):
+    phrases = ["patient reports back pain", "blood pressure normal", "follow up in two weeks"]
+    backend, wav_paths = FixtureRecognizerBackend.from_directory(wav_fixtures(phrases))
+
+    assert [os.path.basename(path) for path in wav_paths] == ["phrase_000.wav", "phrase_001.wav", "phrase_002.wav"]
+    assert [backend.recognize(record(path)) for path in wav_paths] == phrases
+
+
+def test_fixture_backend_rejects_unknown_audio(wav_fixtures):
+    directory = wav_fixtures(["known", "no transcript"])
+    os.remove(os.path.join(directory, "phrase_001.txt"))
+    backend, wav_paths = FixtureRecognizerBackend.from_directory(directory)
+
+    assert len(wav_paths) == 2 and len(backend.transcripts) == 1
+    with pytest.raises(sr.UnknownValueError):
+        backend.recognize(record(wav_paths[1]))
+
+    audio = record(wav_paths[1])
+    backend.add(audio, "added later")
+    assert backend.recognize(audio) == "added later"
+    assert audio_fingerprint(audio) in backend.transcripts
+
+
+def test_create_backend_builds_fixture_backend_from_directory(wav_fixtures):
+    directory = wav_fixtures(["only phrase"])
+    backend = create_backend("fixture", directory=directory)
+    assert backend.recognize(record(os.path.join(directory, "phrase_000.wav"))) == "only phrase"
+    with pytest.raises(ValueError):
+        create_backend("unknown")
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+
+from search_index import InvertedIndex, tokenize
+
+
+def test_tokenize_lowercases_splits_and_drops_stop_words():
+    assert tokenize("The patient's BP is 130/85, and HR 72") == ["patient", "s", "bp", "130", "85", "hr", "72"]
+    assert tokenize("") == []
+    assert tokenize(None) == []
+
+
+def make_index():
+    index = InvertedIndex()
+    index.add_document(1, {"subjective": "back pain", "plan": "rest"})
+    index.add_document(2, {"subjective": "back pain back pain back pain", "plan": "ibuprofen"})
+    index.add_document(3, {"subjective": "headache", "assessment": "migraine, back is fine"})
+    index.add_document(4, {"objective": "pain on palpation of the knee"})
+    return index
+
+
+def test_search_ranks_by_term_frequency_and_requires_every_term():
+    ranked, total = make_index().search("back pain")
+    assert total == 2
+    assert [doc_id for doc_id, _score in ranked] == [2, 1]
+    assert ranked[0][1] > ranked[1][1] > 0
+
+
+def test_rare_terms_weigh_more():
+    index = make_index()
+    common_score = dict(index.search("pain")[0])[4]
+    rare_score = dict(index.search("palpation")[0])[4]
+    assert rare_score > common_score
+
+
+def test_search_restricted_to_fields():
+    index = make_index()
+    assert [doc_id for doc_id, _ in index.search("back", fields=["assessment"])[0]] == [3]
+    assert index.search("back", fields=["plan"]) == ([], 0)
+    assert index.search("back", fields=["unknown"]) == ([], 0)
+
+
+def test_pagination_walks_the_ranking_without_gaps():
+    index = InvertedIndex()
+    for doc_id in range(10):
+        # More mentions rank higher, so the expected order is 9, 8, ..., 0
+        index.add_document(doc_id, {"plan": " ".join(["follow"] * (doc_id + 1) + ["filler"] * (10 - doc_id))})
+    pages = [index.search("follow", limit=3, skip=skip) for skip in range(0, 12, 3)]
+    assert [total for _, total in pages] == [10] * 4
+    assert [doc_id for ranked, _ in pages for doc_id, _ in ranked] == list(range(9, -1, -1))
+    assert pages[-1][0] == [(0, pages[-1][0][0][1])]
+
+
+def test_reindex_and_remove_update_postings():
+    index = make_index()
+    index.add_document(1, {"subjective": "sore throat"})
+    assert [doc_id for doc_id, _ in index.search("back pain")[0]] == [2]
+    index.remove_document(2)
+    assert index.search("back pain") == ([], 0)
+    assert len(index) == 3 and 2 not in index
+
+
+def test_memory_search_sees_notes_written_by_another_process():
+    mongomock = pytest.importorskip("mongomock")
+    from database_manager import DatabaseManager
+    from models import SOAPNote
+
+    client = mongomock.MongoClient()
+    first = DatabaseManager(client=client, search_backend="memory")
+    second = DatabaseManager(client=client, search_backend="memory")  # stands in for another worker
+    first.save_soap_note(SOAPNote("P0001", "D001", datetime(2026, 1, 1), subjective="knee pain"))
+    assert [note["subjective"] for note in second.search_notes("knee")] == ["knee pain"]
+
+    first.save_soap_note(SOAPNote("P0002", "D001", datetime(2026, 1, 1), subjective="knee swelling"))
+    assert len(second.search_notes("knee")) == 2
+    # Its own writes go straight into its index
+    second.save_soap_note(SOAPNote("P0003", "D001", datetime(2026, 1, 1), subjective="knee brace"))
+    assert second._search_generation == 3
+    assert len(second.search_notes("knee")) == 3
@@ -0,0 +1,65 @@
+import time
+
+import speech_recognition as sr
+
+from recognizer_backends import FixtureRecognizerBackend
+from speech_pipeline import CapturePipeline, wav_file_audio_source
+from speech_recognition_manager import SpeechRecognitionManager
+from soap_note_manager import SOAPNoteManager
+
+PHRASES = ["first phrase", "second phrase", "third phrase", "fourth phrase", "fifth phrase"]
+
+
+def test_results_come_back_in_capture_order(wav_fixtures):
+    backend, wav_paths = FixtureRecognizerBackend.from_directory(wav_fixtures(PHRASES))
+    delays = {}
+
+    def recognize(audio):
+        # Earlier phrases take longest, so workers finish them out of order
+        text = backend.recognize(audio)
+        time.sleep(delays.setdefault(text, 0.05 * (len(PHRASES) - len(delays))))
+        return text
+
+    pipeline = CapturePipeline(recognize, workers=3)
+    pipeline.start(wav_file_audio_source(sr.Recognizer(), wav_paths))
+
+    results = list(pipeline.results())
+    assert [result.sequence for result in results] == list(range(len(PHRASES)))
+    assert [result.text for result in results] == PHRASES
+    assert pipeline.finished
+
+
+def test_unknown_audio_is_reported_in_its_place(wav_fixtures):
+    directory = wav_fixtures(["known", "unknown", "also known"])
+    backend, wav_paths = FixtureRecognizerBackend.from_directory(directory)
+    del backend.transcripts[next(key for key, text in backend.transcripts.items() if text == "unknown")]
+
+    pipeline = CapturePipeline(backend.recognize, workers=2)
+    pipeline.start(wav_file_audio_source(sr.Recognizer(), wav_paths))
+
+    results = list(pipeline.results())
+    assert [result.text for result in results] == ["known", None, "also known"]
+    assert results[1].error
+
+
+def test_dictation_session_does_not_block_and_applies_phrases_in_order(wav_fixtures, tmp_path):
+    directory = wav_fixtures(["patient", "my back hurts", "doctor", "plan", "rest for two weeks", "quit",
+                              "after quit"])
+    manager = SOAPNoteManager(speech_manager=SpeechRecognitionManager.from_fixture_directory(directory),
+                              storage="sqlite", sqlite_path=str(tmp_path / "notes.db"), autosave=False)
+    manager.add_patient("P0001", "John Doe", "1980-05-15", "555-1234")
+    manager.add_doctor("D001", "Dr. Smith", "Family Medicine", "555-5678")
+    manager.start_new_note("P0001", "D001")
+
+    assert manager.start_voice_dictation_session(workers=3)
+    assert manager.dictation_active
+
+    deadline = time.monotonic() + 10
+    while manager.process_dictation_results(timeout=0.1):
+        assert time.monotonic() < deadline
+
+    assert not manager.dictation_active
+    transcript = [(entry.speaker, entry.text) for entry in manager.current_note.raw_transcript]
+    assert transcript == [("patient", "my back hurts"), ("doctor", "rest for two weeks")]
+    assert manager.current_note.raw_transcript[1].section == "plan"
+    assert manager.dictation_log[-1] == "Ending dictation session"
@@ -2,8 +2,24 @@
 """
 Text processing and SOAP categorization
 """
-from typing import List
-from models import SOAPNote
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Union
+from models import SOAPNote, TranscriptEntry
+from keyword_matcher import KeywordMatcher
+import metrics
+
+SECTIONS = ("subjective", "objective", "assessment", "plan")
+
+@dataclass
+class BatchCategorization:
+    """Result of categorizing a sequence of transcript entries"""
+    assignments: List[str] = field(default_factory=list)
+    sections: Dict[str, str] = field(default_factory=dict)
+    
+    def apply_to(self, soap_note: SOAPNote):
+        """Replace the section text of a SOAP note with the assembled sections"""
+        for section in SECTIONS:
+            setattr(soap_note, section, self.sections.get(section, ""))
 
 class TextProcessor:
     def __init__(self):
@@ -27,7 +43,16 @@ class TextProcessor:
             "plan", "treatment", "medication", "follow up", "prescribe", 
             "recommend", "therapy", "surgery", "procedure"
         ]
+        
+        self.keyword_matcher = KeywordMatcher()
+        for section in SECTIONS:
+            self.keyword_matcher.add_keywords(section, self._keywords_for(section))
+    
+    def _keywords_for(self, section: str) -> List[str]:
+        """Return the keyword list backing a section"""
+        return getattr(self, f"{section}_keywords")
     
+    @metrics.timed("text.categorize")
     def categorize_text(self, text: str, soap_note: SOAPNote, section: str = "") -> str:
         """
         Categorize text into appropriate SOAP section
@@ -40,56 +65,67 @@ class TextProcessor:
         Returns:
             The section where text was categorized
         """
-        text_lower = text.lower()
-        
+        target_section = self.classify(text, section)
+        setattr(soap_note, target_section, getattr(soap_note, target_section) + f" {text}")
+        return target_section
+    
+    def classify(self, text: str, section: str = "") -> str:
+        """Pick the SOAP section for text without modifying any note"""
         # If section is explicitly specified, use it
-        if section:
-            section_lower = section.lower()
-            if section_lower == "subjective":
-                soap_note.subjective += f" {text}"
-                return "subjective"
-            elif section_lower == "objective":
-                soap_note.objective += f" {text}"
-                return "objective"
-            elif section_lower == "assessment":
-                soap_note.assessment += f" {text}"
-                return "assessment"
-            elif section_lower == "plan":
-                soap_note.plan += f" {text}"
-                return "plan"
+        if section and section.lower() in SECTIONS:
+            return section.lower()
         
-        # Auto-categorize based on keywords
-        if self._contains_keywords(text_lower, self.subjective_keywords):
-            soap_note.subjective += f" {text}"
-            return "subjective"
-        elif self._contains_keywords(text_lower, self.objective_keywords):
-            soap_note.objective += f" {text}"
-            return "objective"
-        elif self._contains_keywords(text_lower, self.assessment_keywords):
-            soap_note.assessment += f" {text}"
-            return "assessment"
-        elif self._contains_keywords(text_lower, self.plan_keywords):
-            soap_note.plan += f" {text}"
-            return "plan"
-        else:
-            # Default to subjective if no clear category
-            soap_note.subjective += f" {text}"
-            return "subjective"
+        # Auto-categorize by the section with the most keyword hits;
+        # ties go to the earlier section, so no hits defaults to subjective
+        scores = self.score_sections(text)
+        return max(SECTIONS, key=lambda name: (scores[name], -SECTIONS.index(name)))
+    
+    def score_sections(self, text: str) -> Dict[str, int]:
+        """Count keyword hits for every SOAP section in a single pass over the text"""
+        counts = self.keyword_matcher.count_labels(text)
+        return {section: counts.get(section, 0) for section in SECTIONS}
     
-    def _contains_keywords(self, text: str, keywords: List[str]) -> bool:
-        """Check if text contains any of the specified keywords"""
-        return any(keyword in text for keyword in keywords)
+    @metrics.timed("text.categorize_entries")
+    def categorize_entries(self, entries: Iterable[Union[TranscriptEntry, Dict]]) -> BatchCategorization:
+        """
+        Categorize a stream of transcript entries in one call
+        
+        Args:
+            entries: TranscriptEntry objects or their stored dict form
+            
+        Returns:
+            The section chosen for each entry and the assembled section text
+        """
+        buffers: Dict[str, List[str]] = {section: [] for section in SECTIONS}
+        result = BatchCategorization()
+        for entry in entries:
+            if isinstance(entry, dict):
+                text, section = entry.get("text", ""), entry.get("section", "")
+            else:
+                text, section = entry.text, entry.section
+            target_section = self.classify(text, section)
+            buffers[target_section].append(text)
+            result.assignments.append(target_section)
+        
+        result.sections = {section: " ".join(parts) for section, parts in buffers.items()}
+        return result
+    
+    def recategorize_note(self, soap_note: Union[SOAPNote, Dict]) -> BatchCategorization:
+        """Rebuild every section of a note (object or stored document) from its raw transcript"""
+        if isinstance(soap_note, dict):
+            result = self.categorize_entries(soap_note.get("raw_transcript") or [])
+            soap_note.update(result.sections)
+        else:
+            result = self.categorize_entries(soap_note.raw_transcript)
+            result.apply_to(soap_note)
+        return result
     
     def add_custom_keywords(self, section: str, keywords: List[str]):
         """Add custom keywords for a specific section"""
-        if section.lower() == "subjective":
-            self.subjective_keywords.extend(keywords)
-        elif section.lower() == "objective":
-            self.objective_keywords.extend(keywords)
-        elif section.lower() == "assessment":
-            self.assessment_keywords.extend(keywords)
-        elif section.lower() == "plan":
-            self.plan_keywords.extend(keywords)
+        section_lower = section.lower()
+        if section_lower in SECTIONS:
+            self._keywords_for(section_lower).extend(keywords)
+            self.keyword_matcher.add_keywords(section_lower, keywords)
 
 # ==========================================
 